@@ -0,0 +1,48 @@
+"""create_nfe_emissoes
+
+Revision ID: 3f6a9c2e7d15
+Revises: 6e8d1b2f9c57
+Create Date: 2026-10-17 15:02:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a9c2e7d15'
+down_revision: Union[str, Sequence[str], None] = '6e8d1b2f9c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('nfe_emissoes',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('carregamento_id', sa.Integer(), nullable=False),
+    sa.Column('group_id', sa.Integer(), nullable=True),
+    sa.Column('referencia', sa.String(length=255), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('proxima_tentativa_em', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('reservado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('enviado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['carregamento_id'], ['carregamentos.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('carregamento_id')
+    )
+    op.create_index('ix_nfe_emissoes_status_proxima', 'nfe_emissoes', ['status', 'proxima_tentativa_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_nfe_emissoes_status_proxima', table_name='nfe_emissoes')
+    op.drop_table('nfe_emissoes')
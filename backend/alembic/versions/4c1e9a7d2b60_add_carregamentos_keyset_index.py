@@ -0,0 +1,28 @@
+"""add_carregamentos_keyset_index
+
+Revision ID: 4c1e9a7d2b60
+Revises: 008711cef553
+Create Date: 2026-10-17 09:12:03.418220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e9a7d2b60'
+down_revision: Union[str, Sequence[str], None] = '008711cef553'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_carregamentos_created_at_id', 'carregamentos', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carregamentos_created_at_id', table_name='carregamentos')
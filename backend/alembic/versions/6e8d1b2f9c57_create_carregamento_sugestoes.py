@@ -0,0 +1,59 @@
+"""create_carregamento_sugestoes
+
+Revision ID: 6e8d1b2f9c57
+Revises: d2a7c4e91f38
+Create Date: 2026-10-17 13:20:16.552841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e8d1b2f9c57'
+down_revision: Union[str, Sequence[str], None] = 'd2a7c4e91f38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CAMPOS = ('truck', 'driver', 'product', 'field', 'destination', 'unit')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('carregamento_sugestoes',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('campo', sa.String(length=20), nullable=False),
+    sa.Column('valor', sa.String(length=160), nullable=False),
+    sa.Column('valor_normalizado', sa.String(length=160), nullable=False),
+    sa.Column('frequencia', sa.Integer(), nullable=False),
+    sa.Column('ultimo_uso', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('group_id', 'campo', 'valor')
+    )
+    op.create_index(
+        'ix_carregamento_sugestoes_prefixo',
+        'carregamento_sugestoes',
+        ['group_id', 'campo', 'valor_normalizado'],
+        unique=False,
+        postgresql_ops={'valor_normalizado': 'varchar_pattern_ops'},
+    )
+    op.create_index('ix_carregamento_sugestoes_ranking', 'carregamento_sugestoes', ['group_id', 'campo', 'frequencia'], unique=False)
+
+    # Backfill a partir do histórico de carregamentos já vinculados a um grupo
+    for campo in CAMPOS:
+        op.execute(sa.text(f"""
+            INSERT INTO carregamento_sugestoes (group_id, campo, valor, valor_normalizado, frequencia, ultimo_uso)
+            SELECT group_id, '{campo}', {campo}, lower({campo}), count(*), max(created_at)
+            FROM carregamentos
+            WHERE group_id IS NOT NULL AND {campo} IS NOT NULL AND {campo} <> ''
+            GROUP BY group_id, {campo}
+        """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carregamento_sugestoes_ranking', table_name='carregamento_sugestoes')
+    op.drop_index('ix_carregamento_sugestoes_prefixo', table_name='carregamento_sugestoes')
+    op.drop_table('carregamento_sugestoes')
@@ -0,0 +1,30 @@
+"""add_carregamentos_filter_indexes
+
+Revision ID: 9b3f5d0e8a14
+Revises: 4c1e9a7d2b60
+Create Date: 2026-10-17 10:41:27.905311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3f5d0e8a14'
+down_revision: Union[str, Sequence[str], None] = '4c1e9a7d2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_carregamentos_scheduled_at_id', 'carregamentos', ['scheduled_at', 'id'], unique=False)
+    op.create_index('ix_carregamentos_armazem_destino_id', 'carregamentos', ['armazem_destino_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carregamentos_armazem_destino_id', table_name='carregamentos')
+    op.drop_index('ix_carregamentos_scheduled_at_id', table_name='carregamentos')
@@ -0,0 +1,54 @@
+"""create_producao_diaria
+
+Revision ID: a5c8e3f1b0d4
+Revises: 3f6a9c2e7d15
+Create Date: 2026-10-17 16:41:09.502713
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5c8e3f1b0d4'
+down_revision: Union[str, Sequence[str], None] = '3f6a9c2e7d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mesmo padrão de Settings.PRODUCAO_TIMEZONE
+TIMEZONE = 'America/Sao_Paulo'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('producao_diaria',
+    sa.Column('group_id', sa.Integer(), nullable=False),
+    sa.Column('farm', sa.String(length=160), nullable=False),
+    sa.Column('field', sa.String(length=120), nullable=False),
+    sa.Column('product', sa.String(length=80), nullable=False),
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('carregamentos', sa.Integer(), nullable=False),
+    sa.Column('peso_com_desconto_fazenda', sa.Numeric(precision=16, scale=2), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('group_id', 'farm', 'field', 'product', 'dia')
+    )
+    op.create_index('ix_producao_diaria_group_dia', 'producao_diaria', ['group_id', 'dia'], unique=False)
+
+    # Backfill a partir dos carregamentos já vinculados a um grupo
+    op.execute(sa.text(f"""
+        INSERT INTO producao_diaria (group_id, farm, field, product, dia, carregamentos, peso_com_desconto_fazenda, quantity)
+        SELECT group_id, farm, field, product, (scheduled_at AT TIME ZONE '{TIMEZONE}')::date,
+               count(*), coalesce(sum(peso_com_desconto_fazenda), 0), coalesce(sum(quantity), 0)
+        FROM carregamentos
+        WHERE group_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_producao_diaria_group_dia', table_name='producao_diaria')
+    op.drop_table('producao_diaria')
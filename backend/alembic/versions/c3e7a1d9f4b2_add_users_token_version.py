@@ -0,0 +1,28 @@
+"""add_users_token_version
+
+Revision ID: c3e7a1d9f4b2
+Revises: a5c8e3f1b0d4
+Create Date: 2026-10-17 17:12:36.904155
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e7a1d9f4b2'
+down_revision: Union[str, Sequence[str], None] = 'a5c8e3f1b0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,91 @@
+"""key_producao_diaria_on_farm_id
+
+Revision ID: c8e2f4a6b1d9
+Revises: f7a2c5e8d1b3
+Create Date: 2026-10-17 23:05:12.640381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2f4a6b1d9'
+down_revision: Union[str, Sequence[str], None] = 'f7a2c5e8d1b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Mesmo padrão de Settings.PRODUCAO_TIMEZONE
+TIMEZONE = 'America/Sao_Paulo'
+
+
+def _criar_tabela(chave_por_fazenda: bool) -> None:
+    if chave_por_fazenda:
+        op.create_table('producao_diaria',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('farm_id', sa.Integer(), nullable=True),
+        sa.Column('farm', sa.String(length=160), nullable=False),
+        sa.Column('field', sa.String(length=120), nullable=False),
+        sa.Column('product', sa.String(length=80), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('carregamentos', sa.Integer(), nullable=False),
+        sa.Column('peso_com_desconto_fazenda', sa.Numeric(precision=16, scale=2), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['farm_id'], ['farms.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(
+            'uq_producao_diaria_bucket', 'producao_diaria',
+            [sa.text('coalesce(group_id, 0)'), sa.text('coalesce(farm_id, 0)'), 'farm', 'field', 'product', 'dia'],
+            unique=True,
+        )
+    else:
+        op.create_table('producao_diaria',
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('farm', sa.String(length=160), nullable=False),
+        sa.Column('field', sa.String(length=120), nullable=False),
+        sa.Column('product', sa.String(length=80), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('carregamentos', sa.Integer(), nullable=False),
+        sa.Column('peso_com_desconto_fazenda', sa.Numeric(precision=16, scale=2), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('group_id', 'farm', 'field', 'product', 'dia')
+        )
+    op.create_index('ix_producao_diaria_group_dia', 'producao_diaria', ['group_id', 'dia'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # O rollup é derivado dos carregamentos: recria com a chave nova e refaz o backfill
+    op.drop_table('producao_diaria')
+    _criar_tabela(chave_por_fazenda=True)
+
+    # Todos os carregamentos, inclusive legados sem grupo/fazenda (total do system_admin).
+    # Com farm_id o nome não entra na chave: renomear a fazenda não divide o histórico
+    op.execute(sa.text(f"""
+        INSERT INTO producao_diaria (group_id, farm_id, farm, field, product, dia, carregamentos, peso_com_desconto_fazenda, quantity)
+        SELECT group_id, farm_id, CASE WHEN farm_id IS NULL THEN farm ELSE '' END,
+               field, product, (scheduled_at AT TIME ZONE '{TIMEZONE}')::date,
+               count(*), coalesce(sum(peso_com_desconto_fazenda), 0), coalesce(sum(quantity), 0)
+        FROM carregamentos
+        GROUP BY 1, 2, 3, 4, 5, 6
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('producao_diaria')
+    _criar_tabela(chave_por_fazenda=False)
+    op.execute(sa.text(f"""
+        INSERT INTO producao_diaria (group_id, farm, field, product, dia, carregamentos, peso_com_desconto_fazenda, quantity)
+        SELECT group_id, farm, field, product, (scheduled_at AT TIME ZONE '{TIMEZONE}')::date,
+               count(*), coalesce(sum(peso_com_desconto_fazenda), 0), coalesce(sum(quantity), 0)
+        FROM carregamentos
+        WHERE group_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    """))
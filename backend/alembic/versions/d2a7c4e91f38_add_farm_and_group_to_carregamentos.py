@@ -0,0 +1,73 @@
+"""add_farm_and_group_to_carregamentos
+
+Revision ID: d2a7c4e91f38
+Revises: 9b3f5d0e8a14
+Create Date: 2026-10-17 11:58:44.127093
+
+"""
+import logging
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7c4e91f38'
+down_revision: Union[str, Sequence[str], None] = '9b3f5d0e8a14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('carregamentos', sa.Column('farm_id', sa.Integer(), nullable=True))
+    op.add_column('carregamentos', sa.Column('group_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_carregamentos_farm_id', 'carregamentos', 'farms', ['farm_id'], ['id'])
+    op.create_foreign_key('fk_carregamentos_group_id', 'carregamentos', 'groups', ['group_id'], ['id'])
+
+    # Backfill pelo nome da fazenda, só quando o nome resolve para uma única fazenda.
+    # Nome repetido em mais de uma fazenda (ex: grupos diferentes) é ambíguo: a linha fica NULL (sem grupo) em vez
+    # de ser atribuída ao tenant errado, e a contagem vai para o log da migração.
+    op.execute(sa.text("""
+        UPDATE carregamentos AS c
+        SET farm_id = f.id, group_id = f.group_id
+        FROM (
+            SELECT min(id) AS id, name, min(group_id) AS group_id
+            FROM farms
+            GROUP BY name
+            HAVING count(*) = 1
+        ) AS f
+        WHERE c.farm = f.name
+    """))
+
+    ambiguos = op.get_bind().execute(sa.text("""
+        SELECT c.farm, count(*)
+        FROM carregamentos c
+        WHERE c.farm_id IS NULL
+          AND c.farm IN (SELECT name FROM farms GROUP BY name HAVING count(*) > 1)
+        GROUP BY c.farm
+        ORDER BY c.farm
+    """)).all()
+    for farm, total in ambiguos:
+        logger.warning(
+            "Fazenda '%s' é ambígua (mais de uma fazenda com o nome): %d carregamento(s) ficaram sem farm_id/group_id",
+            farm, total,
+        )
+
+    op.create_index('ix_carregamentos_group_created_at_id', 'carregamentos', ['group_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_carregamentos_group_scheduled_at_id', 'carregamentos', ['group_id', 'scheduled_at', 'id'], unique=False)
+    op.create_index('ix_carregamentos_farm_created_at_id', 'carregamentos', ['farm_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_carregamentos_farm_created_at_id', table_name='carregamentos')
+    op.drop_index('ix_carregamentos_group_scheduled_at_id', table_name='carregamentos')
+    op.drop_index('ix_carregamentos_group_created_at_id', table_name='carregamentos')
+    op.drop_constraint('fk_carregamentos_group_id', 'carregamentos', type_='foreignkey')
+    op.drop_constraint('fk_carregamentos_farm_id', 'carregamentos', type_='foreignkey')
+    op.drop_column('carregamentos', 'group_id')
+    op.drop_column('carregamentos', 'farm_id')
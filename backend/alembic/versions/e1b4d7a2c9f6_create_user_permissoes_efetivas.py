@@ -0,0 +1,39 @@
+"""create_user_permissoes_efetivas
+
+Revision ID: e1b4d7a2c9f6
+Revises: c3e7a1d9f4b2
+Create Date: 2026-10-17 17:48:20.117093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b4d7a2c9f6'
+down_revision: Union[str, Sequence[str], None] = 'c3e7a1d9f4b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sem backfill: cada usuário é calculado na primeira leitura
+    op.create_table('user_permissoes_efetivas',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('modulos', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('por_fazenda', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('etag', sa.String(length=64), nullable=True),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_permissoes_efetivas')
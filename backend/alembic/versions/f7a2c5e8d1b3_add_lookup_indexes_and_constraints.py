@@ -0,0 +1,90 @@
+"""add_lookup_indexes_and_constraints
+
+Revision ID: f7a2c5e8d1b3
+Revises: e1b4d7a2c9f6
+Create Date: 2026-10-17 21:12:44.318026
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a2c5e8d1b3'
+down_revision: Union[str, Sequence[str], None] = 'e1b4d7a2c9f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tabela, colunas); if_not_exists: bancos onde o índice já foi criado à mão seguem sem erro
+INDICES = [
+    ('ix_farms_group_id', 'farms', ['group_id']),
+    ('ix_farms_name_group_id', 'farms', ['name', 'group_id']),
+    ('ix_fields_farm_id', 'fields', ['farm_id']),
+    ('ix_carregamentos_farm_created_at', 'carregamentos', ['farm', 'created_at']),
+    ('ix_carregamentos_nfe_status', 'carregamentos', ['nfe_status']),
+    ('ix_carregamentos_nfe_ref', 'carregamentos', ['nfe_ref']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for nome, tabela, colunas in INDICES:
+        op.create_index(nome, tabela, colunas, unique=False, if_not_exists=True)
+
+    # user_farm_permissions: fica a linha mais recente de cada (user_id, farm_id)
+    op.execute("""
+        DELETE FROM user_farm_permissions p
+        USING user_farm_permissions mais_nova
+        WHERE mais_nova.user_id = p.user_id
+          AND mais_nova.farm_id = p.farm_id
+          AND mais_nova.id > p.id
+    """)
+    op.create_unique_constraint(
+        'uq_user_farm_permissions_user_farm', 'user_farm_permissions', ['user_id', 'farm_id']
+    )
+
+    # armazens.cnpj: só dígitos ("12.345.678/0001-90" e "12345678000190" são o mesmo
+    # destinatário) e vazio vira NULL (NULLs não conflitam no índice único)
+    op.execute(r"""
+        UPDATE armazens
+        SET cnpj = NULLIF(regexp_replace(cnpj, '\D', '', 'g'), '')
+        WHERE cnpj IS DISTINCT FROM NULLIF(regexp_replace(cnpj, '\D', '', 'g'), '')
+    """)
+    # CNPJ repetido: mantém o armazém com mais carregamentos (próprio primeiro) e
+    # repassa os carregamentos dos duplicados para ele antes de apagá-los
+    op.execute("""
+        CREATE TEMPORARY TABLE armazens_duplicados ON COMMIT DROP AS
+        WITH uso AS (
+            SELECT a.id, a.cnpj,
+                   row_number() OVER (
+                       PARTITION BY a.cnpj
+                       ORDER BY a.eh_proprio DESC, count(c.id) DESC, a.id
+                   ) AS ordem
+            FROM armazens a
+            LEFT JOIN carregamentos c ON c.armazem_destino_id = a.id
+            WHERE a.cnpj IS NOT NULL
+            GROUP BY a.id, a.cnpj
+        )
+        SELECT duplicado.id AS id, mantido.id AS mantido_id
+        FROM uso duplicado
+        JOIN uso mantido ON mantido.cnpj = duplicado.cnpj AND mantido.ordem = 1
+        WHERE duplicado.ordem > 1
+    """)
+    op.execute("""
+        UPDATE carregamentos c
+        SET armazem_destino_id = d.mantido_id
+        FROM armazens_duplicados d
+        WHERE c.armazem_destino_id = d.id
+    """)
+    op.execute("DELETE FROM armazens a USING armazens_duplicados d WHERE a.id = d.id")
+    op.create_index('uq_armazens_cnpj', 'armazens', ['cnpj'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_armazens_cnpj', table_name='armazens')
+    op.drop_constraint('uq_user_farm_permissions_user_farm', 'user_farm_permissions', type_='unique')
+    for nome, tabela, _ in reversed(INDICES):
+        op.drop_index(nome, table_name=tabela, if_exists=True)
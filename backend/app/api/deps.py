@@ -1,46 +1,133 @@
-from fastapi import Depends, HTTPException, status
+import secrets
+
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.core.security import decode_access_token
+from app.core.security import TIPO_TICKET_SSE, decode_access_token
+from app.core.usuarios_cache import UsuarioAutenticado, usuarios_cache
 from app.crud import user as user_crud
-from app.db.session import get_db
-from app.models.user import User
+from app.db.replicas import roteador_leitura
+from app.db.session import AsyncSessionLocal, SessionLocal, get_db
 from app.models.permissions_enum import BaseRole
 
 settings = get_settings()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f'{settings.API_V1_STR}/auth/login')
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl=f'{settings.API_V1_STR}/auth/login', auto_error=False)
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+def _user_from_token(db: Session, token: str | None, *, tipo: str | None = None) -> UsuarioAutenticado:
+    """
+    Valida o JWT e devolve o usuário. Com o usuário em cache para a mesma versão de
+    token não há consulta ao banco (a sessão nem chega a abrir conexão).
+    `tipo`: 'typ' exigido no token (None = token de acesso; tickets SSE são recusados).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='Could not validate credentials',
         headers={'WWW-Authenticate': 'Bearer'},
     )
+    if not token:
+        raise credentials_exception
     try:
         payload = decode_access_token(token)
         subject: str | None = payload.get('sub')
-        if subject is None:
+        if subject is None or payload.get('typ') != tipo:
             raise credentials_exception
-    except JWTError as exc:
+        user_id = int(subject)
+        token_version = int(payload.get('ver', 0))
+    except (JWTError, ValueError, TypeError) as exc:
         raise credentials_exception from exc
 
-    user = user_crud.get(db, id=subject)
-    if not user:
+    usuario = usuarios_cache.get(user_id, token_version)
+    if usuario is not None:
+        return usuario
+
+    user = user_crud.get(db, id=user_id)
+    # Versão diferente: token revogado (ex: usuário desativado ou senha trocada)
+    if not user or user.token_version != token_version:
         raise credentials_exception
+    usuario = UsuarioAutenticado.from_user(user)
+    usuarios_cache.set(usuario)
+    return usuario
+
+
+def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> UsuarioAutenticado:
+    return _user_from_token(db, token)
+
+
+def get_current_stream_user(
+    header_token: str | None = Depends(oauth2_scheme_optional),
+    ticket: str | None = Query(None, description='Ticket de POST /eventos/ticket (EventSource não envia header Authorization)'),
+) -> UsuarioAutenticado:
+    """
+    Autenticação para conexões longas (SSE): token de acesso no header ou ticket curto em
+    ?ticket= (o token de acesso nunca vai na URL). Usa uma sessão curta, para não prender
+    uma conexão do pool durante o stream.
+    """
+    db = SessionLocal()
+    try:
+        if header_token:
+            user = _user_from_token(db, header_token)
+        else:
+            user = _user_from_token(db, ticket, tipo=TIPO_TICKET_SSE)
+    finally:
+        db.close()
+    if not user.active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Inactive user')
     return user
 
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+) -> UsuarioAutenticado:
     if not current_user.active:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Inactive user')
     return current_user
 
 
-def get_current_system_admin(current_user: User = Depends(get_current_active_user)) -> User:
+def get_current_system_admin(
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+) -> UsuarioAutenticado:
     if current_user.base_role != BaseRole.SYSTEM_ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Insufficient permissions')
     return current_user
+
+
+def verificar_acesso_metricas(
+    db: Session = Depends(get_db),
+    token: str | None = Depends(oauth2_scheme_optional),
+) -> None:
+    """/metrics: aceita o token do scraper (METRICS_TOKEN) ou um system_admin autenticado"""
+    if token and settings.METRICS_TOKEN and secrets.compare_digest(token, settings.METRICS_TOKEN):
+        return
+    user = _user_from_token(db, token)
+    if not user.active or user.base_role != BaseRole.SYSTEM_ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Insufficient permissions')
+
+
+def _grupo_leitura(user: UsuarioAutenticado) -> int | None:
+    # system_admin enxerga todos os grupos: qualquer escrita recente conta
+    return None if user.base_role == BaseRole.SYSTEM_ADMIN else user.group_id
+
+
+def get_read_db(current_user: UsuarioAutenticado = Depends(get_current_active_user)):
+    """
+    Sessão só de leitura (relatórios/listagens): réplica em dia quando configurada,
+    senão o primário. Não use para gravar.
+    """
+    replica = roteador_leitura.replica_para(_grupo_leitura(current_user))
+    db = (replica.SessionLocal if replica else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(current_user: UsuarioAutenticado = Depends(get_current_active_user)):
+    """get_read_db para rotas async (AsyncSession)"""
+    replica = await roteador_leitura.replica_para_async(_grupo_leitura(current_user))
+    async with (replica.AsyncSessionLocal if replica else AsyncSessionLocal)() as db:
+        yield db
@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 
 from . import auth, modules, groups, users, carregamentos, producao, armazens, destinatarios
-from . import farms
+from . import farms, eventos, producao_analise
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix='/auth', tags=['auth'])
@@ -11,8 +11,10 @@ api_router.include_router(farms.router, prefix='/farms', tags=['farms'])
 api_router.include_router(modules.router, prefix='/modules', tags=['modules'])
 api_router.include_router(carregamentos.router, prefix='/carregamentos', tags=['carregamentos'])
 api_router.include_router(producao.router, prefix='/producao', tags=['producao'])
+api_router.include_router(producao_analise.router, prefix='/producao', tags=['producao'])
 api_router.include_router(armazens.router, prefix='/armazens', tags=['armazens'])
 api_router.include_router(destinatarios.router, prefix='/destinatarios', tags=['destinatarios'])
+api_router.include_router(eventos.router, prefix='/eventos', tags=['eventos'])
 
 __all__ = ['api_router']
 
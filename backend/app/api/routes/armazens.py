@@ -1,15 +1,34 @@
 from typing import Any, List
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.config import get_settings
 from app.models.armazem import Armazem
 from app.schemas.armazem import Armazem as ArmazemSchema, ArmazemCreate, ArmazemUpdate
+from app.services.recalculo_descontos import (
+    contar_carregamentos,
+    parametros_desconto,
+    recalcular_descontos_armazem,
+    recalcular_em_segundo_plano,
+)
 
 router = APIRouter()
 
+CNPJ_DUPLICADO = "Já existe um armazém com este CNPJ"
+
+
+def _commit_armazem(db: Session) -> None:
+    # uq_armazens_cnpj: CNPJ já usado por outro armazém (inclusive gravado em paralelo)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=CNPJ_DUPLICADO)
+
 @router.get("/", response_model=List[ArmazemSchema])
 def read_armazens(
     db: Session = Depends(deps.get_db),
@@ -33,7 +52,7 @@ def create_armazem(
     """
     armazem = Armazem(**armazem_in.model_dump())
     db.add(armazem)
-    db.commit()
+    _commit_armazem(db)
     db.refresh(armazem)
     return armazem
 
@@ -43,20 +62,30 @@ def update_armazem(
     db: Session = Depends(deps.get_db),
     armazem_id: UUID,
     armazem_in: ArmazemUpdate,
+    background_tasks: BackgroundTasks,
 ) -> Any:
     """
     Update an armazem.
+    Se os parâmetros de desconto mudarem, recalcula peso_com_desconto_armazem dos
+    carregamentos desse destino: na mesma transação até ARMAZEM_RECALCULO_SINCRONO_MAX
+    carregamentos, acima disso depois da resposta.
     """
     armazem = db.query(Armazem).filter(Armazem.id == armazem_id).first()
     if not armazem:
         raise HTTPException(status_code=404, detail="Armazem not found")
     
     update_data = armazem_in.model_dump(exclude_unset=True)
+    parametros_antes = parametros_desconto(armazem)
     for field, value in update_data.items():
         setattr(armazem, field, value)
         
     db.add(armazem)
-    db.commit()
+    if parametros_desconto(armazem) != parametros_antes:
+        if contar_carregamentos(db, armazem_id=armazem.id) <= get_settings().ARMAZEM_RECALCULO_SINCRONO_MAX:
+            recalcular_descontos_armazem(db, armazem=armazem)
+        else:
+            background_tasks.add_task(recalcular_em_segundo_plano, armazem.id)
+    _commit_armazem(db)
     db.refresh(armazem)
     return armazem
 
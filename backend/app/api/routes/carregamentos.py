@@ -1,41 +1,120 @@
 from datetime import datetime
 import json
-import traceback # Added for debugging
-
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+import tempfile
+import zipfile
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_active_user
+from app.api.deps import get_async_read_db, get_current_active_user
 from app.models.armazem import Armazem
 
+from app.crud import armazem as armazem_crud
 from app.crud import carregamento as carregamento_crud
-from app.db.session import get_db
-from app.models.user import User
-from app.schemas.carregamento import CarregamentoForm, CarregamentoRead
-from app.schemas.carregamento import CarregamentoForm, CarregamentoRead
-from app.services.focus_nfe import gerar_referencia, montar_json_nfe, enviar_nfe_focus
+from app.crud import carregamento_sugestao as carregamento_sugestao_crud
+from app.crud import permissoes_efetivas as permissoes_efetivas_crud
+from app.db.session import get_async_db, get_db
+from app.models.carregamento import Carregamento
+from app.schemas.carregamento import CarregamentoFiltro, CarregamentoForm, CarregamentoRead
+from app.schemas.armazem import SimulacaoDescontosIn, normalizar_cnpj
+from app.services.focus_nfe import gerar_referencia, montar_json_nfe, resolver_token_focus
 from app.core.config import get_settings
+from app.core.eventos import publicar_evento
+from app.core.usuarios_cache import UsuarioAutenticado
 from app.crud import group as crud_groups
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-# ============================================================================
-# DEBUG HOMOLOGAÇÃO ATIVO - REMOVER QUANDO FOR PARA PRODUÇÃO
-# ============================================================================
+def _serializar(carregamento: Carregamento) -> CarregamentoRead:
+    return CarregamentoRead.model_validate(carregamento, from_attributes=True)
+
+
+def _publicar_carregamento(tipo: str, carregamento) -> None:
+    """Envia o carregamento serializado para o feed SSE do grupo (/eventos/stream)"""
+    publicar_evento(carregamento.group_id, tipo, _serializar(carregamento).model_dump(mode='json'))
+
+
+async def _na_sessao(db: AsyncSession, fn, /, *args, **kwargs):
+    """
+    Executa fn(sessão síncrona, ...) sobre a conexão assíncrona (AsyncSession.run_sync):
+    o código ORM/CRUD continua síncrono, mas cada ida ao banco libera o event loop.
+    Carregamentos devolvidos já saem serializados (fora da sessão não há lazy load).
+    """
+    def executar(session: Session):
+        resultado = fn(session, *args, **kwargs)
+        if isinstance(resultado, Carregamento):
+            return _serializar(resultado)
+        if isinstance(resultado, list):
+            return [_serializar(item) if isinstance(item, Carregamento) else item for item in resultado]
+        return resultado
+    return await db.run_sync(executar)
+
+
+def carregamento_filtro(
+    scheduled_from: datetime | None = None,
+    scheduled_to: datetime | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    farm: str | None = None,
+    field: str | None = None,
+    product: str | None = None,
+    truck: str | None = None,
+    driver: str | None = None,
+    destination: str | None = None,
+    type: list[str] | None = Query(None),
+    nfe_status: list[str] | None = Query(None),
+    armazem_destino_id: UUID | None = None,
+    sort: str = '-created_at',
+) -> CarregamentoFiltro:
+    """Monta o CarregamentoFiltro a partir da query string (datas: início inclusivo, fim exclusivo)"""
+    try:
+        return CarregamentoFiltro(
+            scheduled_from=scheduled_from,
+            scheduled_to=scheduled_to,
+            created_from=created_from,
+            created_to=created_to,
+            farm=farm,
+            field=field,
+            product=product,
+            truck=truck,
+            driver=driver,
+            destination=destination,
+            type=type,
+            nfe_status=nfe_status,
+            armazem_destino_id=armazem_destino_id,
+            sort=sort,
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+
 @router.post('/', status_code=status.HTTP_201_CREATED, response_model=CarregamentoRead)
 async def create_carregamento(
     carregamento_form: CarregamentoForm,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Cria um novo carregamento.
-    Se type == 'EXTERNAL', gera NFe automaticamente.
-    Se type == 'INTERNAL', apenas salva no banco.
+    Se type == 'remessa'/'venda', enfileira a emissão da NFe e responde 202 sem esperar a Focus.
+    Se type == 'interno', apenas salva no banco (201).
     """
+    return await _na_sessao(db, _criar_carregamento, carregamento_form, response, current_user)
+
+
+def _criar_carregamento(db: Session, carregamento_form: CarregamentoForm, response: Response, current_user: UsuarioAutenticado):
     from app.core.config import get_settings
     from app.schemas.carregamento import CarregamentoCreate
     settings = get_settings()
@@ -63,23 +142,33 @@ async def create_carregamento(
             detail=f'Quantidade inválida: {carregamento_form.quantity}'
         ) from exc
 
+    # Fazenda (Emitente / Tenancy): resolvida uma vez pelo nome dentro do grupo do usuário
+    from app.models.farm import Farm
+    farm_obj = db.query(Farm).filter(
+        Farm.name == carregamento_form.farm,
+        Farm.group_id == current_user.group_id
+    ).first()
+
     # --- 2. Cálculos de Peso e Descontos ---
-    from app.services.calculo_peso_service import calcular_descontos
+    from app.services.calculo_peso_service import calcular_descontos_decimal, para_decimal
     from app.models.armazem import Armazem
     
-    # 2.1 Peso Líquido
+    # 2.1 Peso Líquido (Decimal do formulário até as colunas Numeric, sem passar por float)
     peso_liquido = None
     if carregamento_form.peso_bruto_kg and carregamento_form.tara_kg:
-        peso_liquido = float(carregamento_form.peso_bruto_kg) - float(carregamento_form.tara_kg)
+        peso_liquido = para_decimal(carregamento_form.peso_bruto_kg) - para_decimal(carregamento_form.tara_kg)
+    base_calc = peso_liquido or para_decimal(quantity)
+    umidade = para_decimal(carregamento_form.umidade_percent or 0)
+    impurezas = para_decimal(carregamento_form.impurezas_percent or 0)
     
     # 2.2 Parâmetros da Fazenda (Personalizável)
-    desc_fazenda = calcular_descontos(
-        peso_liquido=peso_liquido or quantity, 
-        umidade_medida=float(carregamento_form.umidade_percent or 0),
-        impurezas_medida=float(carregamento_form.impurezas_percent or 0),
-        umidade_padrao=float(carregamento_form.umidade_padrao or 14.0),
-        fator_umidade=float(carregamento_form.fator_umidade or 1.5),
-        impurezas_padrao=float(carregamento_form.impurezas_padrao or 1.0)
+    desc_fazenda = calcular_descontos_decimal(
+        peso_liquido=base_calc,
+        umidade_medida=umidade,
+        impurezas_medida=impurezas,
+        umidade_padrao=carregamento_form.umidade_padrao or 14.0,
+        fator_umidade=carregamento_form.fator_umidade or 1.5,
+        impurezas_padrao=carregamento_form.impurezas_padrao or 1.0
     )
     
     # 2.3 Parâmetros do Armazém (Mantém lógica de pegar do cadastro do armazém se existir)
@@ -87,13 +176,13 @@ async def create_carregamento(
     if carregamento_form.armazem_destino_id:
         armazem = db.query(Armazem).filter(Armazem.id == carregamento_form.armazem_destino_id).first()
         if armazem:
-            desc_armazem = calcular_descontos(
-                peso_liquido=peso_liquido or quantity,
-                umidade_medida=float(carregamento_form.umidade_percent or 0),
-                impurezas_medida=float(carregamento_form.impurezas_percent or 0),
-                umidade_padrao=float(armazem.umidade_padrao),
-                fator_umidade=float(armazem.fator_umidade),
-                impurezas_padrao=float(armazem.impurezas_padrao)
+            desc_armazem = calcular_descontos_decimal(
+                peso_liquido=base_calc,
+                umidade_medida=umidade,
+                impurezas_medida=impurezas,
+                umidade_padrao=armazem.umidade_padrao,
+                fator_umidade=armazem.fator_umidade,
+                impurezas_padrao=armazem.impurezas_padrao
             )
 
     # --- 3. Criação do Objeto no Banco ---
@@ -101,6 +190,8 @@ async def create_carregamento(
         truck=carregamento_form.truck,
         driver=carregamento_form.driver,
         farm=carregamento_form.farm,
+        farm_id=farm_obj.id if farm_obj else None,
+        group_id=current_user.group_id,
         field=carregamento_form.field,
         product=carregamento_form.product,
         quantity=quantity,
@@ -164,29 +255,14 @@ async def create_carregamento(
              existing_armazem.cep = carregamento_form.cep_destinatario or existing_armazem.cep
              db.add(existing_armazem) # Mark for update
 
-    elif carregamento_form.cnpj_destinatario:
+    elif normalizar_cnpj(carregamento_form.cnpj_destinatario):
         # Verifica se já existe armazém com este CNPJ
-        existing_armazem = db.query(Armazem).filter(Armazem.cnpj == carregamento_form.cnpj_destinatario).first()
+        existing_armazem = armazem_crud.get_by_cnpj(db, cnpj=carregamento_form.cnpj_destinatario)
         
-        if existing_armazem:
-            # Associa ao existente E ATUALIZA
-            carregamento_create.armazem_destino_id = existing_armazem.id
-            carregamento_form.armazem_destino_id = existing_armazem.id
-            
-            existing_armazem.inscricao_estadual = carregamento_form.inscricao_estadual_destinatario or existing_armazem.inscricao_estadual
-            existing_armazem.logradouro = carregamento_form.logradouro_destinatario or existing_armazem.logradouro
-            existing_armazem.numero = carregamento_form.numero_destinatario or existing_armazem.numero
-            existing_armazem.bairro = carregamento_form.bairro_destinatario or existing_armazem.bairro
-            existing_armazem.municipio = carregamento_form.municipio_destinatario or existing_armazem.municipio
-            existing_armazem.uf = carregamento_form.uf_destinatario or existing_armazem.uf
-            existing_armazem.cep = carregamento_form.cep_destinatario or existing_armazem.cep
-            db.add(existing_armazem)
-
-        elif carregamento_form.nome_destinatario: # Só cria se tiver pelo menos o nome
-            # Cria novo Armazém
-            new_armazem = Armazem(
+        if existing_armazem is None and carregamento_form.nome_destinatario: # Só cria se tiver pelo menos o nome
+            # Cria novo Armazém (se outra requisição criou o mesmo CNPJ agora, reaproveita o dela)
+            new_armazem, criado = armazem_crud.get_or_create_by_cnpj(db, cnpj=carregamento_form.cnpj_destinatario, dados=dict(
                 nome=carregamento_form.nome_destinatario,
-                cnpj=carregamento_form.cnpj_destinatario,
                 inscricao_estadual=carregamento_form.inscricao_estadual_destinatario,
                 logradouro=carregamento_form.logradouro_destinatario,
                 numero=carregamento_form.numero_destinatario,
@@ -199,13 +275,24 @@ async def create_carregamento(
                 umidade_padrao=14.0,
                 fator_umidade=1.5,
                 impurezas_padrao=1.0
-            )
-            db.add(new_armazem)
-            try:
-                db.flush() 
-                carregamento_create.armazem_destino_id = new_armazem.id
-            except Exception as e:
-                print(f"Erro ao auto-salvar destinatario: {e}")
+            ))
+            carregamento_create.armazem_destino_id = new_armazem.id
+            if not criado:
+                existing_armazem = new_armazem
+
+        if existing_armazem:
+            # Associa ao existente E ATUALIZA
+            carregamento_create.armazem_destino_id = existing_armazem.id
+            carregamento_form.armazem_destino_id = existing_armazem.id
+            
+            existing_armazem.inscricao_estadual = carregamento_form.inscricao_estadual_destinatario or existing_armazem.inscricao_estadual
+            existing_armazem.logradouro = carregamento_form.logradouro_destinatario or existing_armazem.logradouro
+            existing_armazem.numero = carregamento_form.numero_destinatario or existing_armazem.numero
+            existing_armazem.bairro = carregamento_form.bairro_destinatario or existing_armazem.bairro
+            existing_armazem.municipio = carregamento_form.municipio_destinatario or existing_armazem.municipio
+            existing_armazem.uf = carregamento_form.uf_destinatario or existing_armazem.uf
+            existing_armazem.cep = carregamento_form.cep_destinatario or existing_armazem.cep
+            db.add(existing_armazem)
     
     # Salva inicialmente (sem commit se for EXTERNAL para poder rollback em caso de erro na API)
     # Se for INTERNAL, já podemos commitar
@@ -213,27 +300,9 @@ async def create_carregamento(
     db_carregamento = carregamento_crud.create(db, obj_in=carregamento_create, commit=should_commit)
 
     # --- 4. Fluxo INTERNO (Sem NFe) ---
+    # Campos *_destinatario são hidratados pelo CarregamentoRead via relationship armazem_destino
     if carregamento_form.type == 'interno':
-        # Hydrate Response
-        if db_carregamento.armazem_destino_id:
-            from app.models.armazem import Armazem
-            from app.schemas.carregamento import CarregamentoRead
-            armazem_obj = db.get(Armazem, db_carregamento.armazem_destino_id)
-            if armazem_obj:
-               carregamento_dict = {c.name: getattr(db_carregamento, c.name) for c in db_carregamento.__table__.columns}
-               carregamento_dict.update({
-                    'cnpj_destinatario': armazem_obj.cnpj,
-                    'nome_destinatario': armazem_obj.nome,
-                    'logradouro_destinatario': armazem_obj.logradouro,
-                    'numero_destinatario': armazem_obj.numero,
-                    'bairro_destinatario': armazem_obj.bairro,
-                    'municipio_destinatario': armazem_obj.municipio,
-                    'uf_destinatario': armazem_obj.uf,
-                    'cep_destinatario': armazem_obj.cep,
-                    'inscricao_estadual_destinatario': armazem_obj.inscricao_estadual
-                })
-               return CarregamentoRead(**carregamento_dict)
-
+        _publicar_carregamento('carregamento.criado', db_carregamento)
         return db_carregamento
 
     # --- 5. Fluxo EXTERNO (Com NFe) ---
@@ -289,27 +358,17 @@ async def create_carregamento(
             'indicador_inscricao_estadual_destinatario': carregamento_form.indicador_inscricao_estadual_destinatario,
         }
 
-        # Buscar dados completos da Fazenda (Emitente)
-        from app.models.farm import Farm
-        farm_obj = db.query(Farm).filter(
-            Farm.name == carregamento_form.farm, 
-            Farm.group_id == current_user.group_id
-        ).first()
-        
+        # Dados completos da Fazenda (Emitente) já buscados no início
         if not farm_obj:
             # Fallback (em teoria não deveria acontecer se o frontend listar corretamente)
             raise HTTPException(status_code=400, detail=f"Fazenda '{carregamento_form.farm}' não encontrada para este usuário")
 
-        # Buscar Grupo e Token
+        # Buscar Grupo e Token (o worker resolve de novo no envio; aqui só valida)
         from app.models.group import Group
         group_obj = db.get(Group, current_user.group_id)
         
         # Em homologação, podemos aceitar sem token, mas em produção NÃO
-        focus_token = ''
-        if group_obj and group_obj.focus_nfe_token:
-             focus_token = group_obj.focus_nfe_token
-        elif settings.FOCUS_NFE_AMBIENTE == 'homologacao':
-             focus_token = settings.FOCUS_NFE_TOKEN # Fallback do .env apenas em homologação
+        focus_token = resolver_token_focus(group_obj.focus_nfe_token if group_obj else None)
         
         if not focus_token:
              raise HTTPException(status_code=400, detail="Grupo não possui Token da Focus NFe configurado para emissão fiscal")
@@ -334,79 +393,25 @@ async def create_carregamento(
             nfe_type=nfe_type
         )
         
-        # Atualizar status para "processando"
-        carregamento_crud.update_nfe_data(
-            db,
-            db_obj=db_carregamento,
-            nfe_ref=referencia,
-            nfe_status='processando',
-            commit=False,
-        )
-
-        # Enviar para Focus NFe
-        try:
-            response_focus = await enviar_nfe_focus(nfe_data, token=focus_token)
-        except Exception as focus_error:
-            # Em caso de erro na API externa, fazemos rollback do carregamento criado
-            db.rollback()
-            print(f"Erro ao enviar NFe: {focus_error}")
-            traceback.print_exc() # Print full traceback
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f'Erro ao enviar NFe para Focus: {str(focus_error)}'
-            ) from focus_error
-
-        # Processar resposta
-        status_nfe = response_focus.get('status', 'erro')
-        protocolo = response_focus.get('protocolo')
-        chave = response_focus.get('chave_nfe')
-        # Fix: Truncation Error (DB Limit 44, Focus returns 'NFe'+44)
-        if chave and chave.startswith('NFe'):
-             chave = chave[3:]
-             
-        xml_url = response_focus.get('caminho_xml_nota_fiscal')
-        danfe_url = response_focus.get('caminho_danfe')
+        # Enfileira a emissão na outbox, na mesma transação do carregamento.
+        # O envio para a Focus acontece no worker (app.services.nfe_outbox), fora da requisição.
+        from app.crud import nfe_emissao as nfe_emissao_crud
+        from app.services.nfe_outbox import nfe_outbox_worker
 
-        status_mapeado = {
-            'autorizado': 'autorizado',
-            'processando': 'processando',
-            'cancelado': 'cancelado',
-            'erro_autorizacao': 'erro',
-            'denegado': 'erro',
-        }.get(status_nfe, 'erro')
-
-        # Atualizar registro final
-        db_carregamento = carregamento_crud.update_nfe_data(
+        nfe_emissao_crud.enfileirar(
             db,
-            db_obj=db_carregamento,
-            nfe_status=status_mapeado,
-            nfe_protocolo=protocolo,
-            nfe_chave=chave,
-            nfe_xml_url=xml_url,
-            nfe_danfe_url=danfe_url,
-            commit=True, # Agora sim commita tudo
+            carregamento_id=db_carregamento.id,
+            group_id=current_user.group_id,
+            referencia=referencia,
+            payload=nfe_data,
         )
-        
-        # Hydrate Response
-        if db_carregamento.armazem_destino_id:
-            from app.models.armazem import Armazem
-            from app.schemas.carregamento import CarregamentoRead
-            armazem_obj = db.get(Armazem, db_carregamento.armazem_destino_id)
-            if armazem_obj:
-               carregamento_dict = {c.name: getattr(db_carregamento, c.name) for c in db_carregamento.__table__.columns}
-               carregamento_dict.update({
-                    'cnpj_destinatario': armazem_obj.cnpj,
-                    'nome_destinatario': armazem_obj.nome,
-                    'logradouro_destinatario': armazem_obj.logradouro,
-                    'numero_destinatario': armazem_obj.numero,
-                    'bairro_destinatario': armazem_obj.bairro,
-                    'municipio_destinatario': armazem_obj.municipio,
-                    'uf_destinatario': armazem_obj.uf,
-                    'cep_destinatario': armazem_obj.cep,
-                    'inscricao_estadual_destinatario': armazem_obj.inscricao_estadual
-                })
-               return CarregamentoRead(**carregamento_dict)
+        db.commit()
+        db.refresh(db_carregamento)
+        nfe_outbox_worker.notificar()
 
+        # 202: carregamento salvo, NF-e ainda pendente (acompanhar via nfe_status / sync-nfe)
+        response.status_code = status.HTTP_202_ACCEPTED
+        _publicar_carregamento('carregamento.criado', db_carregamento)
         return db_carregamento
 
     except HTTPException:
@@ -421,124 +426,224 @@ async def create_carregamento(
 
 @router.get('/', response_model=list[CarregamentoRead])
 async def list_carregamentos(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    filtro: CarregamentoFiltro = Depends(carregamento_filtro),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Lista todos os carregamentos.
-    Se não for admin, filtra pelas fazendas do grupo do usuário.
+    Se não for admin, filtra pelo grupo do usuário (carregamentos.group_id).
+    Aceita filtros por período (scheduled_*/created_*), fazenda, talhão, produto, caminhão,
+    motorista, destino, type, nfe_status e armazem_destino_id, além de `sort`
+    (ex.: `-scheduled_at`), tudo compilado em um único SELECT.
+
+    Paginação por cursor: sem `skip`, a primeira página já devolve o header
+    `X-Next-Cursor`; basta repassá-lo em `cursor` para buscar a próxima página.
+    O modo `skip` (offset) continua disponível por compatibilidade.
     """
-    farm_names = None
-    if current_user.base_role != 'system_admin':
-        from app.models.farm import Farm
-        # Buscar nomes das fazendas do grupo
-        farms = db.query(Farm.name).filter(Farm.group_id == current_user.group_id).all()
-        farm_names = [f[0] for f in farms]
-        
-    carregamentos = carregamento_crud.get_multi(db, skip=skip, limit=limit, farm_names=farm_names)
+    if cursor and skip:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Use 'cursor' ou 'skip', não ambos")
+
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+
+    if skip:
+        return await _na_sessao(db, carregamento_crud.get_multi, skip=skip, limit=limit, group_id=group_id, filtro=filtro)
+
+    def pagina(sessao: Session):
+        carregamentos, next_cursor = carregamento_crud.get_page(
+            sessao, cursor=cursor, limit=limit, group_id=group_id, filtro=filtro
+        )
+        return [_serializar(c) for c in carregamentos], next_cursor
+
+    try:
+        carregamentos, next_cursor = await db.run_sync(pagina)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
     return carregamentos
 
 
 
+@router.get('/exportar')
+async def exportar_carregamentos(
+    formato: str = Query('csv', pattern='^(csv|ndjson|parquet)$'),
+    filtro: CarregamentoFiltro = Depends(carregamento_filtro),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+):
+    """
+    Exporta todos os carregamentos que atendem aos filtros da listagem (sem paginação).
+    As linhas são lidas por cursor no servidor e escritas na resposta em blocos,
+    então a memória não cresce com o tamanho da safra.
+    """
+    from app.services.exportacao_carregamentos import FORMATOS_EXPORTACAO, gerar_exportacao, parquet_disponivel
+
+    if formato == 'parquet' and not parquet_disponivel():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Exportação Parquet indisponível: pacote pyarrow não instalado"
+        )
+
+    # Se não for admin, restringe ao grupo
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+
+    return StreamingResponse(
+        gerar_exportacao(formato, filtro=filtro, group_id=group_id),
+        media_type=FORMATOS_EXPORTACAO[formato],
+        headers={'Content-Disposition': f'attachment; filename="carregamentos.{formato}"'},
+    )
+
+
+@router.post('/simular-descontos')
+def simular_descontos(
+    simulacao_in: SimulacaoDescontosIn,
+    filtro: CarregamentoFiltro = Depends(carregamento_filtro),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Compara o peso creditado aos carregamentos do filtro sob as regras de umidade de
+    cada armazém (cadastrados em armazem_ids e/ou perfis avulsos), contra o peso com
+    desconto da fazenda. O desconto de impurezas (percentual medido) é o mesmo em
+    todos os perfis.
+
+    Rota síncrona de propósito (roda no threadpool): o cálculo é CPU (NumPy) e
+    não deve ocupar o event loop.
+    """
+    from app.services.simulacao_descontos import simular_descontos as simular
+
+    perfis = []
+    if simulacao_in.armazem_ids:
+        armazens = {
+            a.id: a for a in db.query(Armazem).filter(Armazem.id.in_(simulacao_in.armazem_ids))
+        }
+        faltando = [str(i) for i in simulacao_in.armazem_ids if i not in armazens]
+        if faltando:
+            raise HTTPException(status_code=404, detail=f"Armazém não encontrado: {', '.join(faltando)}")
+        perfis += [
+            {
+                'armazem_id': str(a.id),
+                'nome': a.nome,
+                'umidade_padrao': float(a.umidade_padrao),
+                'fator_umidade': float(a.fator_umidade),
+            }
+            for a in (armazens[i] for i in simulacao_in.armazem_ids)
+        ]
+    perfis += [{'armazem_id': None, **p.model_dump()} for p in simulacao_in.perfis]
+    if not perfis:
+        raise HTTPException(status_code=400, detail="Informe armazem_ids ou perfis para simular")
+
+    # Se não for admin, restringe ao grupo
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+    return simular(db, group_id=group_id, filtro=filtro, perfis=perfis)
+
+
 @router.get('/distinct-values', response_model=list[str])
 async def get_distinct_values(
     field: str,
-    current_user: User = Depends(get_current_active_user),
+    q: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Retorna valores já usados em um campo específico (ex: truck, driver, product).
+    Útil para autocomplete no frontend: `q` filtra por prefixo e os valores vêm
+    ordenados pelos mais usados. Lê o índice carregamento_sugestoes, mantido a cada
+    criação/edição, então o custo não depende do número de carregamentos do grupo.
+    """
+    from app.crud.crud_carregamento_sugestao import SUGESTAO_CAMPOS
+
+    if field not in SUGESTAO_CAMPOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campo inválido. Permitidos: {', '.join(SUGESTAO_CAMPOS)}"
+        )
+
+    # Se não for admin, restringe ao grupo
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+
+    return await _na_sessao(db, carregamento_sugestao_crud.buscar, group_id=group_id, campo=field, q=q, limit=limit)
+
+
+_FORMATOS_IMPORTACAO = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'text/plain': 'csv',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'xlsx',
+}
+
+
+@router.post('/importar')
+async def importar_carregamentos(
+    request: Request,
+    formato: str | None = Query(None, pattern='^(csv|xlsx)$'),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
     """
-    Retorna uma lista de valores únicos para um campo específico (ex: truck, driver, product).
-    Útil para autocomplete no frontend.
+    Importa carregamentos históricos a partir de uma planilha (CSV ou XLSX) enviada
+    no corpo da requisição, com as mesmas colunas do formulário de carregamento.
+    O arquivo é lido em streaming e gravado em lotes; linhas inválidas não interrompem
+    a importação e voltam no relatório com o número da linha.
     """
-    from app.models.carregamento import Carregamento
-    from sqlalchemy import distinct
-    
-    allowed_fields = ['truck', 'driver', 'product', 'field', 'destination', 'unit']
-    if field not in allowed_fields:
+    from app.services.importacao_carregamentos import importar_carregamentos as importar
+
+    if current_user.base_role not in ['manager', 'owner', 'system_admin']:
+        raise HTTPException(status_code=403, detail="Sem permissão para importar carregamentos")
+    if current_user.group_id is None:
+        raise HTTPException(status_code=400, detail="Usuário sem grupo vinculado")
+
+    if formato is None:
+        content_type = request.headers.get('content-type', '').split(';')[0].strip().lower()
+        formato = _FORMATOS_IMPORTACAO.get(content_type)
+    if formato is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Campo inválido. Permitidos: {', '.join(allowed_fields)}"
+            detail="Formato não identificado. Envie Content-Type text/csv ou XLSX, ou informe ?formato=csv|xlsx"
         )
-    
-    # Mapeia string para coluna do modelo
-    column_map = {
-        'truck': Carregamento.truck,
-        'driver': Carregamento.driver,
-        'product': Carregamento.product,
-        'field': Carregamento.field,
-        'destination': Carregamento.destination,
-        'unit': Carregamento.unit,
-    }
-    
-    target_column = column_map[field]
-    
-    # Query Base
-    query = db.query(distinct(target_column)).filter(target_column != None) # noqa: E711
-    
-    # Se não for admin, filtrar pelas fazendas do grupo
-    if current_user.base_role != 'system_admin':
-         from app.models.farm import Farm
-         farms = db.query(Farm.name).filter(Farm.group_id == current_user.group_id).all()
-         farm_names = [f[0] for f in farms]
-         
-         # Filtrar carregamentos que pertencem a essas fazendas
-         query = query.filter(Carregamento.farm.in_(farm_names))
-
-    # Busca valores distintos não nulos
-    results = query.all()
-    
-    # Flatten list of tuples [('val1',), ('val2',)] -> ['val1', 'val2']
-    values = [r[0] for r in results if r[0]]
-    
-    return sorted(values)
+
+    # Corpo bruto vai para um arquivo temporário (memória até 8 MB, depois disco)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as arquivo:
+        async for chunk in request.stream():
+            arquivo.write(chunk)
+        arquivo.seek(0)
+
+        try:
+            relatorio = await run_in_threadpool(
+                importar, db, arquivo=arquivo, formato=formato, group_id=current_user.group_id
+            )
+        except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Arquivo inválido: {e}")
+
+    # Importação em lote: um único evento (clientes recarregam a lista)
+    if relatorio['importados']:
+        publicar_evento(current_user.group_id, 'carregamentos.importados', {'importados': relatorio['importados']})
+    return relatorio
 
 
 @router.get('/{id}', response_model=CarregamentoRead)
 async def get_carregamento(
     id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Obtém um carregamento pelo ID.
+    O armazém de destino vem no mesmo carregamento (selectinload) e hidrata os campos *_destinatario.
     """
-    carregamento = carregamento_crud.get(db, id=id)
+    carregamento = await _na_sessao(db, carregamento_crud.get, id=id)
     if not carregamento:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Carregamento não encontrado",
         )
-    
-    # Hydrate Destination Fields from Armazem if linked
-    if carregamento.armazem_destino_id:
-        from app.models.armazem import Armazem
-        from app.schemas.carregamento import CarregamentoRead
-        armazem = db.get(Armazem, carregamento.armazem_destino_id)
-        
-        # We need to construct a dict merging the DB object and the overrides
-        carregamento_dict = {
-            c.name: getattr(carregamento, c.name) 
-            for c in carregamento.__table__.columns
-        }
-        
-        if armazem:
-             carregamento_dict.update({
-                 'cnpj_destinatario': armazem.cnpj,
-                 'nome_destinatario': armazem.nome,
-                 'logradouro_destinatario': armazem.logradouro,
-                 'numero_destinatario': armazem.numero,
-                 'bairro_destinatario': armazem.bairro,
-                 'municipio_destinatario': armazem.municipio,
-                 'uf_destinatario': armazem.uf,
-                 'cep_destinatario': armazem.cep,
-                 'inscricao_estadual_destinatario': armazem.inscricao_estadual
-             })
-             
-        # Add matricula_snapshot if missing but ID exists (optional logic)
-        
-        return CarregamentoRead(**carregamento_dict)
 
     return carregamento
 
@@ -548,15 +653,18 @@ async def get_carregamento(
 async def update_carregamento(
     id: int,
     carregamento_in: CarregamentoForm,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Atualiza um carregamento existente.
     Recalcula pesos e descontos.
     """
-    from app.schemas.carregamento import CarregamentoUpdate
-    from app.services.calculo_peso_service import calcular_descontos
+    return await _na_sessao(db, _atualizar_carregamento, id, carregamento_in, current_user)
+
+
+def _atualizar_carregamento(db: Session, id: int, carregamento_in: CarregamentoForm, current_user: UsuarioAutenticado):
+    from app.services.calculo_peso_service import calcular_descontos_decimal, para_decimal
     from app.models.armazem import Armazem
 
     carregamento = carregamento_crud.get(db, id=id)
@@ -570,25 +678,27 @@ async def update_carregamento(
     # Enforce strict field-level permissions for Scale and Dryer operators
     if current_user.base_role not in ['system_admin', 'owner', 'manager']:
         from app.models.farm import Farm
-        from app.models.user_farm_permissions import UserFarmPermissions
         
         # 1. Identify Context (Farm)
-        farm_obj = db.query(Farm).filter(Farm.name == carregamento.farm).first()
-        if not farm_obj:
+        farm_id = carregamento.farm_id
+        if farm_id is None:
+            # Carregamentos legados sem farm_id: resolve pelo nome dentro do grupo
+            farm_id = db.query(Farm.id).filter(
+                Farm.name == carregamento.farm,
+                Farm.group_id == current_user.group_id
+            ).scalar()
+        if farm_id is None:
             # Should not happen, but safe fallback
              raise HTTPException(status_code=403, detail="Fazenda não encontrada para validação de permissão")
         
-        # 2. Fetch Permissions
-        user_perms = db.query(UserFarmPermissions).filter(
-            UserFarmPermissions.user_id == current_user.id,
-            UserFarmPermissions.farm_id == farm_obj.id
-        ).first()
-        
-        if not user_perms or not user_perms.allowed_modules:
+        # 2. Fetch Permissions (matriz pré-calculada: papel + módulos da fazenda + permissões explícitas)
+        farm_perms = permissoes_efetivas_crud.da_fazenda(db, user=current_user, farm_id=farm_id)
+
+        if not farm_perms:
              raise HTTPException(status_code=403, detail="Sem permissões para esta fazenda")
-        
-        modules = user_perms.allowed_modules.get('truck-loading', {})
-        
+
+        modules = farm_perms.get('truck-loading', {})
+
         # 3. Define Field Groups
         WEIGHT_FIELDS = ['peso_bruto_kg', 'tara_kg']
         QUALITY_FIELDS = ['umidade_percent', 'impurezas_percent'] # 'umidade_alvo' if it existed
@@ -659,24 +769,26 @@ async def update_carregamento(
     # 1.1 Peso Líquido
     peso_liquido = None
     if carregamento_in.peso_bruto_kg and carregamento_in.tara_kg:
-        peso_liquido = float(carregamento_in.peso_bruto_kg) - float(carregamento_in.tara_kg)
+        peso_liquido = para_decimal(carregamento_in.peso_bruto_kg) - para_decimal(carregamento_in.tara_kg)
     
     # Se não tiver peso liquido calculado, tenta usar o quantity se for numérico
     base_calc = peso_liquido
     if base_calc is None:
         try:
-            base_calc = float(carregamento_in.quantity)
+            base_calc = para_decimal(float(carregamento_in.quantity))
         except:
-            base_calc = 0.0
+            base_calc = para_decimal(0)
+    umidade = para_decimal(carregamento_in.umidade_percent or 0)
+    impurezas = para_decimal(carregamento_in.impurezas_percent or 0)
 
     # 1.2 Parâmetros da Fazenda (Com novos parâmetros do form)
-    desc_fazenda = calcular_descontos(
+    desc_fazenda = calcular_descontos_decimal(
         peso_liquido=base_calc,
-        umidade_medida=float(carregamento_in.umidade_percent or 0),
-        impurezas_medida=float(carregamento_in.impurezas_percent or 0),
-        umidade_padrao=float(carregamento_in.umidade_padrao or carregamento.umidade_padrao or 14.0),
-        fator_umidade=float(carregamento_in.fator_umidade or carregamento.fator_umidade or 1.5),
-        impurezas_padrao=float(carregamento_in.impurezas_padrao or carregamento.impurezas_padrao or 1.0)
+        umidade_medida=umidade,
+        impurezas_medida=impurezas,
+        umidade_padrao=carregamento_in.umidade_padrao or carregamento.umidade_padrao or 14.0,
+        fator_umidade=carregamento_in.fator_umidade or carregamento.fator_umidade or 1.5,
+        impurezas_padrao=carregamento_in.impurezas_padrao or carregamento.impurezas_padrao or 1.0
     )
     
     # 1.3 Parâmetros do Armazém
@@ -684,13 +796,13 @@ async def update_carregamento(
     if carregamento_in.armazem_destino_id:
         armazem = db.query(Armazem).filter(Armazem.id == carregamento_in.armazem_destino_id).first()
         if armazem:
-            desc_armazem = calcular_descontos(
+            desc_armazem = calcular_descontos_decimal(
                 peso_liquido=base_calc,
-                umidade_medida=float(carregamento_in.umidade_percent or 0),
-                impurezas_medida=float(carregamento_in.impurezas_percent or 0),
-                umidade_padrao=float(armazem.umidade_padrao),
-                fator_umidade=float(armazem.fator_umidade),
-                impurezas_padrao=float(armazem.impurezas_padrao)
+                umidade_medida=umidade,
+                impurezas_medida=impurezas,
+                umidade_padrao=armazem.umidade_padrao,
+                fator_umidade=armazem.fator_umidade,
+                impurezas_padrao=armazem.impurezas_padrao
             )
 
     # --- 2. Preparar Update ---
@@ -699,6 +811,15 @@ async def update_carregamento(
     
     update_data = carregamento_in.dict(exclude_unset=True)
     
+    # Renomear/trocar a fazenda atualiza também o vínculo de tenancy
+    if 'farm' in update_data and update_data['farm'] != carregamento.farm:
+        from app.models.farm import Farm
+        group_id = carregamento.group_id or current_user.group_id
+        update_data['farm_id'] = db.query(Farm.id).filter(
+            Farm.name == update_data['farm'],
+            Farm.group_id == group_id
+        ).scalar()
+
     # Atualizar campos calculados
     update_data['peso_com_desconto_fazenda'] = desc_fazenda['peso_com_desconto']
     update_data['peso_com_desconto_armazem'] = desc_armazem['peso_com_desconto'] if desc_armazem else None
@@ -734,33 +855,21 @@ async def update_carregamento(
 
     if target_armazem_id:
         armazem_obj = db.get(Armazem, target_armazem_id)
-    elif get_val('cnpj_destinatario'):
-        # Try to find by CNPJ or Create
-        cnpj_clean = get_val('cnpj_destinatario')
-        existing = db.query(Armazem).filter(Armazem.cnpj == cnpj_clean).first()
-        if existing:
-            armazem_obj = existing
-            # Link it
-            update_data['armazem_destino_id'] = existing.id
-        else:
-            # Create NEW Armazem
-            nome_novo = get_val('nome_destinatario') or f"Armazem {cnpj_clean}"
-            new_armazem = Armazem(
-                nome=nome_novo,
-                cnpj=cnpj_clean,
-                inscricao_estadual=get_val('inscricao_estadual_destinatario'),
-                logradouro=get_val('logradouro_destinatario'),
-                numero=get_val('numero_destinatario'),
-                bairro=get_val('bairro_destinatario'),
-                municipio=get_val('municipio_destinatario'),
-                uf=get_val('uf_destinatario'),
-                cep=get_val('cep_destinatario'),
-                group_id=current_user.group_id # Assume same group
-            )
-            db.add(new_armazem)
-            db.flush() # Get ID
-            armazem_obj = new_armazem
-            update_data['armazem_destino_id'] = new_armazem.id
+    elif normalizar_cnpj(get_val('cnpj_destinatario')):
+        # Find by CNPJ or Create (savepoint: CNPJ criado em paralelo é reaproveitado)
+        cnpj_clean = normalizar_cnpj(get_val('cnpj_destinatario'))
+        armazem_obj, _ = armazem_crud.get_or_create_by_cnpj(db, cnpj=cnpj_clean, dados=dict(
+            nome=get_val('nome_destinatario') or f"Armazem {cnpj_clean}",
+            inscricao_estadual=get_val('inscricao_estadual_destinatario'),
+            logradouro=get_val('logradouro_destinatario'),
+            numero=get_val('numero_destinatario'),
+            bairro=get_val('bairro_destinatario'),
+            municipio=get_val('municipio_destinatario'),
+            uf=get_val('uf_destinatario'),
+            cep=get_val('cep_destinatario'),
+        ))
+        # Link it
+        update_data['armazem_destino_id'] = armazem_obj.id
             
     if armazem_obj:
              # Fields to sync from form to Armazem
@@ -789,35 +898,48 @@ async def update_carregamento(
     # Vamos passar dict com os campos mapeados.
     
     carregamento_updated = carregamento_crud.update(db, db_obj=carregamento, obj_in=update_data)
-    # Hydrate Response
-    if carregamento_updated.armazem_destino_id:
-        from app.models.armazem import Armazem
-        from app.schemas.carregamento import CarregamentoRead
-        armazem_obj = db.get(Armazem, carregamento_updated.armazem_destino_id)
-        if armazem_obj:
-             carregamento_dict = {c.name: getattr(carregamento_updated, c.name) for c in carregamento_updated.__table__.columns}
-             carregamento_dict.update({
-                 'cnpj_destinatario': armazem_obj.cnpj,
-                 'nome_destinatario': armazem_obj.nome,
-                 'logradouro_destinatario': armazem_obj.logradouro,
-                 'numero_destinatario': armazem_obj.numero,
-                 'bairro_destinatario': armazem_obj.bairro,
-                 'municipio_destinatario': armazem_obj.municipio,
-                 'uf_destinatario': armazem_obj.uf,
-                 'cep_destinatario': armazem_obj.cep,
-                 'inscricao_estadual_destinatario': armazem_obj.inscricao_estadual
-             })
-             
-             return CarregamentoRead(**carregamento_dict)
-
+    _publicar_carregamento('carregamento.atualizado', carregamento_updated)
     return carregamento_updated
 
 
+@router.delete('/{id}', status_code=status.HTTP_204_NO_CONTENT)
+async def delete_carregamento(
+    id: int,
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Exclui um carregamento (somente gestores). Carregamentos com NF-e emitida
+    não podem ser excluídos: a nota precisa ser cancelada na SEFAZ antes.
+    """
+    if current_user.base_role not in ['manager', 'owner', 'system_admin']:
+        raise HTTPException(status_code=403, detail="Sem permissão para excluir carregamentos")
+
+    carregamento = await db.run_sync(carregamento_crud.get, id=id)
+    if not carregamento or (
+        current_user.base_role != 'system_admin' and carregamento.group_id != current_user.group_id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Carregamento não encontrado",
+        )
+    if carregamento.nfe_ref and carregamento.nfe_status not in (None, 'erro', 'cancelado'):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Carregamento com NF-e emitida não pode ser excluído",
+        )
+
+    group_id = carregamento.group_id
+    await db.run_sync(carregamento_crud.remove, db_obj=carregamento)
+    publicar_evento(group_id, 'carregamento.removido', {'id': id})
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.post('/{id}/sync-nfe', response_model=CarregamentoRead)
 async def sync_nfe_status(
     id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Sincroniza o status da NFe com a API Focus NFe.
@@ -826,7 +948,7 @@ async def sync_nfe_status(
     from app.services.focus_nfe import consultar_nfe_focus
     from app.models.group import Group
 
-    carregamento = carregamento_crud.get(db, id=id)
+    carregamento = await db.run_sync(carregamento_crud.get, id=id)
     if not carregamento:
         raise HTTPException(status_code=404, detail="Carregamento não encontrado")
     
@@ -834,7 +956,7 @@ async def sync_nfe_status(
         raise HTTPException(status_code=400, detail="Carregamento não possui referência de NFe para sincronizar")
 
     # Obter Token
-    group_obj = db.get(Group, current_user.group_id)
+    group_obj = await db.get(Group, current_user.group_id)
     # Fallback to env default if group token is missing (useful for dev/homolog)
     from app.core.config import get_settings
     settings = get_settings()
@@ -870,8 +992,9 @@ async def sync_nfe_status(
         }.get(status_nfe, 'erro')
         
         # Update DB
-        carregamento_updated = carregamento_crud.update_nfe_data(
+        carregamento_updated = await _na_sessao(
             db,
+            carregamento_crud.update_nfe_data,
             db_obj=carregamento,
             nfe_status=status_mapeado,
             nfe_protocolo=protocolo,
@@ -880,49 +1003,113 @@ async def sync_nfe_status(
             nfe_danfe_url=danfe_url,
             commit=True
         )
+
+        # Autorizada: guarda DANFE/XML no cache local para os próximos downloads.
+        # O status já foi gravado: falha no cache (disco/download) não derruba a sincronização
+        from app.services.documentos_nfe import armazenar_documentos
+        try:
+            await armazenar_documentos({
+                'nfe_status': status_mapeado,
+                'nfe_chave': chave,
+                'nfe_danfe_url': danfe_url,
+                'nfe_xml_url': xml_url,
+            }, focus_token)
+        except Exception:
+            logger.exception('Falha ao guardar DANFE/XML da NF-e %s no cache local', chave)
+
+        publicar_evento(carregamento_updated.group_id, 'nfe.status', {
+            'id': carregamento_updated.id,
+            'nfe_status': status_mapeado,
+            'nfe_chave': chave,
+            'nfe_protocolo': protocolo,
+        })
         return carregamento_updated
 
     except Exception as e:
-        print(f"Erro Sync NFe: {e}")
+        logger.exception('Erro ao sincronizar NF-e do carregamento %s: %s', id, e)
         raise HTTPException(status_code=500, detail="Erro interno ao sincronizar NFe")
 
 
 @router.get('/{id}/pdf')
 async def download_nfe_pdf(
     id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    request: Request,
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Faz o download do PDF da Nota Fiscal (Proxy).
-    Força o download com Content-Disposition: attachment.
+    Download do PDF da Nota Fiscal (DANFE).
+    NF-e autorizada é servida do cache local (FileResponse com ETag e Range);
+    o proxy para a Focus fica só como fallback.
     """
-    from fastapi.responses import StreamingResponse
-    import httpx
+    return await _servir_documento_nfe(id, 'pdf', request, current_user, db)
+
+
+@router.get('/{id}/xml')
+async def download_nfe_xml(
+    id: int,
+    request: Request,
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Download do XML da Nota Fiscal (mesmo cache do DANFE)"""
+    return await _servir_documento_nfe(id, 'xml', request, current_user, db)
+
+
+async def _servir_documento_nfe(id: int, tipo: str, request: Request, current_user: UsuarioAutenticado, db: AsyncSession):
+    from fastapi.responses import FileResponse
+    from app.core.http_clients import http_clients
     from app.models.group import Group
-    from app.core.config import get_settings
+    from app.services.documentos_nfe import TIPOS_DOCUMENTO, baixar_documento, chave_valida, get_armazenamento
+    from app.services.focus_nfe import focus_base_url
 
-    carregamento = carregamento_crud.get(db, id=id)
+    coluna, media_type = TIPOS_DOCUMENTO[tipo]
+
+    carregamento = await db.run_sync(carregamento_crud.get, id=id)
     if not carregamento:
         raise HTTPException(status_code=404, detail="Carregamento não encontrado")
-    
-    if not carregamento.nfe_danfe_url:
-        raise HTTPException(status_code=404, detail="URL do PDF não disponível. Sincronize o status antes.")
+
+    chave = carregamento.nfe_chave
+    filename = f"NFe-{chave or id}.{tipo}"
+    disposition = 'inline' if tipo == 'pdf' else 'attachment'
+    armazenavel = carregamento.nfe_status == 'autorizado' and chave_valida(chave)
+
+    # 1. Cache local (documento de NF-e autorizada é imutável)
+    if armazenavel:
+        etag = f'"{chave}-{tipo}"'
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        cache_headers = {
+            'ETag': etag,
+            'Cache-Control': 'private, max-age=31536000, immutable',
+        }
+        caminho = get_armazenamento().caminho(chave, tipo)
+        if caminho is None and getattr(carregamento, coluna):
+            # Primeiro acesso (ex: autorizada antes do cache existir): baixa uma vez e guarda
+            group_obj = await db.get(Group, current_user.group_id)
+            focus_token = resolver_token_focus(group_obj.focus_nfe_token if group_obj else None)
+            caminho = await baixar_documento(chave, tipo, getattr(carregamento, coluna), focus_token)
+        if caminho is not None:
+            return FileResponse(
+                caminho,
+                media_type=media_type,
+                filename=filename,
+                content_disposition_type=disposition,
+                headers=cache_headers,
+            )
+
+    # 2. Fallback: proxy direto da Focus
+    target_url = getattr(carregamento, coluna)
+    if not target_url:
+        raise HTTPException(status_code=404, detail=f"URL do {tipo.upper()} não disponível. Sincronize o status antes.")
 
     # Obter Token (Logica identica ao sync)
-    group_obj = db.get(Group, current_user.group_id)
-    settings = get_settings()
-    
-    focus_token = ''
-    if group_obj and group_obj.focus_nfe_token:
-            focus_token = group_obj.focus_nfe_token
-    elif settings.FOCUS_NFE_AMBIENTE == 'homologacao':
-            focus_token = settings.FOCUS_NFE_TOKEN
+    group_obj = await db.get(Group, current_user.group_id)
+    focus_token = resolver_token_focus(group_obj.focus_nfe_token if group_obj else None)
 
     # Determine Base URL based on environment
-    base_url = 'https://homologacao.focusnfe.com.br' if settings.FOCUS_NFE_AMBIENTE == 'homologacao' else 'https://api.focusnfe.com.br'
+    base_url = focus_base_url()
     
-    target_url = carregamento.nfe_danfe_url
     if target_url and not target_url.startswith(('http://', 'https://')):
          # Ensure no double slashes if path starts with /
          if target_url.startswith('/'):
@@ -931,34 +1118,29 @@ async def download_nfe_pdf(
               target_url = f"{base_url}/{target_url}"
 
     async def iterfile():
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                # Add Auth Headers
-                auth = (focus_token, "") if focus_token else None
-                
-                async with client.stream("GET", target_url, auth=auth) as response:
-                    if response.status_code != 200:
-                        error_content = await response.read()
-                        print(f"Erro Focus NFe PDF ({response.status_code}): {error_content}")
-                        # Raise here won't propagate nicely in a generator, but logs are critical
-                        # Better to just not yield anything or yield the error text if possible
-                        # Ideally rewrite to not use generator if small, or just accept the log for now.
-                        return
-
-                    response.raise_for_status()
-                    async for chunk in response.aiter_bytes():
-                        yield chunk
-            except Exception as e:
-                print(f"Erro ao baixar PDF da URL externa: {e}")
-                # Log error
-
-    filename = f"NFe-{carregamento.nfe_chave or id}.pdf"
-    
+        # Cliente compartilhado da Focus (conexão keep-alive reaproveitada)
+        client = http_clients.get('focus')
+        try:
+            # Add Auth Headers
+            auth = (focus_token, "") if focus_token else None
+            
+            async with client.stream("GET", target_url, auth=auth) as response:
+                if response.status_code != 200:
+                    error_content = await response.read()
+                    logger.warning('Focus NFe retornou %s ao baixar %s: %s', response.status_code, tipo.upper(), error_content)
+                    # Raise here won't propagate nicely in a generator, but logs are critical
+                    # Better to just not yield anything or yield the error text if possible
+                    # Ideally rewrite to not use generator if small, or just accept the log for now.
+                    return
+
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+        except Exception as e:
+            logger.warning('Erro ao baixar %s da URL externa: %s', tipo.upper(), e)
+
     return StreamingResponse(
         iterfile(),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f'inline; filename="{filename}"'}
+        media_type=media_type,
+        headers={"Content-Disposition": f'{disposition}; filename="{filename}"'}
     )
-
-
-
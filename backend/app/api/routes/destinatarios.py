@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from app.api.deps import get_current_active_user
-from app.models.user import User
+from app.core.usuarios_cache import UsuarioAutenticado
 from app.services.cnpj_service import CNPJService
 
 router = APIRouter()
@@ -8,7 +8,7 @@ router = APIRouter()
 @router.get("/busca")
 async def buscar_cnpj(
     cnpj: str = Query(..., min_length=14, max_length=18, description="CNPJ do destinatário", regex=r'^\d{14}$|^\d{2}\.\d{3}\.\d{3}\/\d{4}-\d{2}$'),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ):
     """
     Busca dados de um CNPJ na receita federal (via API externa).
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_active_user, get_current_stream_user
+from app.core.config import get_settings
+from app.core.eventos import get_eventos
+from app.core.security import create_stream_ticket
+from app.core.usuarios_cache import UsuarioAutenticado
+
+router = APIRouter()
+
+
+@router.post('/ticket')
+def criar_ticket_eventos(current_user: UsuarioAutenticado = Depends(get_current_active_user)):
+    """
+    Ticket curto (EVENTOS_TICKET_EXPIRE_SECONDS) para abrir o feed SSE. Só vale para
+    /eventos/stream, então pode ir na URL sem expor o token de acesso em logs e histórico.
+    Em reconexões (erro no EventSource) o cliente pede um ticket novo.
+    """
+    settings = get_settings()
+    return {
+        'ticket': create_stream_ticket(subject=str(current_user.id), token_version=current_user.token_version),
+        'expires_in': settings.EVENTOS_TICKET_EXPIRE_SECONDS,
+    }
+
+
+@router.get('/stream')
+async def stream_eventos(
+    request: Request,
+    current_user: UsuarioAutenticado = Depends(get_current_stream_user),
+):
+    """
+    Feed Server-Sent Events do grupo do usuário (system_admin recebe todos os grupos).
+    Eventos: carregamento.criado, carregamento.atualizado, carregamentos.importados,
+    nfe.status e resync (cliente atrasado: recarregar a lista).
+    No navegador: POST /api/v1/eventos/ticket e depois
+    new EventSource('/api/v1/eventos/stream?ticket=<ticket>').
+    """
+    settings = get_settings()
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+
+    async def gerar():
+        async with get_eventos().assinar(group_id) as fila:
+            yield 'retry: 3000\n\n'
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    evento = await asyncio.wait_for(fila.get(), timeout=settings.EVENTOS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentário SSE: mantém a conexão viva em proxies
+                    yield ': ping\n\n'
+                    continue
+                dados = json.dumps(evento['dados'], ensure_ascii=False, default=str)
+                yield f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+    return StreamingResponse(
+        gerar(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
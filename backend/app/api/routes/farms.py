@@ -2,9 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_system_admin, get_current_active_user
+from app.core.usuarios_cache import UsuarioAutenticado
 from app.crud import farm as farm_crud
 from app.db.session import get_db
-from app.models.user import User
 from app.schemas.farm import FarmCreate, FarmRead
 from app.schemas.field import FieldCreate, FieldRead, FieldUpdate
 from app.crud import farm as farm_crud
@@ -15,7 +15,7 @@ router = APIRouter()
 
 @router.get('', response_model=list[FarmRead])
 def list_farms(
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> list[FarmRead]:
     from app.models.permissions_enum import BaseRole
@@ -33,7 +33,7 @@ def list_farms(
 @router.post('', response_model=FarmRead, status_code=status.HTTP_201_CREATED)
 def create_farm(
     payload: FarmCreate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> FarmRead:
     # Check for duplicate name within the user's group
@@ -64,7 +64,7 @@ def create_farm(
 @router.delete('/{farm_id}', status_code=status.HTTP_204_NO_CONTENT)
 def delete_farm(
     farm_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
     """
@@ -86,7 +86,7 @@ def delete_farm(
 def create_field(
     farm_id: int,
     payload: FieldCreate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> FieldRead:
     """
@@ -112,7 +112,7 @@ def create_field(
 @router.get('/{farm_id}/fields', response_model=list[FieldRead])
 def list_fields(
     farm_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> list[FieldRead]:
     """
@@ -135,7 +135,7 @@ def update_field(
     farm_id: int,
     field_id: int,
     payload: FieldUpdate,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ) -> FieldRead:
     """
@@ -162,7 +162,7 @@ def update_field(
 def delete_field(
     farm_id: int,
     field_id: int,
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
     db: Session = Depends(get_db),
 ):
     """
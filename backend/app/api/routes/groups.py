@@ -4,10 +4,10 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_active_user, get_current_system_admin
+from app.api.deps import get_current_active_user, get_current_system_admin, get_read_db
+from app.core.usuarios_cache import UsuarioAutenticado
 from app.crud import group as group_crud
 from app.db.session import get_db
-from app.models.user import User
 from app.schemas.group import GroupCreate, GroupRead, GroupUpdate
 from app.schemas.group_with_owner_farm import GroupWithOwnerFarmCreate
 from app.schemas.group_with_farms import GroupWithFarms, FarmInGroup, OwnerInGroup
@@ -20,7 +20,7 @@ router = APIRouter()
 def create_group(
     group_in: GroupCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ) -> GroupRead:
     """Criar um novo grupo (apenas system_admin)"""
     db_group = group_crud.create(db, obj_in=group_in)
@@ -39,7 +39,7 @@ def create_group(
 def create_group_with_owner_farm(
     payload: GroupWithOwnerFarmCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ) -> GroupRead:
     """Criar grupo, owner e fazenda em uma única operação (apenas system_admin)"""
     try:
@@ -70,8 +70,8 @@ def create_group_with_owner_farm(
 
 @router.get('', response_model=List[GroupWithFarms])
 def get_groups(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    db: Session = Depends(get_read_db),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ) -> List[GroupWithFarms]:
     """Listar todos os grupos com suas fazendas e owners (apenas system_admin)"""
     try:
@@ -132,7 +132,7 @@ def get_groups(
 def get_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ) -> GroupWithFarms:
     """Obter um grupo específico com suas fazendas e owner (usuário do grupo ou admin)"""
     # Se não for admin, verificar se o usuário pertence ao grupo solicitado
@@ -192,7 +192,7 @@ def update_group(
     group_id: int,
     group_in: GroupUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ) -> GroupRead:
     """Atualizar um grupo (apenas system_admin)"""
     db_group = group_crud.get(db, group_id=group_id)
@@ -215,7 +215,7 @@ def update_group_full(
     group_id: int,
     payload: dict,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ) -> GroupWithFarms:
     """Atualizar grupo, owner e fazendas completamente (apenas system_admin)"""
     try:
@@ -304,7 +304,7 @@ def update_group_full(
 def delete_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_system_admin),
+    current_user: UsuarioAutenticado = Depends(get_current_system_admin),
 ):
     """Deletar um grupo e todos os seus relacionamentos (apenas system_admin)"""
     db_group = group_crud.get(db, group_id=group_id)
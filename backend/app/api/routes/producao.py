@@ -1,49 +1,54 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from datetime import date
 
-from app.api.deps import get_current_active_user
-from app.db.session import get_db
-from app.models.carregamento import Carregamento
-from app.models.user import User
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_async_read_db, get_current_active_user
+from app.core.usuarios_cache import UsuarioAutenticado
+from app.crud import producao as producao_crud
 
 router = APIRouter()
 
 @router.get('/resumo')
-def get_producao_resumo(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+async def get_producao_resumo(
+    inicio: date | None = Query(None, description="Primeiro dia (inclusivo, fuso PRODUCAO_TIMEZONE)"),
+    fim: date | None = Query(None, description="Último dia (inclusivo)"),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
-    Retorna o resumo da produção:
+    Retorna o resumo da produção do grupo do usuário:
     - Total Colhido (Mockado ou somado de talhões se existisse tabela)
     - Total Carregado (Soma de peso_com_desconto_fazenda dos carregamentos)
     - Saldo (Colhido - Carregado)
+    - Quebras por fazenda, produto, talhão e dia
+
+    Lê o rollup producao_diaria (mantido a cada gravação de carregamento),
+    então o custo não cresce com o histórico de carregamentos.
     """
-    
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+    if group_id is None and current_user.base_role != 'system_admin':
+        quebras = {'por_fazenda': [], 'por_produto': [], 'por_talhao': [], 'por_dia': []}
+    else:
+        quebras = await db.run_sync(producao_crud.resumo, group_id=group_id, inicio=inicio, fim=fim)
+
     # 1. Total Colhido (Mockado por enquanto, pois não temos tabela de colheita detalhada acessível aqui ainda)
-    # Em um cenário real, somaríamos a produção dos talhões.
-    # Vamos assumir um valor fixo ou buscar de algum lugar se o usuário tiver definido.
-    # Para o MVP, vamos retornar um valor alto fixo ou 0 se não tiver nada.
     total_colhido = 0.0
-    
+
     # 2. Total Carregado
     # Soma do peso considerado pela fazenda (peso_com_desconto_fazenda)
-    # Se for nulo, usa quantity (legado) ou 0
-    
-    val_desconto = db.query(func.sum(Carregamento.peso_com_desconto_fazenda)).scalar()
-    total_carregado = float(val_desconto) if val_desconto is not None else 0.0
-    
-    # Se o peso com desconto for 0 (dados antigos), tentar somar quantity
+    # Se o peso com desconto for 0 (dados antigos), usa a soma de quantity
+    total_carregado = sum(item['peso_com_desconto_fazenda'] for item in quebras['por_fazenda'])
     if total_carregado == 0:
-         val_mtd = db.query(func.sum(Carregamento.quantity)).scalar()
-         total_carregado = float(val_mtd) if val_mtd is not None else 0.0
+        total_carregado = sum(item['quantity'] for item in quebras['por_fazenda'])
 
     # 3. Saldo
     saldo = total_colhido - total_carregado
-    
+
     return {
         "total_colhido": total_colhido,
         "total_carregado": total_carregado,
-        "saldo": saldo
+        "saldo": saldo,
+        "total_carregamentos": sum(item['carregamentos'] for item in quebras['por_fazenda']),
+        **quebras,
     }
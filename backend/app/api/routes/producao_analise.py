@@ -0,0 +1,46 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps import get_current_active_user
+from app.core.usuarios_cache import UsuarioAutenticado
+from app.db.session import get_async_db
+from app.services import analise_producao
+
+router = APIRouter()
+
+
+@router.get('/analise')
+async def get_producao_analise(
+    granularidade: str = Query('dia', pattern='^(hora|dia|semana|mes)$'),
+    agrupar_por: str | None = Query(None, pattern='^(fazenda|talhao|produto|destino|armazem)$'),
+    inicio: date | None = Query(None, description="Primeiro dia (inclusivo, fuso PRODUCAO_TIMEZONE)"),
+    fim: date | None = Query(None, description="Último dia (inclusivo)"),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Série temporal da produção do grupo do usuário, por hora/dia/semana/mês e
+    opcionalmente por fazenda, talhão, produto, destino ou armazém:
+    - Volume carregado (peso líquido e pesos com desconto)
+    - Descontos de umidade e impurezas em kg
+    - Diferença de peso fazenda x armazém e fazenda x empresa
+
+    O resultado fica em cache por processo. No worker que gravou o carregamento a
+    invalidação é imediata; nos demais a série pode ficar até ANALISE_CACHE_TTL_SECONDS
+    (padrão 60s) desatualizada.
+    """
+    group_id = None if current_user.base_role == 'system_admin' else current_user.group_id
+    if group_id is None and current_user.base_role != 'system_admin':
+        series = []
+    else:
+        series = await db.run_sync(
+            analise_producao.consultar_com_cache, group_id=group_id, granularidade=granularidade, agrupar_por=agrupar_por, inicio=inicio, fim=fim
+        )
+
+    return {
+        "granularidade": granularidade,
+        "agrupar_por": agrupar_por,
+        "series": series,
+    }
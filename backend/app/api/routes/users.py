@@ -3,9 +3,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_user, get_current_system_admin
+from app.core.usuarios_cache import UsuarioAutenticado
 from app.db.session import get_db
 from app.models.user import User
-from app.schemas.user import UserCreate, UserRead
+from app.schemas.user import UserCreate, UserRead, UserUpdate
 from app.crud import user as user_crud
 from app.crud.crud_user_farm_permissions import user_farm_permissions as user_farm_permissions_crud
 from app.models.user_farm_permissions import UserFarmPermissions
@@ -18,7 +19,7 @@ router = APIRouter()
 @router.get('', response_model=List[UserRead])
 def get_group_users(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ) -> List[UserRead]:
     """List all users in the current user's group"""
     # Unless system_admin, can only see own group members
@@ -35,7 +36,7 @@ def get_group_users(
 def create_group_user(
     user_in: UserCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ) -> UserRead:
     """Create a new user within the current user's group"""
     # Enforce Permissions: Only MANAGER, OWNER, or ADMIN can create users
@@ -49,6 +50,34 @@ def create_group_user(
     user = user_crud.create(db, obj_in=user_in)
     return user
 
+@router.patch('/{user_id}', response_model=UserRead)
+def update_group_user(
+    user_id: int,
+    user_in: UserUpdate,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
+) -> UserRead:
+    """Update (or deactivate) a user of the current user's group"""
+    if current_user.base_role not in ['manager', 'owner', 'system_admin']:
+        raise HTTPException(status_code=403, detail="Not authorized to update users")
+
+    target_user = user_crud.get(db, id=user_id)
+    if not target_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if current_user.base_role != 'system_admin' and target_user.group_id != current_user.group_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if target_user.id == current_user.id and user_in.active is False:
+        raise HTTPException(status_code=400, detail="Users cannot deactivate themselves")
+    # Only system_admin can grant system_admin
+    if user_in.base_role == 'system_admin' and current_user.base_role != 'system_admin':
+        raise HTTPException(status_code=403, detail="Not authorized to grant this role")
+
+    if user_in.email and user_in.email.lower() != target_user.email:
+        if user_crud.get_by_email(db, email=user_in.email):
+            raise HTTPException(status_code=409, detail="Email already registered")
+
+    return user_crud.update(db, db_obj=target_user, obj_in=user_in)
+
 # --- Permission Management ---
 
 @router.get('/{user_id}/permissions/{farm_id}', response_model=UserFarmPermissionsRead)
@@ -56,7 +85,7 @@ def get_user_farm_permissions(
     user_id: int,
     farm_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ) -> Any:
     """Get permissions for a specific user on a specific farm"""
     # check access
@@ -85,7 +114,7 @@ def update_user_farm_permissions(
     farm_id: int,
     permission_in: UserFarmPermissionsUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UsuarioAutenticado = Depends(get_current_active_user),
 ) -> Any:
     """Update (or Create) permissions for a user on a farm"""
     if current_user.base_role not in ['manager', 'owner', 'system_admin']:
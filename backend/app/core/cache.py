@@ -0,0 +1,97 @@
+"""Cache em memória de resultados derivados dos carregamentos, invalidado por grupo"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+
+
+class CacheGrupos:
+    """
+    LRU com TTL cujas entradas pertencem a um grupo (tenant). Cada grupo tem uma versão:
+    `invalidar(group_id)` só incrementa a versão, e entradas de versão antiga deixam de
+    valer sem varrer o cache. Entradas de group_id None (visão de todos os grupos,
+    system_admin) são invalidadas por qualquer grupo.
+    As versões são do processo: em outro worker a entrada só cai pelo TTL.
+    """
+
+    def __init__(self, *, ttl: float, max_itens: int):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: OrderedDict[tuple, tuple[float, int, Any]] = OrderedDict()
+        self._versoes: dict[int | None, int] = {}
+        self._lock = threading.Lock()
+
+    def _versao(self, group_id: int | None) -> int:
+        return self._versoes.get(group_id, 0)
+
+    def get(self, group_id: int | None, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            item = self._itens.get((group_id, chave))
+            if item is None:
+                return padrao
+            expira_em, versao, valor = item
+            if expira_em < time.monotonic() or versao != self._versao(group_id):
+                del self._itens[(group_id, chave)]
+                return padrao
+            self._itens.move_to_end((group_id, chave))
+            return valor
+
+    def set(self, group_id: int | None, chave: Hashable, valor: Any) -> None:
+        with self._lock:
+            self._itens[(group_id, chave)] = (time.monotonic() + self.ttl, self._versao(group_id), valor)
+            self._itens.move_to_end((group_id, chave))
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def versao(self, group_id: int | None) -> int:
+        """Versão atual do grupo: ler antes da consulta e passar para `set_se_versao`"""
+        with self._lock:
+            return self._versao(group_id)
+
+    def set_se_versao(self, group_id: int | None, chave: Hashable, valor: Any, versao: int) -> None:
+        """Grava só se nenhuma invalidação aconteceu durante a consulta (evita guardar dado velho)"""
+        with self._lock:
+            if versao != self._versao(group_id):
+                return
+        self.set(group_id, chave, valor)
+
+    def invalidar(self, group_id: int | None) -> None:
+        with self._lock:
+            self._versoes[group_id] = self._versao(group_id) + 1
+            if group_id is not None:
+                self._versoes[None] = self._versao(None) + 1
+
+
+_settings = get_settings()
+cache_carregamentos = CacheGrupos(
+    ttl=_settings.ANALISE_CACHE_TTL_SECONDS, max_itens=_settings.ANALISE_CACHE_MAX_ITENS
+)
+
+_PENDENTES = 'cache_carregamentos_invalidar'
+
+
+def invalidar_apos_commit(db: Session, group_id: int | None) -> None:
+    """
+    Agenda a invalidação do cache do grupo para depois do commit da sessão: invalidar
+    antes do commit deixaria uma janela para outra requisição recolocar o dado antigo.
+    """
+    db.info.setdefault(_PENDENTES, set()).add(group_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_pendentes(session: Session) -> None:
+    for group_id in session.info.pop(_PENDENTES, ()):
+        cache_carregamentos.invalidar(group_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_pendentes(session: Session, previous_transaction: Any) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDENTES, None)
@@ -11,12 +11,32 @@ class Settings(BaseSettings):
     # Obrigatórias
     DATABASE_URL: str
     SECRET_KEY: str
-    # FOCUS_NFE_TOKEN removido - usar token do banco (Group.focus_nfe_token)
 
+    # Pool de conexões (vale para cada engine, sync e async, por processo)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0               # Espera máxima por uma conexão livre
+    DB_POOL_RECYCLE_SECONDS: int = 1800         # Renova conexões antigas (-1 desliga)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000        # 0 desliga
+    DB_APPLICATION_NAME: str = "integra-rural-api"   # Aparece em pg_stat_activity
+
+    # Réplicas de leitura (opcional): relatórios e listagens leem delas quando o atraso permite
+    DATABASE_REPLICA_URLS: list[str] = []
+    REPLICA_MAX_LAG_SECONDS: float = 5.0        # Réplica mais atrasada que isso fica fora até a próxima verificação
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0      # Intervalo entre medições de atraso de cada réplica
+    REPLICA_READ_AFTER_WRITE_SECONDS: float = 10.0   # Após gravar, o grupo lê do primário por esse tempo
 
     # JWT
     ALGORITHM: str = "HS256"                              # ← ESSA FALTAVA!
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    # Cache do usuário autenticado (get_current_user). Alterações via crud_user invalidam na hora
+    # neste processo; em outras instâncias valem no máximo até o TTL
+    AUTH_CACHE_TTL_SECONDS: float = 30.0
+    AUTH_CACHE_MAX_USERS: int = 4096
+    # Custo do bcrypt (hashes com outro custo são regravados no próximo login)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0              # Threads dedicadas ao bcrypt (0 = nº de CPUs)
 
     # Admin inicial (usado só na primeira execução)
     FIRST_SYSTEM_ADMIN_EMAIL: str | None = None
@@ -25,6 +45,60 @@ class Settings(BaseSettings):
     # CORS e outras configs
     BACKEND_CORS_ORIGINS: list[str] = []
     FOCUS_NFE_AMBIENTE: str = "homologacao"
+    FOCUS_NFE_TOKEN: str | None = None          # Fallback só em homologação (produção usa o token do grupo)
+    FOCUS_NFE_BASE_URL: str | None = None       # Sobrescreve a URL da Focus (ex: stand-in local em testes)
+
+    # Fuso usado para agrupar carregamentos por dia no resumo de produção
+    PRODUCAO_TIMEZONE: str = "America/Sao_Paulo"
+    # Cache das consultas de análise (/producao/analise), em memória de cada processo.
+    # Gravações invalidam só o cache do worker que gravou: com vários workers, os outros
+    # podem servir dados de até ANALISE_CACHE_TTL_SECONDS atrás
+    ANALISE_CACHE_TTL_SECONDS: float = 60.0
+    ANALISE_CACHE_MAX_ITENS: int = 512
+    # Acima disso o PUT /armazens só grava os parâmetros e o recálculo dos carregamentos
+    # roda depois da resposta, em sessão própria
+    ARMAZEM_RECALCULO_SINCRONO_MAX: int = 5000
+
+    # Feed SSE (/eventos/stream)
+    EVENTOS_KEEPALIVE_SECONDS: float = 15.0
+    EVENTOS_TICKET_EXPIRE_SECONDS: int = 60     # Validade do ticket de conexão (POST /eventos/ticket)
+
+    # Cache local de DANFE/XML das NF-e autorizadas (padrão: backend/storage/nfe)
+    NFE_DOCUMENTOS_DIR: str | None = None
+
+    # Clientes HTTP externos (pool por integração, ver app/core/http_clients.py)
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP2_ENABLED: bool = True                  # Só vale se o pacote h2 estiver instalado
+    FOCUS_NFE_TIMEOUT: float = 30.0
+    FOCUS_NFE_MAX_CONNECTIONS: int = 20
+    BRASILAPI_BASE_URL: str = "https://brasilapi.com.br/api"
+    BRASILAPI_TIMEOUT: float = 10.0
+    BRASILAPI_MAX_CONNECTIONS: int = 10
+
+    # Fila de emissão de NF-e (outbox)
+    NFE_OUTBOX_ENABLED: bool = True             # Sobe o worker junto com a API
+    NFE_OUTBOX_POLL_SECONDS: float = 2.0
+    NFE_OUTBOX_BATCH_SIZE: int = 10
+    NFE_OUTBOX_MAX_ATTEMPTS: int = 5
+    NFE_OUTBOX_LEASE_SECONDS: int = 300         # Reserva "enviando" expirada volta para a fila
+
+    # Reconciliação periódica de status das NF-e (pendente/processando → status final)
+    NFE_RECONCILIACAO_ENABLED: bool = True
+    NFE_RECONCILIACAO_INTERVAL_SECONDS: float = 30.0
+    NFE_RECONCILIACAO_BATCH_SIZE: int = 100
+    NFE_RECONCILIACAO_CONCURRENCY_PER_TOKEN: int = 4   # Consultas simultâneas por token da Focus
+    NFE_RECONCILIACAO_BACKOFF_BASE_SECONDS: float = 15.0
+    NFE_RECONCILIACAO_BACKOFF_MAX_SECONDS: float = 1800.0
+    # Métricas do processo em /metrics (formato Prometheus). Expõem rotas, SQL lento e uso
+    # do pool: desligadas por padrão e, ligadas, exigem METRICS_TOKEN (Bearer) ou system_admin
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: str | None = None
+    # Instrumentação de SQL por requisição (Server-Timing, /metrics e aviso de N+1)
+    SQL_INSTRUMENTATION_ENABLED: bool = True
+    SQL_REPEATED_STATEMENT_THRESHOLD: int = 10  # Mesmo SQL mais vezes que isso na requisição: aviso de N+1
+    SQL_SLOW_STATEMENT_MS: float = 500.0
+
     APP_NAME: str = "Integra Rural API"
     API_V1_STR: str = "/api/v1"
 
@@ -0,0 +1,95 @@
+"""Pub/sub de eventos em tempo real (feed SSE de carregamentos e status de NF-e)"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Protocol
+
+logger = logging.getLogger(__name__)
+
+# Eventos pendentes por assinante; cliente lento demais recebe 'resync' e recarrega a lista
+TAMANHO_FILA = 256
+
+
+class BackendEventos(Protocol):
+    """Backend plugável (em memória; ex: Redis/Postgres LISTEN para várias instâncias)"""
+
+    def publicar(self, group_id: int | None, tipo: str, dados: dict[str, Any]) -> None: ...
+
+    def assinar(self, group_id: int | None) -> Any:
+        """Context manager assíncrono que entrega uma asyncio.Queue de eventos do grupo"""
+        ...
+
+
+class EventosMemoria:
+    """
+    Pub/sub no próprio processo. `publicar` pode ser chamado de qualquer thread
+    (rotas sync rodam no threadpool): a entrega vai para o loop de cada assinante.
+    Assinante com group_id None (system_admin) recebe eventos de todos os grupos.
+    """
+
+    def __init__(self) -> None:
+        self._assinantes: dict[int | None, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def publicar(self, group_id: int | None, tipo: str, dados: dict[str, Any]) -> None:
+        evento = {'id': next(self._seq), 'tipo': tipo, 'group_id': group_id, 'dados': dados}
+        with self._lock:
+            destinos = list(self._assinantes.get(group_id, ()))
+            if group_id is not None:
+                destinos += self._assinantes.get(None, ())
+        for loop, fila in destinos:
+            try:
+                loop.call_soon_threadsafe(self._entregar, fila, evento)
+            except RuntimeError:
+                pass  # Loop do assinante já encerrado
+
+    @staticmethod
+    def _entregar(fila: asyncio.Queue, evento: dict[str, Any]) -> None:
+        try:
+            fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Descarta o atraso e pede para o cliente recarregar o estado completo
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait({'id': evento['id'], 'tipo': 'resync', 'group_id': evento['group_id'], 'dados': {}})
+
+    @asynccontextmanager
+    async def assinar(self, group_id: int | None) -> AsyncIterator[asyncio.Queue]:
+        assinante = (asyncio.get_running_loop(), asyncio.Queue(maxsize=TAMANHO_FILA))
+        with self._lock:
+            self._assinantes.setdefault(group_id, set()).add(assinante)
+        try:
+            yield assinante[1]
+        finally:
+            with self._lock:
+                grupo = self._assinantes.get(group_id)
+                if grupo is not None:
+                    grupo.discard(assinante)
+                    if not grupo:
+                        del self._assinantes[group_id]
+
+
+_backend: BackendEventos = EventosMemoria()
+
+
+def get_eventos() -> BackendEventos:
+    return _backend
+
+
+def configurar_backend(backend: BackendEventos) -> None:
+    """Troca o backend de pub/sub (ex: na inicialização, para um backend distribuído)"""
+    global _backend
+    _backend = backend
+
+
+def publicar_evento(group_id: int | None, tipo: str, dados: dict[str, Any]) -> None:
+    """Publica sem nunca derrubar a operação que gerou o evento"""
+    try:
+        _backend.publicar(group_id, tipo, dados)
+    except Exception:
+        logger.exception('Falha ao publicar evento %s', tipo)
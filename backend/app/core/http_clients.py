@@ -0,0 +1,102 @@
+"""Clientes HTTP compartilhados: um pool de conexões (keep-alive) por integração externa"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+
+import httpx
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# h2 está no requirements.txt; a checagem cobre ambientes instalados sem ele (cai para HTTP/1.1)
+HTTP2_DISPONIVEL = importlib.util.find_spec('h2') is not None
+
+
+def _config_upstreams() -> dict[str, dict]:
+    settings = get_settings()
+    from app.services.focus_nfe import focus_base_url
+
+    return {
+        'focus': {
+            'base_url': focus_base_url(),
+            'timeout': settings.FOCUS_NFE_TIMEOUT,
+            'max_connections': settings.FOCUS_NFE_MAX_CONNECTIONS,
+        },
+        'brasilapi': {
+            'base_url': settings.BRASILAPI_BASE_URL,
+            'timeout': settings.BRASILAPI_TIMEOUT,
+            'max_connections': settings.BRASILAPI_MAX_CONNECTIONS,
+        },
+    }
+
+
+class HttpClients:
+    """
+    Registro de httpx.AsyncClient por upstream ('focus', 'brasilapi').
+    Criados no lifespan da API e fechados no shutdown; fora dela (scripts, worker
+    em processo separado) são criados sob demanda no primeiro uso.
+    """
+
+    def __init__(self) -> None:
+        self._clients: dict[str, tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+        self._fechando: set[asyncio.Task] = set()
+
+    def _criar(self, nome: str) -> httpx.AsyncClient:
+        settings = get_settings()
+        config = _config_upstreams()[nome]
+        return httpx.AsyncClient(
+            base_url=config['base_url'],
+            timeout=httpx.Timeout(config['timeout'], connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=config['max_connections'],
+                max_keepalive_connections=config['max_connections'],
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            http2=settings.HTTP2_ENABLED and HTTP2_DISPONIVEL,
+        )
+
+    def get(self, nome: str) -> httpx.AsyncClient:
+        """Cliente do upstream `nome` para o event loop atual"""
+        loop = asyncio.get_running_loop()
+        atual = self._clients.get(nome)
+        # Conexões ficam presas ao loop em que foram abertas
+        if atual is None or atual[1] is not loop or atual[0].is_closed:
+            if atual is not None and not atual[0].is_closed:
+                self._descartar(*atual)
+            atual = (self._criar(nome), loop)
+            self._clients[nome] = atual
+        return atual[0]
+
+    def _descartar(self, client: httpx.AsyncClient, loop: asyncio.AbstractEventLoop) -> None:
+        """Fecha o pool de um cliente substituído por troca de event loop"""
+        if loop.is_running() and not loop.is_closed():
+            # Loop antigo segue ativo (outra thread): fecha lá, onde as conexões foram abertas
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        tarefa = asyncio.get_running_loop().create_task(self._fechar_cliente(client))
+        self._fechando.add(tarefa)
+        tarefa.add_done_callback(self._fechando.discard)
+
+    @staticmethod
+    async def _fechar_cliente(client: httpx.AsyncClient) -> None:
+        try:
+            await client.aclose()
+        except Exception as exc:
+            # Loop antigo já encerrado: os sockets dele são liberados pelo GC
+            logger.debug('Falha ao fechar cliente HTTP de um event loop encerrado: %s', exc)
+
+    async def iniciar(self) -> None:
+        for nome in _config_upstreams():
+            self.get(nome)
+        logger.info('Clientes HTTP iniciados (http2=%s)', get_settings().HTTP2_ENABLED and HTTP2_DISPONIVEL)
+
+    async def fechar(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client, _ in clients.values():
+            await client.aclose()
+
+
+http_clients = HttpClients()
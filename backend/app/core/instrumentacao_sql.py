@@ -0,0 +1,129 @@
+"""
+Instrumentação de SQL por requisição: nº de consultas, tempo total no banco e consulta
+mais lenta, expostos no header Server-Timing e em /metrics. Avisa quando o mesmo SQL
+se repete muitas vezes na mesma requisição (padrão N+1).
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+from app.core.metricas import metricas
+
+logger = logging.getLogger(__name__)
+
+consultas_por_requisicao = metricas.histograma(
+    'http_request_db_queries',
+    'Consultas SQL executadas por requisição',
+    limites=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+tempo_banco_por_requisicao = metricas.histograma(
+    'http_request_db_seconds',
+    'Tempo total em consultas SQL por requisição',
+)
+consultas_repetidas = metricas.contador(
+    'http_request_repeated_statements_total',
+    'Requisições em que o mesmo SQL passou do limite de repetições (possível N+1)',
+)
+
+
+@dataclass(slots=True)
+class EstatisticasSQL:
+    consultas: int = 0
+    tempo: float = 0.0
+    mais_lenta: float = 0.0
+    sql_mais_lenta: str | None = None
+    # Formato do SQL (texto com placeholders) -> execuções
+    formatos: Counter = field(default_factory=Counter)
+
+    def registrar(self, sql: str, duracao: float) -> None:
+        self.consultas += 1
+        self.tempo += duracao
+        self.formatos[sql] += 1
+        if duracao > self.mais_lenta:
+            self.mais_lenta = duracao
+            self.sql_mais_lenta = sql
+
+
+# Objeto mutável: rotas sync (threadpool) e AsyncSession.run_sync (greenlet) recebem cópias
+# do contexto, mas todas apontam para as mesmas estatísticas da requisição
+_estatisticas: ContextVar[EstatisticasSQL | None] = ContextVar('estatisticas_sql', default=None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _estatisticas.get() is not None:
+        context._instrumentacao_inicio = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _depois(conn, cursor, statement, parameters, context, executemany) -> None:
+    estatisticas = _estatisticas.get()
+    inicio = getattr(context, '_instrumentacao_inicio', None)
+    if estatisticas is None or inicio is None:
+        return
+    estatisticas.registrar(statement, time.perf_counter() - inicio)
+
+
+def _server_timing(estatisticas: EstatisticasSQL) -> bytes:
+    return (
+        f'db;dur={estatisticas.tempo * 1000:.1f};desc="{estatisticas.consultas} queries", '
+        f'db-slowest;dur={estatisticas.mais_lenta * 1000:.1f}'
+    ).encode()
+
+
+class InstrumentacaoSQLMiddleware:
+    """Middleware ASGI: abre as estatísticas da requisição e fecha com header + métricas"""
+
+    def __init__(self, app: Any):
+        self.app = app
+        settings = get_settings()
+        self.limite_repeticoes = settings.SQL_REPEATED_STATEMENT_THRESHOLD
+        self.lenta = settings.SQL_SLOW_STATEMENT_MS / 1000
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        estatisticas = EstatisticasSQL()
+        token = _estatisticas.set(estatisticas)
+
+        async def enviar(message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', []), (b'server-timing', _server_timing(estatisticas))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _estatisticas.reset(token)
+            self._fechar(scope, estatisticas)
+
+    def _fechar(self, scope, estatisticas: EstatisticasSQL) -> None:
+        route = scope.get('route')
+        rotulos = {'method': scope['method'], 'route': getattr(route, 'path', 'sem_rota')}
+        consultas_por_requisicao.observar(estatisticas.consultas, **rotulos)
+        tempo_banco_por_requisicao.observar(estatisticas.tempo, **rotulos)
+
+        if estatisticas.sql_mais_lenta and estatisticas.mais_lenta >= self.lenta:
+            logger.warning(
+                'SQL lento em %s %s (%.0f ms): %s',
+                rotulos['method'], rotulos['route'], estatisticas.mais_lenta * 1000, estatisticas.sql_mais_lenta,
+            )
+        if estatisticas.formatos:
+            sql, vezes = estatisticas.formatos.most_common(1)[0]
+            if vezes > self.limite_repeticoes:
+                consultas_repetidas.incrementar(**rotulos)
+                logger.warning(
+                    'Possível N+1 em %s %s: mesmo SQL executado %d vezes na requisição: %s',
+                    rotulos['method'], rotulos['route'], vezes, sql,
+                )
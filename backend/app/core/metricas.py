@@ -0,0 +1,118 @@
+"""Métricas do processo expostas em /metrics (formato texto do Prometheus, sem dependência externa)"""
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Callable, Iterable
+
+Rotulos = tuple[tuple[str, str], ...]
+
+# Limites (segundos) pensados para espera por conexão: de sub-milissegundo até o pool_timeout
+LIMITES_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _formatar_rotulos(rotulos: Rotulos, extra: tuple[str, str] | None = None) -> str:
+    pares = [*rotulos, extra] if extra else list(rotulos)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pares) + '}'
+
+
+class Histograma:
+    """Histograma cumulativo por conjunto de rótulos (ex: pool="sync")"""
+
+    def __init__(self, nome: str, descricao: str, limites: Iterable[float] = LIMITES_SEGUNDOS):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = tuple(sorted(limites))
+        # rótulos -> [contagens por faixa (+Inf no fim), soma, total]
+        self._series: dict[Rotulos, list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][bisect.bisect_left(self.limites, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self) -> list[str]:
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} histogram']
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for rotulos, (contagens, soma, total) in series.items():
+            acumulado = 0
+            for limite, contagem in zip((*self.limites, '+Inf'), contagens):
+                acumulado += contagem
+                le = limite if limite == '+Inf' else repr(float(limite))
+                linhas.append(f'{self.nome}_bucket{_formatar_rotulos(rotulos, ("le", le))} {acumulado}')
+            linhas.append(f'{self.nome}_sum{_formatar_rotulos(rotulos)} {soma}')
+            linhas.append(f'{self.nome}_count{_formatar_rotulos(rotulos)} {total}')
+        return linhas
+
+
+class Contador:
+    def __init__(self, nome: str, descricao: str):
+        self.nome = nome
+        self.descricao = descricao
+        self._valores: dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor: float = 1, **rotulos: str) -> None:
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self) -> list[str]:
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} counter']
+        with self._lock:
+            valores = dict(self._valores)
+        linhas += [f'{self.nome}{_formatar_rotulos(r)} {v}' for r, v in valores.items()]
+        return linhas
+
+
+class Medidor:
+    """Gauge lido na hora da coleta: `ler()` devolve {rótulos: valor}"""
+
+    def __init__(self, nome: str, descricao: str, ler: Callable[[], dict[Rotulos, float]]):
+        self.nome = nome
+        self.descricao = descricao
+        self.ler = ler
+
+    def exportar(self) -> list[str]:
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} gauge']
+        linhas += [f'{self.nome}{_formatar_rotulos(r)} {v}' for r, v in self.ler().items()]
+        return linhas
+
+
+class RegistroMetricas:
+    def __init__(self) -> None:
+        self._metricas: dict[str, Histograma | Contador | Medidor] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nome, metrica)
+
+    def histograma(self, nome: str, descricao: str, limites: Iterable[float] = LIMITES_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nome, descricao, limites))
+
+    def contador(self, nome: str, descricao: str) -> Contador:
+        return self._registrar(Contador(nome, descricao))
+
+    def medidor(self, nome: str, descricao: str, ler: Callable[[], dict[Rotulos, float]]) -> Medidor:
+        with self._lock:
+            # Reimportação/recriação do engine: a função de leitura mais recente vale
+            self._metricas[nome] = Medidor(nome, descricao, ler)
+            return self._metricas[nome]
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        return '\n'.join(linha for m in metricas for linha in m.exportar()) + '\n'
+
+
+metricas = RegistroMetricas()
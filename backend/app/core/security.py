@@ -1,3 +1,7 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -6,25 +10,80 @@ from passlib.context import CryptContext
 
 from app.core.config import get_settings
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
+# deprecated='auto' + rounds: hashes com outro custo (ou esquema) aparecem em needs_update
+pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto', bcrypt__rounds=get_settings().BCRYPT_ROUNDS)
+
+# bcrypt é CPU puro (~250 ms no custo 12) e libera o GIL: roda em um pool próprio, limitado
+# ao nº de núcleos, para que um pico de logins não ocupe o threadpool das rotas nem o event loop
+_pool_senhas: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _pool_senhas
+    if _pool_senhas is None:
+        with _pool_lock:
+            if _pool_senhas is None:
+                workers = get_settings().PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+                _pool_senhas = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+    return _pool_senhas
+
+
+def encerrar_pool_senhas() -> None:
+    global _pool_senhas
+    with _pool_lock:
+        if _pool_senhas is not None:
+            _pool_senhas.shutdown(wait=True)
+            _pool_senhas = None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _pool().submit(pwd_context.verify, plain_password, hashed_password).result()
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _pool().submit(pwd_context.hash, password).result()
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """(senha confere, novo hash se o atual usa custo/esquema desatualizado)"""
+    return _pool().submit(pwd_context.verify_and_update, plain_password, hashed_password).result()
+
 
+async def get_password_hash_async(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_pool(), pwd_context.hash, password)
 
-def create_access_token(*, subject: str, expires_delta: timedelta | None = None) -> str:
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    return await asyncio.get_running_loop().run_in_executor(
+        _pool(), pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
+# 'typ' do JWT: tokens de acesso não têm; o ticket do feed SSE só vale para /eventos/stream
+TIPO_TICKET_SSE = 'sse'
+
+
+def create_access_token(*, subject: str, expires_delta: timedelta | None = None, token_version: int = 0) -> str:
     settings = get_settings()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode: dict[str, Any] = {'sub': subject, 'exp': expire}
+    # 'ver': versão de token do usuário; incrementá-la revoga os tokens emitidos antes
+    to_encode: dict[str, Any] = {'sub': subject, 'exp': expire, 'ver': token_version}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+def create_stream_ticket(*, subject: str, token_version: int = 0) -> str:
+    """
+    Ticket curto e de propósito único para abrir o feed SSE: vai na URL do EventSource
+    (que não envia header) no lugar do token de acesso, então pode parar em logs sem risco.
+    """
+    settings = get_settings()
+    expire = datetime.now(timezone.utc) + timedelta(seconds=settings.EVENTOS_TICKET_EXPIRE_SECONDS)
+    to_encode: dict[str, Any] = {'sub': subject, 'exp': expire, 'ver': token_version, 'typ': TIPO_TICKET_SSE}
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
 def decode_access_token(token: str) -> dict[str, Any]:
     settings = get_settings()
     try:
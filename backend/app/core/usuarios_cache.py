@@ -0,0 +1,85 @@
+"""Cache em processo do usuário autenticado: autenticação sem ida ao banco no caminho quente"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from app.core.config import get_settings
+from app.models.permissions_enum import BaseRole
+
+
+@dataclass(frozen=True, slots=True)
+class UsuarioAutenticado:
+    """Snapshot imutável do usuário do token (só os campos que as rotas usam)"""
+    id: int
+    group_id: int
+    name: str
+    cpf: str
+    email: str
+    base_role: BaseRole
+    active: bool
+    created_at: datetime | None
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: Any) -> UsuarioAutenticado:
+        return cls(
+            id=user.id,
+            group_id=user.group_id,
+            name=user.name,
+            cpf=user.cpf,
+            email=user.email,
+            base_role=user.base_role,
+            active=user.active,
+            created_at=user.created_at,
+            token_version=user.token_version,
+        )
+
+
+class CacheUsuarios:
+    """
+    LRU com TTL, uma entrada por usuário, válida só para a versão de token com que foi
+    carregada. TTL curto: limita quanto tempo outra instância da API demora para
+    enxergar uma alteração feita aqui.
+    """
+
+    def __init__(self, *, ttl: float, max_itens: int):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: OrderedDict[int, tuple[float, UsuarioAutenticado]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, token_version: int) -> UsuarioAutenticado | None:
+        with self._lock:
+            item = self._itens.get(user_id)
+            if item is None:
+                return None
+            expira_em, usuario = item
+            if expira_em < time.monotonic() or usuario.token_version != token_version:
+                del self._itens[user_id]
+                return None
+            self._itens.move_to_end(user_id)
+            return usuario
+
+    def set(self, usuario: UsuarioAutenticado) -> None:
+        with self._lock:
+            self._itens[usuario.id] = (time.monotonic() + self.ttl, usuario)
+            self._itens.move_to_end(usuario.id)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, user_id: int) -> None:
+        with self._lock:
+            self._itens.pop(user_id, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+_settings = get_settings()
+usuarios_cache = CacheUsuarios(ttl=_settings.AUTH_CACHE_TTL_SECONDS, max_itens=_settings.AUTH_CACHE_MAX_USERS)
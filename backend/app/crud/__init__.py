@@ -3,8 +3,13 @@ from .crud_group import group  # noqa: F401
 from .crud_carregamento import carregamento  # noqa: F401
 from .crud_farm import farm  # noqa: F401
 from .crud_field import field  # noqa: F401
+from .crud_carregamento_sugestao import carregamento_sugestao  # noqa: F401
+from .crud_nfe_emissao import nfe_emissao  # noqa: F401
+from .crud_producao import producao  # noqa: F401
+from .crud_permissoes_efetivas import permissoes_efetivas  # noqa: F401
+from .crud_armazem import armazem  # noqa: F401
 
-__all__ = ['user', 'group', 'carregamento', 'farm', 'field']
+__all__ = ['user', 'group', 'carregamento', 'farm', 'field', 'carregamento_sugestao', 'nfe_emissao', 'producao', 'permissoes_efetivas', 'armazem']
 
 
 
@@ -0,0 +1,42 @@
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.armazem import Armazem
+from app.schemas.armazem import normalizar_cnpj
+
+
+class CRUDArmazem:
+    def get_by_cnpj(self, db: Session, *, cnpj: str | None) -> Armazem | None:
+        cnpj = normalizar_cnpj(cnpj)
+        if cnpj is None:
+            return None
+        return db.execute(select(Armazem).where(Armazem.cnpj == cnpj)).scalar_one_or_none()
+
+    def get_or_create_by_cnpj(self, db: Session, *, cnpj: str, dados: dict[str, Any]) -> tuple[Armazem, bool]:
+        """
+        Armazém do CNPJ, cadastrando com `dados` se ainda não existe (sem commit).
+        Retorna (armazém, criado). Duas requisições com o mesmo CNPJ novo podem passar
+        juntas pela consulta: o insert vai num savepoint e quem perder no índice único
+        (uq_armazens_cnpj) relê o armazém gravado pela outra, sem derrubar a transação.
+        """
+        cnpj = normalizar_cnpj(cnpj)
+        existente = self.get_by_cnpj(db, cnpj=cnpj)
+        if existente is not None:
+            return existente, False
+
+        novo = Armazem(**{**dados, 'cnpj': cnpj})
+        try:
+            with db.begin_nested():
+                db.add(novo)
+        except IntegrityError:
+            existente = self.get_by_cnpj(db, cnpj=cnpj)
+            if existente is None:
+                raise
+            return existente, False
+        return novo, True
+
+
+armazem = CRUDArmazem()
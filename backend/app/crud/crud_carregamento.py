@@ -1,12 +1,58 @@
 from __future__ import annotations
 
-from typing import Sequence
+import base64
+import json
+from datetime import datetime
+from typing import Any, Iterator, Sequence
 
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, Select, or_, select, tuple_
+from sqlalchemy.orm import Session, selectinload
 
+from app.core.cache import invalidar_apos_commit
+from app.crud.crud_carregamento_sugestao import SUGESTAO_CAMPOS, carregamento_sugestao
+from app.crud.crud_producao import producao
 from app.models.carregamento import Carregamento
-from app.schemas.carregamento import CarregamentoCreate
+from app.models.group import Group
+from app.models.nfe_emissao import NfeEmissao
+from app.schemas.carregamento import CarregamentoCreate, CarregamentoFiltro
+
+
+_DATETIME_SORTS = {'created_at', 'scheduled_at'}
+
+_SORT_COLUMNS = {
+    'created_at': Carregamento.created_at,
+    'scheduled_at': Carregamento.scheduled_at,
+    'farm': Carregamento.farm,
+    'field': Carregamento.field,
+    'product': Carregamento.product,
+    'truck': Carregamento.truck,
+    'driver': Carregamento.driver,
+    'destination': Carregamento.destination,
+    'quantity': Carregamento.quantity,
+}
+
+
+def _encode_cursor(sort: str, value: Any, id: int) -> str:
+    """Gera o cursor opaco (base64 url-safe) a partir da última linha da página"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({'s': sort, 'v': value, 'i': id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, sort: str) -> tuple[Any, int]:
+    """Decodifica o cursor gerado por _encode_cursor. Levanta ValueError se inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = data['v'], int(data['i'])
+        if data['s'] != sort:
+            raise ValueError('cursor gerado para outra ordenação')
+        if sort.removeprefix('-') in _DATETIME_SORTS:
+            value = datetime.fromisoformat(value)
+        return value, last_id
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError('Cursor de paginação inválido') from exc
 
 
 class CRUDCarregamento:
@@ -16,6 +62,8 @@ class CRUDCarregamento:
             truck=obj_in.truck,
             driver=obj_in.driver,
             farm=obj_in.farm,
+            farm_id=obj_in.farm_id,
+            group_id=obj_in.group_id,
             field=obj_in.field,
             product=obj_in.product,
             quantity=obj_in.quantity,
@@ -43,6 +91,9 @@ class CRUDCarregamento:
             peso_com_desconto_empresa=obj_in.peso_com_desconto_empresa,
         )
         db.add(db_obj)
+        carregamento_sugestao.registrar(db, group_id=db_obj.group_id, novos=self._valores_sugestao(db_obj))
+        producao.registrar(db, novos=[producao.valores(db_obj)])
+        invalidar_apos_commit(db, db_obj.group_id)
         if commit:
             db.commit()
             db.refresh(db_obj)
@@ -50,9 +101,14 @@ class CRUDCarregamento:
             db.flush()  # Para obter o ID sem fazer commit
         return db_obj
 
+    @staticmethod
+    def _valores_sugestao(db_obj: Carregamento) -> dict[str, str | None]:
+        return {campo: getattr(db_obj, campo) for campo in SUGESTAO_CAMPOS}
+
     def get(self, db: Session, id: int) -> Carregamento | None:
         """Busca um carregamento por ID"""
-        return db.execute(select(Carregamento).where(Carregamento.id == id)).scalar_one_or_none()
+        stmt = select(Carregamento).options(selectinload(Carregamento.armazem_destino)).where(Carregamento.id == id)
+        return db.execute(stmt).scalar_one_or_none()
 
     def update_nfe_data(
         self,
@@ -89,17 +145,164 @@ class CRUDCarregamento:
             db.flush()
         return db_obj
 
-    def get_multi(self, db: Session, skip: int = 0, limit: int = 100, farm_names: list[str] | None = None) -> Sequence[Carregamento]:
-        """Lista todos os carregamentos, opcionalmente filtrando por lista de nomes de fazendas"""
-        stmt = select(Carregamento).order_by(Carregamento.created_at.desc())
-        
-        if farm_names is not None:
-             stmt = stmt.where(Carregamento.farm.in_(farm_names))
-             
+    def get_nfe_em_aberto(
+        self, db: Session, *, limite: int, ignorar_ids: Sequence[int] = ()
+    ) -> Sequence[Row]:
+        """
+        NF-e já enviadas à Focus aguardando status final (pendente/processando), com o token
+        do grupo: (id, nfe_ref, group_id, focus_nfe_token). Emissões ainda na outbox ficam de fora.
+        """
+        stmt = (
+            select(Carregamento.id, Carregamento.nfe_ref, Carregamento.group_id, Group.focus_nfe_token)
+            .outerjoin(Group, Group.id == Carregamento.group_id)
+            .outerjoin(NfeEmissao, NfeEmissao.carregamento_id == Carregamento.id)
+            .where(
+                Carregamento.nfe_status.in_(('pendente', 'processando')),
+                Carregamento.nfe_ref.is_not(None),
+                or_(NfeEmissao.id.is_(None), NfeEmissao.status == 'enviado'),
+            )
+            .order_by(Carregamento.id)
+            .limit(limite)
+        )
+        if ignorar_ids:
+            stmt = stmt.where(Carregamento.id.not_in(ignorar_ids))
+        return db.execute(stmt).all()
+
+    def update(self, db: Session, *, db_obj: Carregamento, obj_in: dict[str, Any]) -> Carregamento:
+        """Atualiza as colunas presentes em obj_in (chaves que não são colunas são ignoradas)"""
+        antigos = self._valores_sugestao(db_obj)
+        producao_antes = producao.valores(db_obj)
+        columns = Carregamento.__table__.columns.keys()
+        for field, value in obj_in.items():
+            if field in columns and field != 'id':
+                setattr(db_obj, field, value)
+
+        db.add(db_obj)
+        carregamento_sugestao.registrar(
+            db, group_id=db_obj.group_id, novos=self._valores_sugestao(db_obj), antigos=antigos
+        )
+        producao.registrar(db, novos=[producao.valores(db_obj)], antigos=[producao_antes])
+        invalidar_apos_commit(db, db_obj.group_id)
+        db.commit()
+        db.refresh(db_obj)
+        return db_obj
+
+    def remove(self, db: Session, *, db_obj: Carregamento) -> None:
+        """Exclui o carregamento, retirando-o do autocomplete e do rollup de produção"""
+        carregamento_sugestao.registrar(
+            db, group_id=db_obj.group_id, novos={}, antigos=self._valores_sugestao(db_obj)
+        )
+        producao.registrar(db, antigos=[producao.valores(db_obj)])
+        invalidar_apos_commit(db, db_obj.group_id)
+        db.delete(db_obj)
+        db.commit()
+
+    def _build_query(
+        self, *, group_id: int | None, filtro: CarregamentoFiltro, colunas: Sequence[Any] | None = None
+    ) -> Select:
+        """Compila tenancy + filtros + ordenação em um único SELECT (entidades ou só `colunas`)"""
+        if colunas is not None:
+            stmt = select(*colunas)
+        else:
+            # Armazéns de destino de toda a página vêm em um único SELECT ... IN (selectinload)
+            stmt = select(Carregamento).options(selectinload(Carregamento.armazem_destino))
+
+        if group_id is not None:
+            stmt = stmt.where(Carregamento.group_id == group_id)
+
+        if filtro.scheduled_from is not None:
+            stmt = stmt.where(Carregamento.scheduled_at >= filtro.scheduled_from)
+        if filtro.scheduled_to is not None:
+            stmt = stmt.where(Carregamento.scheduled_at < filtro.scheduled_to)
+        if filtro.created_from is not None:
+            stmt = stmt.where(Carregamento.created_at >= filtro.created_from)
+        if filtro.created_to is not None:
+            stmt = stmt.where(Carregamento.created_at < filtro.created_to)
+
+        # Filtros de igualdade simples
+        for name in ('farm', 'farm_id', 'field', 'product', 'truck', 'driver', 'destination', 'armazem_destino_id'):
+            value = getattr(filtro, name)
+            if value is not None:
+                stmt = stmt.where(getattr(Carregamento, name) == value)
+
+        if filtro.type:
+            stmt = stmt.where(Carregamento.type.in_(filtro.type))
+        if filtro.nfe_status:
+            stmt = stmt.where(Carregamento.nfe_status.in_(filtro.nfe_status))
+
+        # Ordenação com desempate por id (determinística e compatível com keyset)
+        column = _SORT_COLUMNS[filtro.sort.removeprefix('-')]
+        if filtro.sort.startswith('-'):
+            return stmt.order_by(column.desc(), Carregamento.id.desc())
+        return stmt.order_by(column.asc(), Carregamento.id.asc())
+
+    def get_multi(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        group_id: int | None = None,
+        filtro: CarregamentoFiltro | None = None,
+    ) -> Sequence[Carregamento]:
+        """Lista carregamentos (offset), opcionalmente restritos ao grupo (tenant)"""
+        stmt = self._build_query(group_id=group_id, filtro=filtro or CarregamentoFiltro())
         stmt = stmt.offset(skip).limit(limit)
-        
+
         return db.execute(stmt).scalars().all()
 
+    def get_page(
+        self,
+        db: Session,
+        *,
+        cursor: str | None = None,
+        limit: int = 100,
+        group_id: int | None = None,
+        filtro: CarregamentoFiltro | None = None,
+    ) -> tuple[Sequence[Carregamento], str | None]:
+        """
+        Paginação por keyset em (coluna de ordenação, id). Para a ordenação padrão usa o
+        índice ix_carregamentos_group_created_at_id: o custo de cada página é constante,
+        independente da profundidade, e as linhas não "pulam" entre páginas quando
+        novos carregamentos são inseridos.
+        Retorna (linhas, next_cursor); next_cursor é None na última página.
+        """
+        filtro = filtro or CarregamentoFiltro()
+        stmt = self._build_query(group_id=group_id, filtro=filtro)
+
+        if cursor:
+            value, last_id = _decode_cursor(cursor, filtro.sort)
+            key = tuple_(_SORT_COLUMNS[filtro.sort.removeprefix('-')], Carregamento.id)
+            stmt = stmt.where(key < (value, last_id) if filtro.sort.startswith('-') else key > (value, last_id))
+
+        # Busca uma linha a mais só para saber se existe próxima página
+        rows = db.execute(stmt.limit(limit + 1)).scalars().all()
+        if len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, _encode_cursor(filtro.sort, getattr(last, filtro.sort.removeprefix('-')), last.id)
+
+    def stream_rows(
+        self,
+        db: Session,
+        *,
+        colunas: Sequence[Any],
+        group_id: int | None = None,
+        filtro: CarregamentoFiltro | None = None,
+        batch_size: int = 2000,
+    ) -> Iterator[Row]:
+        """
+        Itera as linhas filtradas via cursor no servidor (stream_results + yield_per):
+        só `batch_size` tuplas ficam em memória por vez, sem montar objetos ORM.
+        """
+        stmt = self._build_query(group_id=group_id, filtro=filtro or CarregamentoFiltro(), colunas=colunas)
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+        try:
+            yield from result
+        finally:
+            result.close()
+
 
 carregamento = CRUDCarregamento()
 
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+from typing import Mapping
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db.replicas import marcar_escrita_apos_commit
+from app.models.carregamento_sugestao import CarregamentoSugestao
+
+# Campos do carregamento que alimentam o autocomplete
+SUGESTAO_CAMPOS = ('truck', 'driver', 'product', 'field', 'destination', 'unit')
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class CRUDCarregamentoSugestao:
+    def registrar(
+        self,
+        db: Session,
+        *,
+        group_id: int | None,
+        novos: Mapping[str, str | None],
+        antigos: Mapping[str, str | None] | None = None,
+    ) -> None:
+        """
+        Atualiza o índice com os valores de um carregamento criado/alterado.
+        Valores substituídos (antigos) perdem uma ocorrência. Não faz commit:
+        roda dentro da transação do próprio carregamento.
+        """
+        if group_id is None:
+            return
+
+        deltas: Counter[tuple[str, str]] = Counter()
+        for campo in SUGESTAO_CAMPOS:
+            novo = novos.get(campo)
+            antigo = antigos.get(campo) if antigos is not None else None
+            if novo == antigo:
+                continue
+            if novo:
+                deltas[(campo, novo)] += 1
+            if antigo:
+                deltas[(campo, antigo)] -= 1
+
+        self.aplicar_deltas(db, group_id=group_id, deltas=deltas)
+
+    def aplicar_deltas(self, db: Session, *, group_id: int, deltas: Mapping[tuple[str, str], int]) -> None:
+        """Aplica incrementos (upsert) e decrementos em lote, um executemany para cada"""
+        agora = datetime.utcnow()
+        incrementos = [
+            {
+                'group_id': group_id,
+                'campo': campo,
+                'valor': valor,
+                'valor_normalizado': valor.lower(),
+                'frequencia': delta,
+                'ultimo_uso': agora,
+            }
+            for (campo, valor), delta in deltas.items()
+            if delta > 0
+        ]
+        decrementos = [
+            {'b_group_id': group_id, 'b_campo': campo, 'b_valor': valor, 'b_delta': -delta}
+            for (campo, valor), delta in deltas.items()
+            if delta < 0
+        ]
+
+        if incrementos or decrementos:
+            marcar_escrita_apos_commit(db, [group_id])
+
+        if incrementos:
+            stmt = pg_insert(CarregamentoSugestao)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['group_id', 'campo', 'valor'],
+                set_={
+                    'frequencia': CarregamentoSugestao.frequencia + stmt.excluded.frequencia,
+                    'ultimo_uso': stmt.excluded.ultimo_uso,
+                },
+            )
+            db.execute(stmt, incrementos)
+
+        if decrementos:
+            table = CarregamentoSugestao.__table__
+            stmt = (
+                update(table)
+                .where(
+                    table.c.group_id == bindparam('b_group_id'),
+                    table.c.campo == bindparam('b_campo'),
+                    table.c.valor == bindparam('b_valor'),
+                )
+                .values(frequencia=func.greatest(table.c.frequencia - bindparam('b_delta'), 0))
+            )
+            db.connection().execute(stmt, decrementos)
+
+    def buscar(
+        self,
+        db: Session,
+        *,
+        group_id: int | None,
+        campo: str,
+        q: str | None = None,
+        limit: int = 50,
+    ) -> list[str]:
+        """Sugestões do campo, por prefixo (case-insensitive), das mais usadas para as menos usadas"""
+        frequencia = CarregamentoSugestao.frequencia
+        if group_id is None:
+            # system_admin: agrega os índices de todos os grupos
+            frequencia = func.sum(CarregamentoSugestao.frequencia)
+
+        stmt = select(CarregamentoSugestao.valor).where(
+            CarregamentoSugestao.campo == campo,
+            CarregamentoSugestao.frequencia > 0,
+        )
+        if group_id is not None:
+            stmt = stmt.where(CarregamentoSugestao.group_id == group_id)
+        else:
+            stmt = stmt.group_by(CarregamentoSugestao.valor)
+        if q:
+            stmt = stmt.where(
+                CarregamentoSugestao.valor_normalizado.like(_escape_like(q.lower()) + '%', escape='\\')
+            )
+
+        stmt = stmt.order_by(frequencia.desc(), CarregamentoSugestao.valor).limit(limit)
+        return list(db.execute(stmt).scalars().all())
+
+
+carregamento_sugestao = CRUDCarregamentoSugestao()
@@ -5,6 +5,7 @@ from typing import Sequence
 from sqlalchemy import select
 from sqlalchemy.orm import Session, joinedload
 
+from app.core.usuarios_cache import usuarios_cache
 from app.models.group import Group
 from app.models.user import User
 from app.models.permissions_enum import BaseRole
@@ -191,6 +192,8 @@ class CRUDGroup:
                     db_owner.email = owner_email.lower()
                 if owner_password is not None:
                     db_owner.password_hash = get_password_hash(owner_password)
+                    # Mesma regra de crud_user.update: troca de senha revoga os tokens emitidos
+                    db_owner.token_version += 1
                 db.add(db_owner)
                 db.flush()
 
@@ -251,6 +254,9 @@ class CRUDGroup:
             db.flush()
 
         db.commit()
+        if db_group.owner_id:
+            # Dados do owner mudaram: descarta o usuário autenticado em cache neste processo
+            usuarios_cache.invalidar(db_group.owner_id)
         db.refresh(db_group)
         return db_group
 
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.models.carregamento import Carregamento
+from app.models.group import Group
+from app.models.nfe_emissao import NfeEmissao
+
+
+class CRUDNfeEmissao:
+    def enfileirar(
+        self,
+        db: Session,
+        *,
+        carregamento_id: int,
+        group_id: int | None,
+        referencia: str,
+        payload: dict[str, Any],
+    ) -> NfeEmissao:
+        """Grava a emissão na outbox. Não faz commit: entra na transação do carregamento"""
+        db_obj = NfeEmissao(
+            carregamento_id=carregamento_id,
+            group_id=group_id,
+            referencia=referencia,
+            payload=payload,
+            status='pendente',
+            tentativas=0,
+            proxima_tentativa_em=datetime.now(timezone.utc),
+        )
+        db.add(db_obj)
+        db.flush()
+        return db_obj
+
+    def reservar(self, db: Session, *, limite: int, lease_segundos: int) -> list[dict[str, Any]]:
+        """
+        Reserva até `limite` emissões prontas (FOR UPDATE SKIP LOCKED: várias instâncias
+        do worker não pegam a mesma linha) e marca como 'enviando'. O lock dura só esta
+        transação curta; a chamada à Focus acontece depois, sem transação aberta.
+        Reservas com mais de `lease_segundos` (worker morreu no meio) voltam a ser elegíveis.
+        """
+        agora = datetime.now(timezone.utc)
+        stmt = (
+            select(NfeEmissao, Group.focus_nfe_token)
+            .outerjoin(Group, Group.id == NfeEmissao.group_id)
+            .where(or_(
+                and_(NfeEmissao.status == 'pendente', NfeEmissao.proxima_tentativa_em <= agora),
+                and_(
+                    NfeEmissao.status == 'enviando',
+                    NfeEmissao.reservado_em < agora - timedelta(seconds=lease_segundos),
+                ),
+            ))
+            .order_by(NfeEmissao.id)
+            .limit(limite)
+            .with_for_update(skip_locked=True, of=NfeEmissao)
+        )
+
+        reservadas = []
+        for emissao, group_token in db.execute(stmt).all():
+            emissao.status = 'enviando'
+            emissao.tentativas += 1
+            emissao.reservado_em = agora
+            reservadas.append({
+                'id': emissao.id,
+                'carregamento_id': emissao.carregamento_id,
+                'group_id': emissao.group_id,
+                'referencia': emissao.referencia,
+                'payload': emissao.payload,
+                'tentativas': emissao.tentativas,
+                'group_token': group_token,
+            })
+        db.commit()
+        return reservadas
+
+    def concluir(self, db: Session, *, emissao_id: int, carregamento_id: int, campos_nfe: dict[str, Any]) -> None:
+        """Emissão aceita pela Focus: grava os campos nfe_* no carregamento (sem commit)"""
+        db.execute(
+            update(Carregamento)
+            .where(Carregamento.id == carregamento_id)
+            .values({k: v for k, v in campos_nfe.items() if v is not None})
+        )
+        db.execute(
+            update(NfeEmissao)
+            .where(NfeEmissao.id == emissao_id)
+            .values(status='enviado', enviado_em=datetime.now(timezone.utc), reservado_em=None, ultimo_erro=None)
+        )
+
+    def registrar_falha(
+        self,
+        db: Session,
+        *,
+        emissao_id: int,
+        carregamento_id: int,
+        erro: str,
+        proxima_tentativa_em: datetime | None,
+    ) -> None:
+        """
+        Falha no envio (sem commit). Com `proxima_tentativa_em` volta para a fila;
+        sem (tentativas esgotadas ou erro definitivo) o carregamento fica com nfe_status 'erro'.
+        """
+        valores: dict[str, Any] = {'ultimo_erro': erro[:2000], 'reservado_em': None}
+        if proxima_tentativa_em is not None:
+            valores.update(status='pendente', proxima_tentativa_em=proxima_tentativa_em)
+        else:
+            valores.update(status='erro')
+            db.execute(update(Carregamento).where(Carregamento.id == carregamento_id).values(nfe_status='erro'))
+        db.execute(update(NfeEmissao).where(NfeEmissao.id == emissao_id).values(valores))
+
+    def get_by_carregamento(self, db: Session, *, carregamento_id: int) -> NfeEmissao | None:
+        return db.execute(
+            select(NfeEmissao).where(NfeEmissao.carregamento_id == carregamento_id)
+        ).scalar_one_or_none()
+
+
+nfe_emissao = CRUDNfeEmissao()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import event, inspect, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.usuarios_cache import UsuarioAutenticado
+from app.models.farm import Farm
+from app.models.user import User
+from app.models.user_farm_permissions import UserFarmPermissions
+from app.models.user_permissoes_efetivas import UserPermissoesEfetivas
+
+# Papéis que, sem permissão explícita, têm acesso total aos módulos habilitados da fazenda
+PAPEIS_ACESSO_TOTAL = ('owner', 'system_admin', 'manager')
+
+ACESSO_TOTAL = {
+    'read': True, 'create': True, 'update': True, 'delete': True,
+    'dashboard': True, 'manage_weight': True, 'manage_quality': True,
+}
+
+
+def _modulos_habilitados(modules: Any) -> list[str]:
+    if not modules or not isinstance(modules, dict):
+        return []
+    if 'enabled' in modules and isinstance(modules['enabled'], list):
+        return modules['enabled']
+    # Estrutura legada: { module_key: bool }
+    return [k for k, v in modules.items() if v]
+
+
+class CRUDPermissoesEfetivas:
+    def calcular(self, db: Session, *, user_id: int, group_id: int | None, base_role: str) -> tuple[dict, dict]:
+        """
+        Combina papel, módulos das fazendas do grupo e permissões explícitas do usuário
+        (2 consultas). Retorna (modulos consolidados, permissões por fazenda).
+        """
+        if group_id is None:
+            return {}, {}
+        farms = db.execute(select(Farm.id, Farm.modules).where(Farm.group_id == group_id)).all()
+        explicitas = dict(db.execute(
+            select(UserFarmPermissions.farm_id, UserFarmPermissions.allowed_modules)
+            .where(UserFarmPermissions.user_id == user_id)
+        ).all())
+
+        modulos: dict[str, dict] = {}
+        por_fazenda: dict[str, dict] = {}
+        for farm_id, farm_modules in farms:
+            allowed = explicitas.get(farm_id)
+            farm_perms: dict[str, Any] = {}
+            if allowed:
+                farm_perms = allowed
+            elif base_role in PAPEIS_ACESSO_TOTAL:
+                farm_perms = {mod: dict(ACESSO_TOTAL) for mod in _modulos_habilitados(farm_modules)}
+            # Papel operacional só enxerga o que foi liberado explicitamente
+            if base_role == 'operational' and farm_id not in explicitas:
+                farm_perms = {}
+
+            por_fazenda[str(farm_id)] = farm_perms
+            # Consolidado: OR entre as fazendas
+            for mod, perms in farm_perms.items():
+                if not isinstance(perms, dict):
+                    continue
+                if mod not in modulos:
+                    modulos[mod] = perms.copy()
+                else:
+                    for k, v in perms.items():
+                        if v is True:
+                            modulos[mod][k] = True
+        return modulos, por_fazenda
+
+    def get(self, db: Session, *, user: UsuarioAutenticado) -> UserPermissoesEfetivas:
+        """
+        Permissões efetivas do usuário (consulta por chave primária). Recalcula e grava
+        se ainda não existem ou foram invalidadas. A gravação fica num savepoint da
+        transação do chamador, que decide quando commitar (não encerra a transação de
+        quem chama no meio de uma atualização).
+        """
+        atual = db.get(UserPermissoesEfetivas, user.id)
+        if atual is not None and atual.modulos is not None:
+            return atual
+
+        versao = atual.versao if atual is not None else 0
+        modulos, por_fazenda = self.calcular(db, user_id=user.id, group_id=user.group_id, base_role=user.base_role)
+        etag = hashlib.sha256(
+            json.dumps(modulos, sort_keys=True, separators=(',', ':')).encode()
+        ).hexdigest()[:32]
+        valores = {'modulos': modulos, 'por_fazenda': por_fazenda, 'etag': etag, 'atualizado_em': datetime.utcnow()}
+
+        with db.begin_nested():
+            if atual is None:
+                db.execute(
+                    pg_insert(UserPermissoesEfetivas)
+                    .values(user_id=user.id, versao=0, **valores)
+                    .on_conflict_do_nothing(index_elements=['user_id'])
+                )
+            else:
+                # Só grava se ninguém invalidou enquanto calculávamos (senão fica para a próxima leitura)
+                db.execute(
+                    update(UserPermissoesEfetivas)
+                    .where(UserPermissoesEfetivas.user_id == user.id, UserPermissoesEfetivas.versao == versao)
+                    .values(**valores)
+                )
+        return UserPermissoesEfetivas(user_id=user.id, versao=versao, **valores)
+
+    def da_fazenda(self, db: Session, *, user: UsuarioAutenticado, farm_id: int) -> dict[str, Any]:
+        """Permissões efetivas do usuário em uma fazenda: { module_key: {...} }"""
+        return (self.get(db, user=user).por_fazenda or {}).get(str(farm_id), {})
+
+    def invalidar(
+        self, db: Session, *, user_ids: Iterable[int] = (), group_ids: Iterable[int] = ()
+    ) -> None:
+        """
+        Marca como desatualizadas as permissões dos usuários (e de todos os usuários dos grupos)
+        na transação corrente: incrementa a versão e limpa o cálculo.
+        """
+        user_ids, group_ids = list(user_ids), list(group_ids)
+        if not user_ids and not group_ids:
+            return
+        tabela = UserPermissoesEfetivas.__table__
+        stmt = pg_insert(tabela).from_select(
+            ['user_id', 'versao', 'atualizado_em'],
+            select(User.id, literal(1), literal(datetime.utcnow())).where(
+                or_(User.id.in_(user_ids), User.group_id.in_(group_ids))
+            ),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={
+                'versao': tabela.c.versao + 1,
+                'modulos': None,
+                'por_fazenda': None,
+                'etag': None,
+                'atualizado_em': stmt.excluded.atualizado_em,
+            },
+        )
+        db.execute(stmt)
+
+
+permissoes_efetivas = CRUDPermissoesEfetivas()
+
+
+def _alterou(obj: Any, atributo: str) -> bool:
+    return inspect(obj).attrs[atributo].history.has_changes()
+
+
+def _valores(obj: Any, atributo: str) -> set:
+    """Valores antigo e novo de um atributo alterado (vazio se não mudou)"""
+    historico = inspect(obj).attrs[atributo].history
+    if not historico.has_changes():
+        return set()
+    return {*historico.added, *historico.deleted}
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidar_alterados(session: Session, flush_context: Any) -> None:
+    """
+    Invalida as permissões efetivas na mesma transação de qualquer gravação que as afete:
+    permissões explícitas, papel/grupo do usuário e fazendas (criadas, removidas ou com
+    módulos alterados), por qualquer caminho (rotas, crud_group, crud_farm...).
+    """
+    user_ids: set[int] = set()
+    group_ids: set[int] = set()
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, UserFarmPermissions):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, Farm):
+            group_ids.add(obj.group_id)
+    for obj in session.dirty:
+        if isinstance(obj, UserFarmPermissions):
+            user_ids.add(obj.user_id)
+            user_ids.update(_valores(obj, 'user_id'))
+        elif isinstance(obj, Farm):
+            if _alterou(obj, 'modules'):
+                group_ids.add(obj.group_id)
+            # Fazenda trocou de grupo: afeta o grupo antigo e o novo
+            group_ids.update(_valores(obj, 'group_id'))
+        elif isinstance(obj, User):
+            if _alterou(obj, 'base_role') or _alterou(obj, 'group_id'):
+                user_ids.add(obj.id)
+    user_ids.discard(None)
+    group_ids.discard(None)
+    if user_ids or group_ids:
+        permissoes_efetivas.invalidar(session, user_ids=user_ids, group_ids=group_ids)
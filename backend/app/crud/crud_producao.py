@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, Mapping
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.db.replicas import marcar_escrita_apos_commit
+from app.models.farm import Farm
+from app.models.producao_diaria import ProducaoDiaria
+
+# Campos do carregamento que definem o bucket e os totais do rollup
+PRODUCAO_CAMPOS = (
+    'group_id', 'farm_id', 'farm', 'field', 'product', 'scheduled_at', 'peso_com_desconto_fazenda', 'quantity',
+)
+
+_CHAVE = ('group_id', 'farm_id', 'farm', 'field', 'product', 'dia')
+# Mesmas expressões do índice único uq_producao_diaria_bucket (alvo do ON CONFLICT; o 0
+# vai literal no SQL, um parâmetro não casa com a expressão do índice)
+_CHAVE_INDICE = (
+    func.coalesce(ProducaoDiaria.group_id, literal_column('0')),
+    func.coalesce(ProducaoDiaria.farm_id, literal_column('0')),
+    ProducaoDiaria.farm,
+    ProducaoDiaria.field,
+    ProducaoDiaria.product,
+    ProducaoDiaria.dia,
+)
+
+
+@lru_cache
+def fuso_producao() -> ZoneInfo:
+    return ZoneInfo(get_settings().PRODUCAO_TIMEZONE)
+
+
+def dia_producao(scheduled_at: datetime) -> date:
+    """Dia do carregamento no fuso da produção (datetime sem tz é tratado como UTC)"""
+    if scheduled_at.tzinfo is None:
+        scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+    return scheduled_at.astimezone(fuso_producao()).date()
+
+
+class CRUDProducao:
+    @staticmethod
+    def valores(db_obj: Any) -> dict[str, Any]:
+        """Snapshot dos campos que alimentam o rollup (antes/depois de uma alteração)"""
+        return {campo: getattr(db_obj, campo) for campo in PRODUCAO_CAMPOS}
+
+    def registrar(
+        self,
+        db: Session,
+        *,
+        novos: Iterable[Mapping[str, Any]] = (),
+        antigos: Iterable[Mapping[str, Any]] = (),
+    ) -> None:
+        """
+        Soma os carregamentos `novos` e subtrai os `antigos` dos buckets diários.
+        Não faz commit: roda dentro da transação do próprio carregamento.
+        """
+        deltas: dict[tuple, list] = {}
+        for linhas, sinal in ((novos, 1), (antigos, -1)):
+            for linha in linhas:
+                if linha.get('scheduled_at') is None:
+                    continue
+                farm_id = linha.get('farm_id')
+                # Com farm_id o bucket é da fazenda (sobrevive a renomeação); o nome só
+                # identifica carregamentos legados sem farm_id
+                chave = (
+                    linha.get('group_id'), farm_id, '' if farm_id is not None else linha['farm'],
+                    linha['field'], linha['product'], dia_producao(linha['scheduled_at']),
+                )
+                acumulado = deltas.setdefault(chave, [0, Decimal(0), 0.0])
+                acumulado[0] += sinal
+                acumulado[1] += sinal * Decimal(str(linha.get('peso_com_desconto_fazenda') or 0))
+                acumulado[2] += sinal * float(linha.get('quantity') or 0)
+        self.aplicar_deltas(db, deltas=deltas)
+
+    def aplicar_deltas(self, db: Session, *, deltas: Mapping[tuple, list]) -> None:
+        """Upsert (executemany) somando os deltas; buckets que ficaram vazios são removidos"""
+        linhas = [
+            {
+                **dict(zip(_CHAVE, chave)),
+                'carregamentos': n,
+                'peso_com_desconto_fazenda': peso,
+                'quantity': quantity,
+            }
+            for chave, (n, peso, quantity) in deltas.items()
+            if n or peso or quantity  # Edição que não mudou o bucket nem os pesos
+        ]
+        if not linhas:
+            return
+        marcar_escrita_apos_commit(db, {linha['group_id'] for linha in linhas})
+
+        stmt = pg_insert(ProducaoDiaria)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_CHAVE_INDICE),
+            set_={
+                'carregamentos': ProducaoDiaria.carregamentos + stmt.excluded.carregamentos,
+                'peso_com_desconto_fazenda': (
+                    ProducaoDiaria.peso_com_desconto_fazenda + stmt.excluded.peso_com_desconto_fazenda
+                ),
+                'quantity': ProducaoDiaria.quantity + stmt.excluded.quantity,
+            },
+        )
+        db.execute(stmt, linhas)
+
+        esvaziados = [
+            (group_id or 0, farm_id or 0, *resto)
+            for (group_id, farm_id, *resto), (n, _, _) in deltas.items() if n < 0
+        ]
+        if esvaziados:
+            db.execute(
+                delete(ProducaoDiaria).where(
+                    tuple_(*_CHAVE_INDICE).in_(esvaziados),
+                    ProducaoDiaria.carregamentos <= 0,
+                )
+            )
+
+    def resumo(
+        self,
+        db: Session,
+        *,
+        group_id: int | None,
+        inicio: date | None = None,
+        fim: date | None = None,
+    ) -> dict[str, list[dict[str, Any]]]:
+        """
+        Totais por fazenda, produto, talhão e dia lidos do rollup (custo proporcional
+        ao número de buckets, não de carregamentos). group_id None = todos os grupos,
+        inclusive carregamentos legados sem grupo.
+        Fazendas aparecem com o nome atual (join por farm_id); legados sem farm_id, com o
+        nome gravado no carregamento.
+        """
+        filtros = []
+        if group_id is not None:
+            filtros.append(ProducaoDiaria.group_id == group_id)
+        if inicio is not None:
+            filtros.append(ProducaoDiaria.dia >= inicio)
+        if fim is not None:
+            filtros.append(ProducaoDiaria.dia <= fim)
+
+        totais = (
+            func.sum(ProducaoDiaria.carregamentos).label('carregamentos'),
+            func.sum(ProducaoDiaria.peso_com_desconto_fazenda).label('peso_com_desconto_fazenda'),
+            func.sum(ProducaoDiaria.quantity).label('quantity'),
+        )
+        nome_fazenda = func.coalesce(Farm.name, ProducaoDiaria.farm).label('farm')
+        farm_id = ProducaoDiaria.farm_id.label('farm_id')
+        agrupamentos = {
+            'por_fazenda': (nome_fazenda, farm_id),
+            'por_produto': (ProducaoDiaria.product,),
+            'por_talhao': (nome_fazenda, farm_id, ProducaoDiaria.field),
+            'por_dia': (ProducaoDiaria.dia,),
+        }
+
+        resultado = {}
+        for nome, colunas in agrupamentos.items():
+            stmt = (
+                select(*colunas, *totais)
+                .select_from(ProducaoDiaria)
+                .outerjoin(Farm, Farm.id == ProducaoDiaria.farm_id)
+                .where(*filtros)
+                .group_by(*colunas)
+                .order_by(*colunas)
+            )
+            resultado[nome] = [
+                {
+                    **{c.key: row[i] for i, c in enumerate(colunas)},
+                    'carregamentos': int(row.carregamentos),
+                    'peso_com_desconto_fazenda': float(row.peso_com_desconto_fazenda or 0),
+                    'quantity': float(row.quantity or 0),
+                }
+                for row in db.execute(stmt)
+            ]
+        return resultado
+
+
+producao = CRUDProducao()
@@ -3,11 +3,16 @@ from __future__ import annotations
 from typing import Optional
 
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, verify_and_update_password, verify_and_update_password_async
+from app.core.usuarios_cache import usuarios_cache
 from app.models.user import User
 from app.models.permissions_enum import BaseRole
-from app.schemas.user import UserCreate
+from app.schemas.user import UserCreate, UserUpdate
+
+# Alterações que revogam os tokens já emitidos para o usuário
+_CAMPOS_REVOGAM_TOKEN = ('active', 'base_role', 'group_id', 'password')
 
 
 class CRUDUser:
@@ -37,14 +42,62 @@ class CRUDUser:
         db.refresh(db_user)
         return db_user
 
+    def update(self, db: Session, *, db_obj: User, obj_in: UserUpdate) -> User:
+        """
+        Atualiza o usuário. Desativar, trocar papel/grupo ou senha incrementa token_version
+        (tokens antigos deixam de valer); qualquer alteração tira o usuário do cache de autenticação.
+        """
+        update_data = obj_in.model_dump(exclude_unset=True)
+        revogar = False
+        for field, value in update_data.items():
+            if field == 'password':
+                db_obj.password_hash = get_password_hash(value)
+            elif field == 'email':
+                db_obj.email = value.lower()
+            else:
+                if getattr(db_obj, field) == value:
+                    continue
+                setattr(db_obj, field, value)
+            revogar = revogar or field in _CAMPOS_REVOGAM_TOKEN
+        if revogar:
+            db_obj.token_version += 1
+
+        db.add(db_obj)
+        db.commit()
+        db.refresh(db_obj)
+        usuarios_cache.invalidar(db_obj.id)
+        return db_obj
+
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.password_hash):
+        valida, novo_hash = verify_and_update_password(password, user.password_hash)
+        if not valida:
             return None
+        if novo_hash:
+            self._regravar_hash(db, user, novo_hash)
         return user
 
+    async def authenticate_async(self, db: Session, *, email: str, password: str) -> Optional[User]:
+        """authenticate para rotas async: o bcrypt roda no pool de senhas sem ocupar o threadpool"""
+        user = await run_in_threadpool(self.get_by_email, db, email=email)
+        if not user:
+            return None
+        valida, novo_hash = await verify_and_update_password_async(password, user.password_hash)
+        if not valida:
+            return None
+        if novo_hash:
+            await run_in_threadpool(self._regravar_hash, db, user, novo_hash)
+        return user
+
+    def _regravar_hash(self, db: Session, user: User, novo_hash: str) -> None:
+        # Mesma senha com o custo atual (BCRYPT_ROUNDS): não revoga tokens
+        user.password_hash = novo_hash
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
     def ensure_system_admin(
         self,
         db: Session,
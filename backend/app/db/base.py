@@ -6,5 +6,9 @@ from app.models import user_farm_permissions  # noqa: F401
 from app.models import carregamento  # noqa: F401
 from app.models import field  # noqa: F401
 from app.models import armazem  # noqa: F401
+from app.models import carregamento_sugestao  # noqa: F401
+from app.models import nfe_emissao  # noqa: F401
+from app.models import producao_diaria  # noqa: F401
+from app.models import user_permissoes_efetivas  # noqa: F401
 
 __all__ = ['Base']
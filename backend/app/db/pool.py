@@ -0,0 +1,50 @@
+"""Pools de conexão com métrica de espera no checkout (exposta em /metrics)"""
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metricas import metricas
+
+espera_checkout = metricas.histograma(
+    'db_pool_checkout_wait_seconds',
+    'Tempo esperando uma conexão livre no pool do SQLAlchemy',
+)
+timeouts_checkout = metricas.contador(
+    'db_pool_checkout_timeouts_total',
+    'Checkouts que estouraram DB_POOL_TIMEOUT (pool esgotado)',
+)
+
+
+class _EsperaMedida:
+    """Mede o _do_get (onde o checkout espera quando pool_size + max_overflow estão em uso)"""
+    rotulo_pool = ''
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timeouts_checkout.incrementar(pool=self.rotulo_pool)
+            raise
+        finally:
+            espera_checkout.observar(time.perf_counter() - inicio, pool=self.rotulo_pool)
+
+
+class MeteredQueuePool(_EsperaMedida, QueuePool):
+    rotulo_pool = 'sync'
+
+
+class MeteredAsyncQueuePool(_EsperaMedida, AsyncAdaptedQueuePool):
+    rotulo_pool = 'async'
+
+
+# Réplicas de leitura (app/db/replicas.py): rótulo próprio para não misturar com o primário
+class MeteredReplicaQueuePool(MeteredQueuePool):
+    rotulo_pool = 'replica_sync'
+
+
+class MeteredReplicaAsyncQueuePool(MeteredAsyncQueuePool):
+    rotulo_pool = 'replica_async'
@@ -0,0 +1,190 @@
+"""
+Roteamento de leituras para réplicas (DATABASE_REPLICA_URLS).
+
+Só dependências de leitura (get_read_db / get_async_read_db) passam por aqui; gravações
+continuam no primário. Uma réplica só é usada enquanto o atraso medido estiver abaixo de
+REPLICA_MAX_LAG_SECONDS, e um grupo que acabou de gravar lê do primário por
+REPLICA_READ_AFTER_WRITE_SECONDS (leitura após escrita, por processo). Gravações pelo ORM
+são detectadas no flush; as feitas direto por Core (insert()/update()/text()) precisam
+chamar marcar_escrita_apos_commit.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Iterable
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import get_settings
+from app.db.pool import MeteredReplicaAsyncQueuePool, MeteredReplicaQueuePool
+from app.db.session import opcoes_engine
+
+logger = logging.getLogger(__name__)
+
+# Réplica em dia (nada recebido pendente de replay) conta como atraso 0, mesmo sem escritas recentes
+_SQL_ATRASO = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    def __init__(self, url: str, *, intervalo_verificacao: float):
+        self.url = url
+        self.intervalo_verificacao = intervalo_verificacao
+        self.engine = create_engine(url, future=True, poolclass=MeteredReplicaQueuePool, **opcoes_engine())
+        self.async_engine = create_async_engine(url, poolclass=MeteredReplicaAsyncQueuePool, **opcoes_engine())
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, future=True)
+        self.AsyncSessionLocal = async_sessionmaker(
+            self.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        self.atraso = float('inf')
+        self._verificado_em = float('-inf')
+
+    def _desatualizado(self) -> bool:
+        return time.monotonic() - self._verificado_em >= self.intervalo_verificacao
+
+    def _registrar(self, atraso: Any) -> None:
+        self.atraso = float(atraso)
+        self._verificado_em = time.monotonic()
+
+    def _falhou(self, exc: Exception) -> None:
+        # Fora de uso até a próxima verificação; as leituras vão para o primário
+        logger.warning('Réplica %s indisponível: %s', self.engine.url, exc)
+        self._registrar(float('inf'))
+
+    def medir_atraso(self) -> float:
+        if self._desatualizado():
+            try:
+                with self.engine.connect() as conn:
+                    self._registrar(conn.execute(_SQL_ATRASO).scalar())
+            except Exception as exc:
+                self._falhou(exc)
+        return self.atraso
+
+    async def medir_atraso_async(self) -> float:
+        if self._desatualizado():
+            try:
+                async with self.async_engine.connect() as conn:
+                    self._registrar((await conn.execute(_SQL_ATRASO)).scalar())
+            except Exception as exc:
+                self._falhou(exc)
+        return self.atraso
+
+
+class RoteadorLeitura:
+    def __init__(
+        self,
+        urls: Iterable[str],
+        *,
+        max_atraso: float,
+        intervalo_verificacao: float,
+        janela_escrita: float,
+    ):
+        self.replicas = [Replica(url, intervalo_verificacao=intervalo_verificacao) for url in urls]
+        self.max_atraso = max_atraso
+        self.janela_escrita = janela_escrita
+        self._ultima_escrita: dict[int | None, float] = {}
+        self._lock = threading.Lock()
+        self._vez = itertools.count()
+
+    @property
+    def ativo(self) -> bool:
+        return bool(self.replicas)
+
+    def marcar_escrita(self, group_ids: Iterable[int | None]) -> None:
+        agora = time.monotonic()
+        with self._lock:
+            # None: leituras de todos os grupos (system_admin) veem qualquer escrita
+            for group_id in {*group_ids, None}:
+                self._ultima_escrita[group_id] = agora
+            if len(self._ultima_escrita) > 10_000:
+                limite = agora - self.janela_escrita
+                self._ultima_escrita = {g: t for g, t in self._ultima_escrita.items() if t >= limite}
+
+    def _escrita_recente(self, group_id: int | None) -> bool:
+        with self._lock:
+            ultima = self._ultima_escrita.get(group_id)
+        return ultima is not None and time.monotonic() - ultima < self.janela_escrita
+
+    def _candidatas(self, group_id: int | None) -> list[Replica]:
+        if not self.replicas or self._escrita_recente(group_id):
+            return []
+        # Round-robin: cada leitura começa por uma réplica diferente
+        inicio = next(self._vez) % len(self.replicas)
+        return self.replicas[inicio:] + self.replicas[:inicio]
+
+    def replica_para(self, group_id: int | None) -> Replica | None:
+        """Réplica em dia para ler os dados do grupo, ou None (usar o primário)"""
+        for replica in self._candidatas(group_id):
+            if replica.medir_atraso() <= self.max_atraso:
+                return replica
+        return None
+
+    async def replica_para_async(self, group_id: int | None) -> Replica | None:
+        for replica in self._candidatas(group_id):
+            if await replica.medir_atraso_async() <= self.max_atraso:
+                return replica
+        return None
+
+    async def fechar(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+
+def _criar_roteador() -> RoteadorLeitura:
+    settings = get_settings()
+    return RoteadorLeitura(
+        settings.DATABASE_REPLICA_URLS,
+        max_atraso=settings.REPLICA_MAX_LAG_SECONDS,
+        intervalo_verificacao=settings.REPLICA_LAG_CHECK_SECONDS,
+        janela_escrita=settings.REPLICA_READ_AFTER_WRITE_SECONDS,
+    )
+
+
+roteador_leitura = _criar_roteador()
+
+
+_GRUPOS_GRAVADOS = 'replicas_grupos_gravados'
+
+
+def marcar_escrita_apos_commit(db: Session, group_ids: Iterable[int | None]) -> None:
+    """
+    Marca os grupos como recém-gravados quando a sessão commitar. Para gravações por Core
+    (executemany de insert/update, SQL textual), que não passam pelos objetos do flush.
+    """
+    if roteador_leitura.ativo:
+        db.info.setdefault(_GRUPOS_GRAVADOS, set()).update(group_ids)
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_grupos(session: Session, flush_context: Any) -> None:
+    if not roteador_leitura.ativo:
+        return
+    from app.models.group import Group
+
+    grupos = session.info.setdefault(_GRUPOS_GRAVADOS, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        grupos.add(obj.id if isinstance(obj, Group) else getattr(obj, 'group_id', None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _marcar_grupos(session: Session) -> None:
+    grupos = session.info.pop(_GRUPOS_GRAVADOS, None)
+    if grupos:
+        roteador_leitura.marcar_escrita(grupos)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _descartar_grupos(session: Session, previous_transaction: Any) -> None:
+    if previous_transaction.parent is None:
+        session.info.pop(_GRUPOS_GRAVADOS, None)
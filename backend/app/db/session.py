@@ -1,13 +1,56 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import get_settings
+from app.core.metricas import metricas
+from app.db.pool import MeteredAsyncQueuePool, MeteredQueuePool
 
 settings = get_settings()
 
-engine = create_engine(settings.DATABASE_URL, future=True)
+
+def opcoes_engine() -> dict:
+    """Pool e parâmetros de conexão (DB_* em Settings), iguais para as engines sync e async"""
+    opcoes_pg = []
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        opcoes_pg.append(f'-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}')
+    connect_args = {'application_name': settings.DB_APPLICATION_NAME}
+    if opcoes_pg:
+        connect_args['options'] = ' '.join(opcoes_pg)
+    return {
+        'pool_size': settings.DB_POOL_SIZE,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE_SECONDS,
+        # Testa a conexão no checkout: após restart do Postgres a conexão morta é trocada
+        # em vez de estourar na primeira consulta da requisição
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+        'connect_args': connect_args,
+    }
+
+
+engine = create_engine(settings.DATABASE_URL, future=True, poolclass=MeteredQueuePool, **opcoes_engine())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+# Engine assíncrona (psycopg 3 em modo async) para as rotas async def: cada consulta
+# libera o event loop em vez de travar o worker. Pool próprio, separado do síncrono.
+async_engine = create_async_engine(settings.DATABASE_URL, poolclass=MeteredAsyncQueuePool, **opcoes_engine())
+# expire_on_commit=False: depois do commit os objetos continuam legíveis sem nova ida ao banco
+# (fora de run_sync um lazy load não é permitido)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _estado_pools(ler) -> dict:
+    return {
+        (('pool', 'sync'),): ler(engine.pool),
+        (('pool', 'async'),): ler(async_engine.sync_engine.pool),
+    }
+
+
+metricas.medidor('db_pool_size', 'Conexões configuradas (pool_size)', lambda: _estado_pools(lambda p: p.size()))
+metricas.medidor('db_pool_checked_out', 'Conexões em uso', lambda: _estado_pools(lambda p: p.checkedout()))
+metricas.medidor('db_pool_overflow', 'Conexões além do pool_size (negativo: ainda não abertas)', lambda: _estado_pools(lambda p: p.overflow()))
+
 
 def get_db():
     db = SessionLocal()
@@ -17,4 +60,6 @@ def get_db():
         db.close()
 
 
-
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,8 @@
 # backend/app/main.py
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,20 +10,60 @@ from fastapi.responses import JSONResponse
 
 from app.api.routes import api_router
 from app.core.config import get_settings
+from app.core.http_clients import http_clients
+from app.core.security import encerrar_pool_senhas
+from app.db.replicas import roteador_leitura
+from app.db.session import async_engine
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools HTTP compartilhados (Focus NFe, BrasilAPI) vivem enquanto a API estiver no ar
+    await http_clients.iniciar()
+
+    # Worker da outbox de NF-e roda junto com a API (desligue com NFE_OUTBOX_ENABLED=false
+    # para rodá-lo em processo separado: python -m app.services.nfe_outbox)
+    tasks = []
+    if settings.NFE_OUTBOX_ENABLED:
+        from app.services.nfe_outbox import nfe_outbox_worker
+        tasks.append(asyncio.create_task(nfe_outbox_worker.run()))
+    # Reconciliação de status das NF-e (advisory lock: uma instância por vez)
+    if settings.NFE_RECONCILIACAO_ENABLED:
+        from app.services.nfe_reconciliacao import nfe_reconciliador
+        tasks.append(asyncio.create_task(nfe_reconciliador.run()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    await http_clients.fechar()
+    encerrar_pool_senhas()
+    await async_engine.dispose()
+    await roteador_leitura.fechar()
+
+
 app = FastAPI(
     title=settings.APP_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    from app.core.instrumentacao_sql import InstrumentacaoSQLMiddleware
+    app.add_middleware(InstrumentacaoSQLMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.BACKEND_CORS_ORIGINS or ["http://localhost:5173"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 @app.exception_handler(RequestValidationError)
@@ -32,6 +76,17 @@ async def validation_handler(request: Request, exc: RequestValidationError):
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+if settings.METRICS_ENABLED:
+    from fastapi import Depends
+    from fastapi.responses import PlainTextResponse
+    from app.api.deps import verificar_acesso_metricas
+    from app.core.metricas import metricas
+
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(verificar_acesso_metricas)])
+    async def metrics():
+        """Pool de conexões (espera no checkout, em uso, overflow) no formato do Prometheus"""
+        return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Integra Rural API rodando com banco integra!"}
\ No newline at end of file
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import uuid
-from sqlalchemy import Boolean, Float, String, Numeric
+from sqlalchemy import Boolean, Float, Index, String, Numeric
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -12,6 +12,10 @@ from app.db.base_class import Base
 class Armazem(Base):
     """Armazém de destino para carregamentos"""
     __tablename__ = 'armazens'
+    __table_args__ = (
+        # Destinatário é reaproveitado pelo CNPJ ao salvar carregamentos: um armazém por CNPJ
+        Index('uq_armazens_cnpj', 'cnpj', unique=True),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     nome: Mapped[str] = mapped_column(String(160), nullable=False)
@@ -6,12 +6,15 @@ from typing import TYPE_CHECKING
 
 import enum
 import uuid
-from sqlalchemy import DateTime, Float, Integer, String, Numeric, Enum, ForeignKey
+from sqlalchemy import DateTime, Float, Index, Integer, String, Numeric, Enum, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
 
+if TYPE_CHECKING:
+    from app.models.armazem import Armazem
+
 
 class TipoCarregamento(str, enum.Enum):
     interno = "interno"
@@ -22,12 +25,30 @@ class TipoCarregamento(str, enum.Enum):
 class Carregamento(Base):
     """Carregamento de caminhão com emissão de NFe"""
     __tablename__ = 'carregamentos'
+    __table_args__ = (
+        # Keyset pagination da listagem (ORDER BY created_at DESC, id DESC)
+        Index('ix_carregamentos_created_at_id', 'created_at', 'id'),
+        # Tenancy: listagem do grupo / da fazenda já na ordem da paginação
+        Index('ix_carregamentos_group_created_at_id', 'group_id', 'created_at', 'id'),
+        Index('ix_carregamentos_group_scheduled_at_id', 'group_id', 'scheduled_at', 'id'),
+        Index('ix_carregamentos_farm_created_at_id', 'farm_id', 'created_at', 'id'),
+        # Filtro por período e ordenação por scheduled_at
+        Index('ix_carregamentos_scheduled_at_id', 'scheduled_at', 'id'),
+        Index('ix_carregamentos_armazem_destino_id', 'armazem_destino_id'),
+        # Carregamentos legados (sem farm_id) filtrados pelo nome da fazenda
+        Index('ix_carregamentos_farm_created_at', 'farm', 'created_at'),
+        # Reconciliação de NF-e (nfe_status pendente/processando) e busca pela referência da Focus
+        Index('ix_carregamentos_nfe_status', 'nfe_status'),
+        Index('ix_carregamentos_nfe_ref', 'nfe_ref'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     truck: Mapped[str] = mapped_column(String(10), nullable=False)  # Placa do caminhão
     driver: Mapped[str] = mapped_column(String(120), nullable=False)  # Nome do motorista
     driver_document: Mapped[str | None] = mapped_column(String(20), nullable=True) # CPF/CNPJ do Motorista
-    farm: Mapped[str] = mapped_column(String(160), nullable=False)  # Nome da fazenda
+    farm: Mapped[str] = mapped_column(String(160), nullable=False)  # Nome da fazenda (snapshot)
+    farm_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('farms.id'), nullable=True)
+    group_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('groups.id'), nullable=True)  # Tenancy
     field: Mapped[str] = mapped_column(String(120), nullable=False)  # Talhão
     product: Mapped[str] = mapped_column(String(80), nullable=False)  # Produto (ex: soja, milho, cana)
     variety: Mapped[str | None] = mapped_column(String(120), nullable=True) # Variedade (Snapshot do talhão ou manual)
@@ -66,6 +87,7 @@ class Carregamento(Base):
 
     # Relacionamento com Armazém
     armazem_destino_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey('armazens.id'), nullable=True)
+    armazem_destino: Mapped['Armazem | None'] = relationship('Armazem', foreign_keys=[armazem_destino_id])
     
     
     # Campos relacionados à NFe
@@ -0,0 +1,31 @@
+"""Modelo CarregamentoSugestao - Índice de autocomplete dos carregamentos"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class CarregamentoSugestao(Base):
+    """Valor já usado em um campo de carregamento, com frequência de uso por grupo"""
+    __tablename__ = 'carregamento_sugestoes'
+    __table_args__ = (
+        # Busca por prefixo (LIKE 'abc%') independente de collation
+        Index(
+            'ix_carregamento_sugestoes_prefixo',
+            'group_id', 'campo', 'valor_normalizado',
+            postgresql_ops={'valor_normalizado': 'varchar_pattern_ops'},
+        ),
+        # Ranking sem prefixo (ORDER BY frequencia DESC)
+        Index('ix_carregamento_sugestoes_ranking', 'group_id', 'campo', 'frequencia'),
+    )
+
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey('groups.id', ondelete='CASCADE'), primary_key=True)
+    campo: Mapped[str] = mapped_column(String(20), primary_key=True)  # truck, driver, product, field, destination, unit
+    valor: Mapped[str] = mapped_column(String(160), primary_key=True)
+    valor_normalizado: Mapped[str] = mapped_column(String(160), nullable=False)  # lower(valor)
+    frequencia: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ultimo_uso: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
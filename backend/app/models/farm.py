@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Integer, JSON, String
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, JSON, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -18,6 +18,11 @@ if TYPE_CHECKING:
 class Farm(Base):
     """Fazenda pertencente a um grupo"""
     __tablename__ = 'farms'
+    __table_args__ = (
+        Index('ix_farms_group_id', 'group_id'),
+        # Fazenda resolvida pelo nome dentro do grupo (formulário, importação, carregamentos legados)
+        Index('ix_farms_name_group_id', 'name', 'group_id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     group_id: Mapped[int] = mapped_column(Integer, ForeignKey('groups.id'), nullable=False)
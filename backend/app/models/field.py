@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Integer, String, Float
+from sqlalchemy import ForeignKey, Index, Integer, String, Float
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -15,6 +15,9 @@ if TYPE_CHECKING:
 class Field(Base):
     """Talhão pertencente a uma fazenda"""
     __tablename__ = 'fields'
+    __table_args__ = (
+        Index('ix_fields_farm_id', 'farm_id'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     farm_id: Mapped[int] = mapped_column(Integer, ForeignKey('farms.id'), nullable=False)
@@ -0,0 +1,40 @@
+"""Modelo NfeEmissao - Fila (outbox) de emissões de NF-e"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class NfeEmissao(Base):
+    """
+    Emissão de NF-e pendente, gravada na mesma transação do carregamento.
+    O worker (app.services.nfe_outbox) envia para a Focus NFe fora da requisição HTTP.
+    """
+    __tablename__ = 'nfe_emissoes'
+    __table_args__ = (
+        # Busca do worker: WHERE status = 'pendente' AND proxima_tentativa_em <= now()
+        Index('ix_nfe_emissoes_status_proxima', 'status', 'proxima_tentativa_em'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    carregamento_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey('carregamentos.id', ondelete='CASCADE'), nullable=False, unique=True
+    )
+    group_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('groups.id'), nullable=True)  # Token da Focus
+    referencia: Mapped[str] = mapped_column(String(255), nullable=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)  # JSON da NF-e já montado
+
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='pendente')  # pendente, enviando, enviado, erro
+    tentativas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    proxima_tentativa_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    reservado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    ultimo_erro: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    enviado_em: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
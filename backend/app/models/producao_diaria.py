@@ -0,0 +1,44 @@
+"""Modelo ProducaoDiaria - Rollup de carregamentos por grupo/fazenda/talhão/produto/dia"""
+from __future__ import annotations
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import BigInteger, Date, Float, ForeignKey, Index, Integer, Numeric, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class ProducaoDiaria(Base):
+    """
+    Totais de carregamentos por dia (scheduled_at no fuso PRODUCAO_TIMEZONE).
+    Mantido na mesma transação de cada criação/edição/remoção de carregamento
+    (app.crud.crud_producao), então o resumo lê buckets em vez de carregamentos.
+
+    O bucket é da fazenda (farm_id): renomear a fazenda não divide o histórico. `farm`
+    só guarda o nome nos carregamentos legados sem farm_id ('' quando farm_id existe).
+    group_id NULL = carregamentos legados sem grupo (entram só no total do system_admin).
+    """
+    __tablename__ = 'producao_diaria'
+    __table_args__ = (
+        # Chave do bucket; coalesce porque group_id/farm_id podem ser NULL (legado)
+        Index(
+            'uq_producao_diaria_bucket',
+            text('coalesce(group_id, 0)'), text('coalesce(farm_id, 0)'), 'farm', 'field', 'product', 'dia',
+            unique=True,
+        ),
+        Index('ix_producao_diaria_group_dia', 'group_id', 'dia'),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    group_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('groups.id', ondelete='CASCADE'), nullable=True)
+    farm_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('farms.id', ondelete='CASCADE'), nullable=True)
+    farm: Mapped[str] = mapped_column(String(160), nullable=False, default='')
+    field: Mapped[str] = mapped_column(String(120), nullable=False)
+    product: Mapped[str] = mapped_column(String(80), nullable=False)
+    dia: Mapped[date] = mapped_column(Date, nullable=False)
+
+    carregamentos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    peso_com_desconto_fazenda: Mapped[Decimal] = mapped_column(Numeric(16, 2), nullable=False, default=0)
+    quantity: Mapped[float] = mapped_column(Float, nullable=False, default=0)
@@ -30,6 +30,8 @@ class User(Base):
         nullable=False
     )
     active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    # Incrementado para revogar os tokens já emitidos (claim 'ver' do JWT)
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
     # Relacionamentos
@@ -4,7 +4,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Integer, JSON
+from sqlalchemy import DateTime, ForeignKey, Integer, JSON, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -17,6 +17,10 @@ if TYPE_CHECKING:
 class UserFarmPermissions(Base):
     """Permissões de módulos por usuário em cada fazenda"""
     __tablename__ = 'user_farm_permissions'
+    __table_args__ = (
+        # Uma linha por usuário e fazenda (get_by_user_and_farm / upsert em PUT /users/{id}/permissions)
+        UniqueConstraint('user_id', 'farm_id', name='uq_user_farm_permissions_user_farm'),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
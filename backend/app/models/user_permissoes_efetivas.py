@@ -0,0 +1,28 @@
+"""Modelo UserPermissoesEfetivas - Permissões efetivas pré-calculadas por usuário"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class UserPermissoesEfetivas(Base):
+    """
+    Resultado da combinação papel do usuário + módulos das fazendas + permissões explícitas
+    (user_farm_permissions), por fazenda e consolidado. Alterações nessas fontes incrementam
+    `versao` e limpam o cálculo (app.crud.crud_permissoes_efetivas); a próxima leitura recalcula.
+    """
+    __tablename__ = 'user_permissoes_efetivas'
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    versao: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # { module_key: { read: bool, create: bool ... } } (OR entre as fazendas)
+    modulos: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # { farm_id: { module_key: {...} } }
+    por_fazenda: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    etag: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    atualizado_em: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -1,7 +1,15 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from uuid import UUID
 from typing import Optional
 
+
+def normalizar_cnpj(cnpj: Optional[str]) -> Optional[str]:
+    """Só os dígitos do CNPJ; vazio vira None (armazens.cnpj é único: '' conflitaria com '')"""
+    if cnpj is None:
+        return None
+    return ''.join(filter(str.isdigit, cnpj)) or None
+
+
 class ArmazemBase(BaseModel):
     nome: str
     cnpj: Optional[str] = None
@@ -20,6 +28,11 @@ class ArmazemBase(BaseModel):
     impurezas_padrao: float = 1.0
     eh_proprio: bool = False
 
+    @field_validator('cnpj')
+    @classmethod
+    def _normalizar_cnpj(cls, v: Optional[str]) -> Optional[str]:
+        return normalizar_cnpj(v)
+
 class ArmazemCreate(ArmazemBase):
     pass
 
@@ -30,3 +43,17 @@ class Armazem(ArmazemBase):
     id: UUID
 
     model_config = ConfigDict(from_attributes=True)
+
+class PerfilDesconto(BaseModel):
+    """
+    Parâmetros de desconto avulsos para simulação (ex: proposta de um armazém ainda não cadastrado).
+    Só a umidade varia entre perfis: o desconto de impurezas é sempre o percentual medido
+    (a fórmula não usa impurezas_padrao), então não faz parte do perfil.
+    """
+    nome: str
+    umidade_padrao: float = 14.0
+    fator_umidade: float = 1.5
+
+class SimulacaoDescontosIn(BaseModel):
+    armazem_ids: list[UUID] = Field(default_factory=list, max_length=100)
+    perfis: list[PerfilDesconto] = Field(default_factory=list, max_length=100)
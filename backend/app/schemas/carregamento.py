@@ -1,9 +1,11 @@
 from datetime import datetime
-from typing import Optional, Union
+from decimal import Decimal
+from typing import Any, Optional, Union
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 
+from app.models.carregamento import TipoCarregamento
 from app.schemas.base import ORMModel
 
 
@@ -13,9 +15,10 @@ class CarregamentoBase(ORMModel):
     driver: str
     driver_document: Optional[str] = None
     farm: str
+    farm_id: Optional[int] = None
+    group_id: Optional[int] = None
     field: str
     product: str
-    product: str
     variety: Optional[str] = None
     quantity: float
     unit: str
@@ -152,14 +155,38 @@ class CarregamentoRead(CarregamentoBase):
     placa_veiculo: Optional[str] = None
     uf_veiculo: Optional[str] = None
 
+    @model_validator(mode='before')
+    @classmethod
+    def hidratar_destinatario(cls, data: Any) -> Any:
+        """Preenche os campos *_destinatario a partir do Armazém vinculado (Carregamento.armazem_destino)"""
+        armazem = getattr(data, 'armazem_destino', None)
+        if armazem is None:
+            return data
+
+        values = {c.name: getattr(data, c.name) for c in data.__table__.columns}
+        values.update({
+            'cnpj_destinatario': armazem.cnpj,
+            'nome_destinatario': armazem.nome,
+            'logradouro_destinatario': armazem.logradouro,
+            'numero_destinatario': armazem.numero,
+            'bairro_destinatario': armazem.bairro,
+            'municipio_destinatario': armazem.municipio,
+            'uf_destinatario': armazem.uf,
+            'cep_destinatario': armazem.cep,
+            'inscricao_estadual_destinatario': armazem.inscricao_estadual,
+        })
+        return values
+
 
 
 class CarregamentoCreate(BaseModel):
-    """Schema interno para criação no banco"""
+    """Schema interno para criação no banco (pesos em Decimal, como nas colunas Numeric)"""
     truck: str
     driver: str
     driver_document: Optional[str] = None
     farm: str
+    farm_id: Optional[int] = None
+    group_id: Optional[int] = None
     field: str
     product: str
     variety: Optional[str] = None
@@ -171,24 +198,55 @@ class CarregamentoCreate(BaseModel):
     nfe_status: Optional[str] = 'pendente'
     
     # Novos campos
-    peso_estimado_kg: Optional[float] = None
-    peso_bruto_kg: Optional[float] = None
-    tara_kg: Optional[float] = None
-    peso_liquido_kg: Optional[float] = None
-    umidade_percent: Optional[float] = None
-    impurezas_percent: Optional[float] = None
-    peso_com_desconto_fazenda: Optional[float] = None
-    peso_com_desconto_armazem: Optional[float] = None
-    peso_recebido_final_kg: Optional[float] = None
+    peso_estimado_kg: Optional[Decimal] = None
+    peso_bruto_kg: Optional[Decimal] = None
+    tara_kg: Optional[Decimal] = None
+    peso_liquido_kg: Optional[Decimal] = None
+    umidade_percent: Optional[Decimal] = None
+    impurezas_percent: Optional[Decimal] = None
+    peso_com_desconto_fazenda: Optional[Decimal] = None
+    peso_com_desconto_armazem: Optional[Decimal] = None
+    peso_recebido_final_kg: Optional[Decimal] = None
     armazem_destino_id: Optional[Union[UUID, str]] = None
     
     # Configs
-    umidade_padrao: Optional[float] = 14.0
-    fator_umidade: Optional[float] = 1.5
-    impurezas_padrao: Optional[float] = 1.0
-
-    umidade_empresa_percent: Optional[float] = None
-    impurezas_empresa_percent: Optional[float] = None
-    peso_com_desconto_empresa: Optional[float] = None
-
-
+    umidade_padrao: Optional[Decimal] = Decimal('14.0')
+    fator_umidade: Optional[Decimal] = Decimal('1.5')
+    impurezas_padrao: Optional[Decimal] = Decimal('1.0')
+
+    umidade_empresa_percent: Optional[Decimal] = None
+    impurezas_empresa_percent: Optional[Decimal] = None
+    peso_com_desconto_empresa: Optional[Decimal] = None
+
+
+# Campos aceitos em `sort` (prefixo '-' = decrescente)
+CARREGAMENTO_SORT_FIELDS = (
+    'created_at', 'scheduled_at', 'farm', 'field', 'product',
+    'truck', 'driver', 'destination', 'quantity',
+)
+
+
+class CarregamentoFiltro(BaseModel):
+    """Filtros e ordenação da listagem de carregamentos"""
+    scheduled_from: Optional[datetime] = None
+    scheduled_to: Optional[datetime] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    farm: Optional[str] = None
+    farm_id: Optional[int] = None
+    field: Optional[str] = None
+    product: Optional[str] = None
+    truck: Optional[str] = None
+    driver: Optional[str] = None
+    destination: Optional[str] = None
+    type: Optional[list[TipoCarregamento]] = None
+    nfe_status: Optional[list[str]] = None
+    armazem_destino_id: Optional[UUID] = None
+    sort: str = '-created_at'
+
+    @field_validator('sort')
+    @classmethod
+    def validar_sort(cls, value: str) -> str:
+        if value.removeprefix('-') not in CARREGAMENTO_SORT_FIELDS:
+            raise ValueError(f"Ordenação inválida. Permitidos: {', '.join(CARREGAMENTO_SORT_FIELDS)}")
+        return value
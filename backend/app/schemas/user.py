@@ -26,6 +26,15 @@ class UserCreate(BaseModel):
     base_role: BaseRole = BaseRole.OPERATIONAL
 
 
+class UserUpdate(BaseModel):
+    name: str | None = Field(default=None, min_length=3, max_length=120)
+    cpf: str | None = Field(default=None, min_length=11, max_length=14)
+    email: EmailStr | None = None
+    password: str | None = Field(default=None, min_length=6, max_length=128)
+    base_role: BaseRole | None = None
+    active: bool | None = None
+
+
 class UserRead(UserBase):
     pass
 
@@ -0,0 +1,116 @@
+"""Análise da produção por período: volume, descontos e diferenças de peso entre fazenda, armazém e empresa"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Any
+
+from sqlalchemy import case, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import cache_carregamentos
+from app.crud.crud_producao import fuso_producao
+from app.models.armazem import Armazem
+from app.models.carregamento import Carregamento
+
+# granularidade da API -> unidade do date_trunc
+GRANULARIDADES = {'hora': 'hour', 'dia': 'day', 'semana': 'week', 'mes': 'month'}
+
+AGRUPAMENTOS = {
+    'fazenda': Carregamento.farm,
+    'talhao': Carregamento.field,
+    'produto': Carregamento.product,
+    'destino': Carregamento.destination,
+    'armazem': Armazem.nome,
+}
+
+_peso_liquido = func.coalesce(Carregamento.peso_liquido_kg, Carregamento.peso_bruto_kg - Carregamento.tara_kg)
+
+
+def _diferenca(a: Any, b: Any) -> Any:
+    """a - b só quando as duas pesagens existem (senão a linha não entra na soma)"""
+    return case((a.is_not(None) & b.is_not(None), a - b))
+
+
+# Mesmas fórmulas de calculo_peso_service.calcular_descontos_decimal, com os parâmetros gravados no carregamento
+METRICAS = {
+    'carregamentos': func.count(Carregamento.id),
+    'peso_liquido_kg': func.sum(_peso_liquido),
+    'desconto_umidade_kg': func.sum(
+        _peso_liquido / 100
+        * func.greatest((Carregamento.umidade_percent - Carregamento.umidade_padrao) * Carregamento.fator_umidade, 0)
+    ),
+    'desconto_impurezas_kg': func.sum(_peso_liquido / 100 * Carregamento.impurezas_percent),
+    'peso_com_desconto_fazenda': func.sum(Carregamento.peso_com_desconto_fazenda),
+    'peso_com_desconto_armazem': func.sum(Carregamento.peso_com_desconto_armazem),
+    'peso_com_desconto_empresa': func.sum(Carregamento.peso_com_desconto_empresa),
+    'diferenca_fazenda_armazem_kg': func.sum(
+        _diferenca(Carregamento.peso_com_desconto_fazenda, Carregamento.peso_com_desconto_armazem)
+    ),
+    'diferenca_fazenda_empresa_kg': func.sum(
+        _diferenca(Carregamento.peso_com_desconto_fazenda, Carregamento.peso_com_desconto_empresa)
+    ),
+}
+
+
+def _limites(inicio: date | None, fim: date | None) -> tuple[datetime | None, datetime | None]:
+    """Dias (inclusivos, no fuso da produção) -> intervalo [de, até) em scheduled_at"""
+    de = datetime.combine(inicio, time.min, tzinfo=fuso_producao()) if inicio is not None else None
+    ate = datetime.combine(fim + timedelta(days=1), time.min, tzinfo=fuso_producao()) if fim is not None else None
+    return de, ate
+
+
+def consultar(
+    db: Session,
+    *,
+    group_id: int | None,
+    granularidade: str,
+    agrupar_por: str | None = None,
+    inicio: date | None = None,
+    fim: date | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Uma linha por (período, grupo), agregada no Postgres (date_trunc no fuso da produção):
+    só os buckets trafegam, não os carregamentos.
+    """
+    periodo = func.date_trunc(
+        GRANULARIDADES[granularidade], func.timezone(fuso_producao().key, Carregamento.scheduled_at)
+    ).label('periodo')
+    grupo = (AGRUPAMENTOS[agrupar_por] if agrupar_por else literal(None)).label('grupo')
+
+    stmt = select(periodo, grupo, *(expr.label(nome) for nome, expr in METRICAS.items()))
+    if agrupar_por == 'armazem':
+        stmt = stmt.outerjoin(Armazem, Armazem.id == Carregamento.armazem_destino_id)
+    if group_id is not None:
+        stmt = stmt.where(Carregamento.group_id == group_id)
+    de, ate = _limites(inicio, fim)
+    if de is not None:
+        stmt = stmt.where(Carregamento.scheduled_at >= de)
+    if ate is not None:
+        stmt = stmt.where(Carregamento.scheduled_at < ate)
+
+    if agrupar_por:
+        stmt = stmt.group_by(periodo, grupo).order_by(periodo, grupo)
+    else:
+        stmt = stmt.group_by(periodo).order_by(periodo)
+
+    series = []
+    for row in db.execute(stmt):
+        item: dict[str, Any] = {'periodo': row.periodo.isoformat()}
+        if agrupar_por:
+            item[agrupar_por] = row.grupo
+        for nome in METRICAS:
+            valor = getattr(row, nome)
+            item[nome] = int(valor) if nome == 'carregamentos' else round(float(valor or 0), 2)
+        series.append(item)
+    return series
+
+
+def consultar_com_cache(db: Session, *, group_id: int | None, **params: Any) -> list[dict[str, Any]]:
+    """`consultar` com cache por grupo; qualquer gravação de carregamento do grupo invalida"""
+    chave = ('analise', tuple(sorted(params.items())))
+    series = cache_carregamentos.get(group_id, chave)
+    if series is None:
+        versao = cache_carregamentos.versao(group_id)
+        series = consultar(db, group_id=group_id, **params)
+        cache_carregamentos.set_se_versao(group_id, chave, series, versao)
+    return series
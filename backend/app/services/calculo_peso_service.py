@@ -1,20 +1,89 @@
-def calcular_descontos(
-    peso_liquido: float,
-    umidade_medida: float,
-    impurezas_medida: float,
-    umidade_padrao: float = 14.0,
-    fator_umidade: float = 1.5,
-    impurezas_padrao: float = 1.0,
-) -> dict:
-
-    desconto_umidade_percent = max(0, (umidade_medida - umidade_padrao) * fator_umidade)
-    desconto_umidade_kg = (peso_liquido / 100) * desconto_umidade_percent
-    desconto_impurezas_kg = (peso_liquido / 100) * impurezas_medida
-    peso_final = peso_liquido - desconto_umidade_kg - desconto_impurezas_kg
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Union
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+# Pesos são gravados em Numeric(10, 2): todo desconto é arredondado para o centésimo de kg
+CENTAVO = Decimal('0.01')
+
+Numero = Union[Decimal, float, int, str]
+
+
+def para_decimal(valor: Numero | None) -> Decimal | None:
+    """Converte para Decimal sem herdar o erro binário do float (12.3 -> Decimal('12.3'))"""
+    if valor is None or type(valor) is Decimal:
+        return valor
+    if isinstance(valor, float):
+        return Decimal(repr(valor))
+    return Decimal(valor)
+
+
+def quantizar_kg(valor: Decimal) -> Decimal:
+    """Arredonda para 0,01 kg (meio para cima, como nos romaneios dos armazéns)"""
+    return valor.quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def calcular_descontos_decimal(
+    peso_liquido: Numero,
+    umidade_medida: Numero,
+    impurezas_medida: Numero,
+    umidade_padrao: Numero = Decimal('14.0'),
+    fator_umidade: Numero = Decimal('1.5'),
+    impurezas_padrao: Numero = Decimal('1.0'),
+) -> dict[str, Decimal]:
+    """
+    Descontos de um carregamento em ponto fixo: cada desconto é arredondado para
+    0,01 kg e o peso com desconto é o líquido menos os descontos já arredondados.
+    Assim a soma dos carregamentos bate com a soma das linhas do romaneio do armazém.
+    Umidade: (medida - padrão) x fator, nunca negativo; impurezas: o percentual medido.
+    """
+    peso = quantizar_kg(para_decimal(peso_liquido))
+    desconto_umidade_percent = max(
+        Decimal(0), (para_decimal(umidade_medida) - para_decimal(umidade_padrao)) * para_decimal(fator_umidade)
+    )
+    desconto_umidade_kg = quantizar_kg(peso * desconto_umidade_percent / 100)
+    desconto_impurezas_kg = quantizar_kg(peso * para_decimal(impurezas_medida) / 100)
 
     return {
         "desconto_umidade_percent": desconto_umidade_percent,
         "desconto_umidade_kg": desconto_umidade_kg,
         "desconto_impurezas_kg": desconto_impurezas_kg,
-        "peso_com_desconto": round(peso_final, 3)
+        "peso_com_desconto": peso - desconto_umidade_kg - desconto_impurezas_kg,
+    }
+
+
+def _centesimos(valor: ArrayLike) -> np.ndarray:
+    """Valores com até 2 casas (colunas Numeric) -> inteiros em centésimos"""
+    return np.rint(np.asarray(valor, dtype=np.float64) * 100).astype(np.int64)
+
+
+def calcular_descontos_lote(
+    peso_liquido: ArrayLike,
+    umidade_medida: ArrayLike,
+    impurezas_medida: ArrayLike,
+    umidade_padrao: ArrayLike = 14.0,
+    fator_umidade: ArrayLike = 1.5,
+    impurezas_padrao: ArrayLike = 1.0,
+) -> dict[str, np.ndarray]:
+    """
+    Versão vetorizada de calcular_descontos_decimal: recebe colunas (arrays NumPy ou
+    escalares, com broadcast) e devolve cada resultado como array, em uma passada para
+    o lote todo. As contas são em inteiros (centésimos de kg e de %), sem conversão
+    para Decimal por linha, e dão o mesmo resultado da versão Decimal.
+    """
+    peso = _centesimos(peso_liquido)
+    diferenca_umidade = np.maximum(_centesimos(umidade_medida) - _centesimos(umidade_padrao), 0)
+
+    # peso[c kg] * diferença[c %] * fator[c] / 100 [%] = 1e-6 c kg; +meio e divisão inteira = ROUND_HALF_UP
+    desconto_umidade = (peso * diferenca_umidade * _centesimos(fator_umidade) + 500_000) // 1_000_000
+    desconto_impurezas = (peso * _centesimos(impurezas_medida) + 5_000) // 10_000
+    peso_final = peso - desconto_umidade - desconto_impurezas
+
+    return {
+        "desconto_umidade_percent": diferenca_umidade * _centesimos(fator_umidade) / 10_000,
+        "desconto_umidade_kg": desconto_umidade / 100,
+        "desconto_impurezas_kg": desconto_impurezas / 100,
+        "peso_com_desconto": peso_final / 100,
+        "peso_com_desconto_centesimos": peso_final,
     }
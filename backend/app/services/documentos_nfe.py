@@ -0,0 +1,105 @@
+"""Cache local dos documentos de NF-e autorizadas (DANFE em PDF e XML)"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Protocol
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import get_settings
+from app.core.http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+# tipo -> (coluna com a URL na Focus, media type)
+TIPOS_DOCUMENTO = {
+    'pdf': ('nfe_danfe_url', 'application/pdf'),
+    'xml': ('nfe_xml_url', 'application/xml'),
+}
+
+
+def chave_valida(chave: str | None) -> bool:
+    """Chave de acesso: 44 dígitos (também impede path traversal no nome do arquivo)"""
+    return bool(chave) and len(chave) == 44 and chave.isdigit()
+
+
+class ArmazenamentoDocumentos(Protocol):
+    def caminho(self, chave: str, tipo: str) -> Path | None: ...
+    def salvar(self, chave: str, tipo: str, conteudo: bytes) -> Path: ...
+
+
+class ArmazenamentoLocal:
+    """
+    Documentos em disco, endereçados pela chave da NF-e: {raiz}/{chave[-2:]}/{chave}.{tipo}.
+    A NF-e autorizada não muda, então o arquivo é gravado uma vez e nunca invalidado.
+    """
+
+    def __init__(self, raiz: Path):
+        self.raiz = raiz
+
+    def _arquivo(self, chave: str, tipo: str) -> Path:
+        return self.raiz / chave[-2:] / f'{chave}.{tipo}'
+
+    def caminho(self, chave: str, tipo: str) -> Path | None:
+        """Caminho do documento se já estiver em cache"""
+        arquivo = self._arquivo(chave, tipo)
+        return arquivo if arquivo.is_file() else None
+
+    def salvar(self, chave: str, tipo: str, conteudo: bytes) -> Path:
+        arquivo = self._arquivo(chave, tipo)
+        arquivo.parent.mkdir(parents=True, exist_ok=True)
+        # Escrita atômica: leitores nunca veem arquivo pela metade
+        fd, tmp = tempfile.mkstemp(dir=arquivo.parent, prefix=f'.{chave}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(conteudo)
+            os.replace(tmp, arquivo)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return arquivo
+
+
+@lru_cache
+def get_armazenamento() -> ArmazenamentoDocumentos:
+    settings = get_settings()
+    raiz = settings.NFE_DOCUMENTOS_DIR or str(Path(__file__).resolve().parent.parent.parent / 'storage' / 'nfe')
+    return ArmazenamentoLocal(Path(raiz))
+
+
+async def baixar_documento(chave: str, tipo: str, url: str, token: str) -> Path | None:
+    """Baixa o documento da Focus (cliente compartilhado) e grava no cache. None se falhar"""
+    if not chave_valida(chave):
+        return None
+    armazenamento = get_armazenamento()
+    try:
+        response = await http_clients.get('focus').get(url, auth=(token, '') if token else None)
+    except Exception as exc:
+        logger.warning('Erro ao baixar %s da NF-e %s: %s', tipo, chave, exc)
+        return None
+    if response.status_code != 200 or not response.content:
+        logger.warning('Focus retornou %s ao baixar %s da NF-e %s', response.status_code, tipo, chave)
+        return None
+    return await run_in_threadpool(armazenamento.salvar, chave, tipo, response.content)
+
+
+async def armazenar_documentos(campos_nfe: dict[str, Any], token: str) -> None:
+    """Guarda DANFE e XML de uma NF-e autorizada (campos no formato de interpretar_resposta_focus)"""
+    chave = campos_nfe.get('nfe_chave')
+    if campos_nfe.get('nfe_status') != 'autorizado' or not chave_valida(chave):
+        return
+    armazenamento = get_armazenamento()
+    for tipo, (coluna, _) in TIPOS_DOCUMENTO.items():
+        url = campos_nfe.get(coluna)
+        if url and armazenamento.caminho(chave, tipo) is None:
+            await baixar_documento(chave, tipo, url, token)
+
+
+async def armazenar_autorizadas(itens: Iterable[tuple[dict[str, Any], str]]) -> None:
+    """armazenar_documentos para várias NF-e (ex: resultado de um ciclo do worker)"""
+    await asyncio.gather(*(armazenar_documentos(campos, token) for campos, token in itens))
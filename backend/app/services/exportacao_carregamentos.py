@@ -0,0 +1,172 @@
+"""Exportação em streaming de carregamentos (CSV, NDJSON e Parquet)"""
+from __future__ import annotations
+
+import csv
+import enum
+import io
+import json
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Iterator
+
+from sqlalchemy import DateTime, Float, Integer, Numeric
+
+from app.crud import carregamento as carregamento_crud
+from app.db.session import SessionLocal
+from app.models.carregamento import Carregamento
+from app.schemas.carregamento import CarregamentoFiltro
+
+# Linhas buscadas por round-trip do cursor e por bloco escrito na resposta
+TAMANHO_LOTE = 2000
+
+FORMATOS_EXPORTACAO = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+COLUNAS_EXPORTACAO = list(Carregamento.__table__.columns)
+
+
+def _valor_texto(valor: Any) -> Any:
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, (uuid.UUID, Decimal)):
+        return str(valor)
+    return valor
+
+
+def _linhas(filtro: CarregamentoFiltro, group_id: int | None) -> Iterator[list[tuple]]:
+    """
+    Lê as linhas em lotes usando uma sessão própria: o gerador roda depois que a
+    rota retornou, quando a sessão da requisição (get_db) já pode ter sido fechada.
+    """
+    db = SessionLocal()
+    try:
+        lote: list[tuple] = []
+        for row in carregamento_crud.stream_rows(
+            db, colunas=COLUNAS_EXPORTACAO, group_id=group_id, filtro=filtro, batch_size=TAMANHO_LOTE
+        ):
+            lote.append(tuple(row))
+            if len(lote) >= TAMANHO_LOTE:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+    finally:
+        db.close()
+
+
+def _gerar_csv(lotes: Iterator[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c.name for c in COLUNAS_EXPORTACAO])
+    for lote in lotes:
+        writer.writerows([_valor_texto(v) for v in row] for row in lote)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gerar_ndjson(lotes: Iterator[list[tuple]]) -> Iterator[bytes]:
+    nomes = [c.name for c in COLUNAS_EXPORTACAO]
+    for lote in lotes:
+        yield ''.join(
+            json.dumps(dict(zip(nomes, (_valor_texto(v) for v in row))), ensure_ascii=False) + '\n'
+            for row in lote
+        ).encode('utf-8')
+
+
+class _SinkStreaming:
+    """Arquivo só-escrita que acumula os bytes do ParquetWriter até serem drenados para a resposta"""
+
+    def __init__(self) -> None:
+        self._partes: list[bytes] = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados: bytes) -> int:
+        dados = bytes(dados)
+        self._partes.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drenar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def _schema_parquet(pa: Any) -> Any:
+    campos = []
+    for coluna in COLUNAS_EXPORTACAO:
+        tipo = coluna.type
+        if isinstance(tipo, Integer):
+            tipo_pa = pa.int64()
+        elif isinstance(tipo, Numeric) and not isinstance(tipo, Float):
+            tipo_pa = pa.decimal128(tipo.precision, tipo.scale)
+        elif isinstance(tipo, Float):
+            tipo_pa = pa.float64()
+        elif isinstance(tipo, DateTime):
+            tipo_pa = pa.timestamp('us', tz='UTC')
+        else:
+            tipo_pa = pa.string()  # String, Enum, UUID
+        campos.append(pa.field(coluna.name, tipo_pa, nullable=coluna.nullable))
+    return pa.schema(campos)
+
+
+def _gerar_parquet(lotes: Iterator[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _schema_parquet(pa)
+    texto = [f.type == pa.string() for f in schema]
+    sink = _SinkStreaming()
+    # Um row group por lote: a memória fica limitada ao lote atual
+    with pq.ParquetWriter(sink, schema, compression='snappy') as writer:
+        for lote in lotes:
+            colunas = [
+                [_valor_texto(row[i]) if texto[i] else row[i] for row in lote]
+                for i in range(len(schema))
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(valores, type=schema.field(i).type) for i, valores in enumerate(colunas)],
+                schema=schema,
+            ))
+            yield sink.drenar()
+    yield sink.drenar()
+
+
+def parquet_disponivel() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def gerar_exportacao(formato: str, *, filtro: CarregamentoFiltro, group_id: int | None) -> Iterator[bytes]:
+    """Gera o arquivo de exportação em blocos, para uso direto em StreamingResponse"""
+    lotes = _linhas(filtro, group_id)
+    if formato == 'parquet':
+        return _gerar_parquet(lotes)
+    if formato == 'ndjson':
+        return _gerar_ndjson(lotes)
+    return _gerar_csv(lotes)
@@ -1,4 +1,5 @@
 """Serviço de integração com Focus NFe"""
+import logging
 import uuid
 from datetime import datetime
 from typing import Any, Optional
@@ -6,8 +7,11 @@ from typing import Any, Optional
 import httpx
 
 from app.core.config import get_settings
+from app.core.http_clients import http_clients
 from app.core.nfe_enums import NfeType, RegimeTributario, ModalidadeFrete, FinalidadeEmissao, CfopType
 
+logger = logging.getLogger(__name__)
+
 # Base URL da API Focus NFe
 FOCUS_NFE_BASE_URL = {
     'homologacao': 'https://homologacao.focusnfe.com.br',
@@ -33,6 +37,53 @@ def obter_ncm_produto(product: str) -> str:
     # NCM genérico para grãos não especificados
     return '1005.90.90'
 
+class FocusNfeRejeitada(ValueError):
+    """Focus recusou a NF-e (422): dados inválidos, reenviar o mesmo JSON não adianta"""
+
+
+class FocusNfeNaoEncontrada(ValueError):
+    """Focus não conhece a referência consultada (404)"""
+
+
+def focus_base_url() -> str:
+    """URL base da Focus NFe para o ambiente configurado (FOCUS_NFE_BASE_URL sobrescreve)"""
+    settings = get_settings()
+    return settings.FOCUS_NFE_BASE_URL or FOCUS_NFE_BASE_URL[settings.FOCUS_NFE_AMBIENTE]
+
+
+def resolver_token_focus(group_token: str | None) -> str:
+    """Token do grupo; em homologação cai para FOCUS_NFE_TOKEN do .env. Vazio se não houver"""
+    if group_token:
+        return group_token
+    settings = get_settings()
+    if settings.FOCUS_NFE_AMBIENTE == 'homologacao':
+        return settings.FOCUS_NFE_TOKEN or ''
+    return ''
+
+
+def interpretar_resposta_focus(resposta: dict[str, Any]) -> dict[str, Any]:
+    """Converte a resposta da Focus nos campos nfe_* do carregamento"""
+    chave = resposta.get('chave_nfe')
+    # Focus retorna 'NFe' + 44 dígitos; a coluna guarda só a chave
+    if chave and chave.startswith('NFe'):
+        chave = chave[3:]
+
+    return {
+        'nfe_status': {
+            'autorizado': 'autorizado',
+            'processando': 'processando',
+            'processando_autorizacao': 'processando',
+            'cancelado': 'cancelado',
+            'erro_autorizacao': 'erro',
+            'denegado': 'erro',
+        }.get(resposta.get('status', 'erro'), 'erro'),
+        'nfe_protocolo': resposta.get('protocolo'),
+        'nfe_chave': chave,
+        'nfe_xml_url': resposta.get('caminho_xml_nota_fiscal'),
+        'nfe_danfe_url': resposta.get('caminho_danfe'),
+    }
+
+
 def gerar_referencia(ambiente: str) -> str:
     """Gera referência única para a NFe (hml_xxxx ou prod_xxxx)"""
     prefixo = 'hml' if ambiente == 'homologacao' else 'prod'
@@ -404,69 +455,56 @@ async def enviar_nfe_focus(nfe_data: dict[str, Any], token: str) -> dict[str, An
     """
     Envia a NFe para a API Focus NFe e retorna a resposta.
     """
-    settings = get_settings()
-    ambiente = settings.FOCUS_NFE_AMBIENTE
-    base_url = FOCUS_NFE_BASE_URL[ambiente]
+    base_url = focus_base_url()
     referencia = nfe_data['ref']
 
     url = f'{base_url}/v2/nfe?ref={referencia}'
-
-    # DEBUG: Logs
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.info(f"Enviando NFe Ref: {referencia}")
-    
-    print(f"DEBUG: URL Focus NFe: '{url}'")
-    print(f"DEBUG: Token usado (primeiros 5 chars): '{token[:5] if token else 'None'}'")
-    
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(
-                url,
-                json=nfe_data,
-                auth=(token, "") 
-            )
-        except httpx.ConnectError as e:
-            print(f"DEBUG: ConnectError: {e}")
-            raise ValueError(f"Erro de Conexão com Focus NFe: Verifique sua internet ou DNS. {e}")
-        except Exception as e:
-             print(f"DEBUG: Exception: {e}")
-             raise e
-        
-        if response.status_code == 422:
-            result = response.json()
-            if 'mensagem' in result:
-                raise ValueError(f"Erro Focus: {result['mensagem']}")
-            if 'erros' in result:
-                 raise ValueError(f"Erros Focus: {result['erros']}")
-            raise ValueError(f"Erro 422: {response.text}")
-
-        response.raise_for_status()
-        return response.json()
+    logger.info('Enviando NFe Ref: %s', referencia)
+    logger.debug('URL Focus NFe: %s', url)
+
+    client = http_clients.get('focus')
+    try:
+        response = await client.post(
+            url,
+            json=nfe_data,
+            auth=(token, "")
+        )
+    except httpx.ConnectError as e:
+        logger.debug('Falha de conexão com a Focus NFe (ref %s): %s', referencia, e)
+        raise ValueError(f"Erro de Conexão com Focus NFe: Verifique sua internet ou DNS. {e}")
+
+    if response.status_code == 422:
+        result = response.json()
+        if 'mensagem' in result:
+            raise FocusNfeRejeitada(f"Erro Focus: {result['mensagem']}")
+        if 'erros' in result:
+             raise FocusNfeRejeitada(f"Erros Focus: {result['erros']}")
+        raise FocusNfeRejeitada(f"Erro 422: {response.text}")
+
+    response.raise_for_status()
+    return response.json()
 
 
 async def consultar_nfe_focus(referencia: str, token: str) -> dict[str, Any]:
     """
     Consulta o status da NFe na API Focus NFe pela referência.
     """
-    settings = get_settings()
-    ambiente = settings.FOCUS_NFE_AMBIENTE
-    base_url = FOCUS_NFE_BASE_URL[ambiente]
+    base_url = focus_base_url()
     
     # Endpoint de Consulta: GET /v2/nfe/{ref}?completa=1 (para pegar caminhos)
     url = f'{base_url}/v2/nfe/{referencia}?completo=1'
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(
-                url,
-                auth=(token, "")
-            )
-        except httpx.ConnectError as e:
-            raise ValueError(f"Erro de Conexão com Focus NFe: {e}")
-            
-        if response.status_code == 404:
-            raise ValueError("NFe não encontrada na Focus NFe")
-            
-        response.raise_for_status()
-        return response.json()
+    client = http_clients.get('focus')
+    try:
+        response = await client.get(
+            url,
+            auth=(token, "")
+        )
+    except httpx.ConnectError as e:
+        raise ValueError(f"Erro de Conexão com Focus NFe: {e}")
+        
+    if response.status_code == 404:
+        raise FocusNfeNaoEncontrada("NFe não encontrada na Focus NFe")
+        
+    response.raise_for_status()
+    return response.json()
@@ -0,0 +1,357 @@
+"""Importação em lote de carregamentos (planilhas CSV/XLSX de tickets de balança)"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import IO, Any, Iterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import invalidar_apos_commit
+from app.crud.crud_armazem import armazem as armazem_crud
+from app.crud.crud_carregamento_sugestao import SUGESTAO_CAMPOS, carregamento_sugestao
+from app.crud.crud_producao import producao
+from app.db.replicas import marcar_escrita_apos_commit
+from app.models.armazem import Armazem
+from app.models.carregamento import Carregamento, TipoCarregamento
+from app.models.farm import Farm
+from app.schemas.armazem import normalizar_cnpj
+from app.schemas.carregamento import CarregamentoForm
+from app.services.calculo_peso_service import calcular_descontos_decimal, para_decimal
+from app.services.recalculo_descontos import recalcular_descontos_armazem
+
+# Linhas por INSERT em lote (executemany / insertmanyvalues) e por commit
+TAMANHO_LOTE = 1000
+# Limite de linhas com erro detalhadas no relatório (o total é sempre contado)
+MAX_ERROS_RELATORIO = 1000
+
+_CAMPOS_TEXTO = {
+    nome for nome, campo in CarregamentoForm.model_fields.items()
+    if campo.annotation in (str, Optional[str])
+}
+_CAMPOS_NUMERICOS = {
+    nome for nome, campo in CarregamentoForm.model_fields.items()
+    if campo.annotation is Optional[float]
+} | {'quantity', 'valor_unitario'}
+
+
+# Número pt-BR: milhar com ponto e decimal com vírgula ("1.234,56", "1234,5")
+_NUMERO_PTBR = re.compile(r'-?\d{1,3}(\.\d{3})+(,\d+)?|-?\d+,\d+')
+_FORMATO_NUMERO = 'use 1234.56 ou 1.234,56'
+
+
+class ErroLinha(Exception):
+    def __init__(self, erros: list[str]):
+        super().__init__('; '.join(erros))
+        self.erros = erros
+
+
+def ler_csv(arquivo: IO[bytes]) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Lê o CSV linha a linha (separador ',', ';' ou tab detectado pela amostra inicial)"""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+
+    # Linha 1 é o cabeçalho
+    for numero, linha in enumerate(csv.DictReader(texto, dialect=dialeto), start=2):
+        yield numero, linha
+
+
+def ler_xlsx(arquivo: IO[bytes]) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Lê a primeira aba da planilha em modo read-only (streaming)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ValueError('Importação de XLSX requer o pacote openpyxl') from exc
+
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if not cabecalho:
+            return
+        chaves = [str(c).strip() if c is not None else None for c in cabecalho]
+        for numero, valores in enumerate(linhas, start=2):
+            if all(v is None for v in valores):
+                continue
+            yield numero, dict(zip(chaves, valores))
+    finally:
+        workbook.close()
+
+
+def _normalizar(linha: dict[str, Any]) -> dict[str, Any]:
+    """Limpa células vazias e converte tipos da planilha para o formato do CarregamentoForm"""
+    dados: dict[str, Any] = {}
+    for chave, valor in linha.items():
+        if not chave:
+            continue  # Colunas sem cabeçalho
+        chave = chave.strip()
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if valor is None or valor == '':
+            continue
+        if isinstance(valor, datetime):
+            valor = valor.isoformat()
+        if chave in _CAMPOS_NUMERICOS and isinstance(valor, str) and _NUMERO_PTBR.fullmatch(valor):
+            valor = valor.replace('.', '').replace(',', '.')
+        if chave in _CAMPOS_TEXTO and not isinstance(valor, str):
+            valor = str(valor)
+        dados[chave] = valor
+    return dados
+
+
+def _mensagem_validacao(erro: dict[str, Any]) -> str:
+    campo = '.'.join(str(x) for x in erro['loc']) or 'linha'
+    mensagem = f"{campo}: {erro['msg']}"
+    if campo in _CAMPOS_NUMERICOS:
+        mensagem += f" ({erro['input']!r}; {_FORMATO_NUMERO})"
+    return mensagem
+
+
+def _parse_scheduled_at(valor: str) -> datetime:
+    """Mesmas regras do POST /carregamentos: sem fuso explícito assume UTC"""
+    if 'Z' in valor:
+        valor = valor.replace('Z', '+00:00')
+    elif '+' not in valor and valor.count(':') >= 2:
+        valor = valor + '+00:00'
+    return datetime.fromisoformat(valor)
+
+
+class ImportadorCarregamentos:
+    """
+    Valida e insere carregamentos em lotes para um grupo.
+    Fazendas e armazéns são carregados uma única vez em mapas em memória (nome / CNPJ / id);
+    armazéns novos (CNPJ desconhecido com nome) são criados uma vez e reaproveitados.
+    Carregamentos importados são histórico: não emitem NF-e (nfe_status fica vazio).
+    """
+
+    def __init__(self, db: Session, *, group_id: int, tamanho_lote: int = TAMANHO_LOTE):
+        self.db = db
+        self.group_id = group_id
+        self.tamanho_lote = tamanho_lote
+
+        self.fazendas = {
+            f.name: f.id for f in db.execute(select(Farm.id, Farm.name).where(Farm.group_id == group_id))
+        }
+        armazens = db.execute(select(Armazem)).scalars().all()
+        self.armazens_por_id = {a.id: a for a in armazens}
+        self.armazens_por_cnpj = {a.cnpj: a for a in armazens if a.cnpj}
+
+        self.pendentes: list[dict[str, Any]] = []
+        self.armazens_novos: list[Armazem] = []
+        self.total_linhas = 0
+        self.importados = 0
+        self.com_erro = 0
+        self.erros: list[dict[str, Any]] = []
+
+    def processar(self, linhas: Iterator[tuple[int, dict[str, Any]]]) -> dict[str, Any]:
+        for numero, linha in linhas:
+            self.total_linhas += 1
+            try:
+                self.pendentes.append(self._preparar(linha))
+            except ErroLinha as exc:
+                self.com_erro += 1
+                if len(self.erros) < MAX_ERROS_RELATORIO:
+                    self.erros.append({'linha': numero, 'erros': exc.erros})
+                continue
+
+            if len(self.pendentes) >= self.tamanho_lote:
+                self._descarregar()
+
+        self._descarregar()
+        return {
+            'total_linhas': self.total_linhas,
+            'importados': self.importados,
+            'com_erro': self.com_erro,
+            'erros': self.erros,
+        }
+
+    def _preparar(self, linha: dict[str, Any]) -> dict[str, Any]:
+        try:
+            form = CarregamentoForm.model_validate(_normalizar(linha))
+        except ValidationError as exc:
+            raise ErroLinha([_mensagem_validacao(e) for e in exc.errors()]) from exc
+
+        erros = []
+        try:
+            scheduled_at = _parse_scheduled_at(form.scheduledAt)
+        except ValueError:
+            erros.append(f'scheduledAt: data inválida ({form.scheduledAt})')
+        try:
+            quantity = float(form.quantity)
+        except ValueError:
+            erros.append(f'quantity: quantidade inválida ({form.quantity}); {_FORMATO_NUMERO}')
+        try:
+            tipo = TipoCarregamento(form.type)
+        except ValueError:
+            erros.append(f"type: tipo inválido ({form.type}). Permitidos: {', '.join(t.value for t in TipoCarregamento)}")
+        farm_id = self.fazendas.get(form.farm)
+        if farm_id is None:
+            erros.append(f"farm: fazenda '{form.farm}' não encontrada no grupo")
+        armazem, armazem_novo = self._resolver_armazem(form, erros)
+        if erros:
+            raise ErroLinha(erros)
+
+        # Mesmos cálculos do POST /carregamentos
+        peso_liquido = None
+        if form.peso_bruto_kg and form.tara_kg:
+            peso_liquido = para_decimal(form.peso_bruto_kg) - para_decimal(form.tara_kg)
+        base_calc = peso_liquido or para_decimal(quantity)
+        umidade = para_decimal(form.umidade_percent or 0)
+        impurezas = para_decimal(form.impurezas_percent or 0)
+
+        desc_fazenda = calcular_descontos_decimal(
+            peso_liquido=base_calc,
+            umidade_medida=umidade,
+            impurezas_medida=impurezas,
+            umidade_padrao=form.umidade_padrao or 14.0,
+            fator_umidade=form.fator_umidade or 1.5,
+            impurezas_padrao=form.impurezas_padrao or 1.0,
+        )
+        desc_armazem = None
+        if armazem is not None:
+            desc_armazem = calcular_descontos_decimal(
+                peso_liquido=base_calc,
+                umidade_medida=umidade,
+                impurezas_medida=impurezas,
+                umidade_padrao=armazem.umidade_padrao,
+                fator_umidade=armazem.fator_umidade,
+                impurezas_padrao=armazem.impurezas_padrao,
+            )
+
+        if armazem_novo:
+            # Só depois de a linha passar na validação: linha com erro não cria armazém
+            self.armazens_por_cnpj[armazem.cnpj] = armazem
+            self.armazens_por_id[armazem.id] = armazem
+            self.armazens_novos.append(armazem)
+
+        return {
+            'truck': form.truck,
+            'driver': form.driver,
+            'driver_document': form.driver_document,
+            'farm': form.farm,
+            'farm_id': farm_id,
+            'group_id': self.group_id,
+            'field': form.field,
+            'product': form.product,
+            'variety': form.variety,
+            'quantity': quantity,
+            'unit': form.unit,
+            'destination': form.destination,
+            'scheduled_at': scheduled_at,
+            'type': tipo,
+            'nfe_status': None,
+            'peso_estimado_kg': form.peso_estimado_kg,
+            'peso_bruto_kg': form.peso_bruto_kg,
+            'tara_kg': form.tara_kg,
+            'peso_liquido_kg': peso_liquido,
+            'umidade_percent': form.umidade_percent,
+            'impurezas_percent': form.impurezas_percent,
+            'peso_com_desconto_fazenda': desc_fazenda['peso_com_desconto'],
+            'peso_com_desconto_armazem': desc_armazem['peso_com_desconto'] if desc_armazem else None,
+            'peso_recebido_final_kg': form.peso_recebido_final_kg,
+            'armazem_destino_id': armazem.id if armazem is not None else None,
+            'umidade_padrao': form.umidade_padrao if form.umidade_padrao is not None else 14.0,
+            'fator_umidade': form.fator_umidade if form.fator_umidade is not None else 1.5,
+            'impurezas_padrao': form.impurezas_padrao if form.impurezas_padrao is not None else 1.0,
+            'umidade_empresa_percent': form.umidade_empresa_percent,
+            'impurezas_empresa_percent': form.impurezas_empresa_percent,
+            'peso_com_desconto_empresa': form.peso_com_desconto_empresa,
+            'natureza_operacao': form.natureza_operacao,
+            'cfop': form.cfop,
+            'ncm': form.ncm,
+            'valor_unitario': float(form.valor_unitario) if form.valor_unitario else None,
+        }
+
+    def _resolver_armazem(self, form: CarregamentoForm, erros: list[str]) -> tuple[Armazem | None, bool]:
+        """Armazém de destino da linha e se é novo (ainda não registrado nos mapas)"""
+        if form.armazem_destino_id:
+            try:
+                armazem = self.armazens_por_id.get(uuid.UUID(form.armazem_destino_id))
+            except ValueError:
+                armazem = None
+            if armazem is None:
+                erros.append(f'armazem_destino_id: armazém {form.armazem_destino_id} não encontrado')
+            return armazem, False
+
+        # armazens.cnpj guarda só os dígitos
+        cnpj = normalizar_cnpj(form.cnpj_destinatario)
+        if cnpj is None:
+            return None, False
+
+        armazem = self.armazens_por_cnpj.get(cnpj)
+        if armazem is None and form.nome_destinatario:
+            # Criado uma única vez por CNPJ; próximas linhas reaproveitam pelo mapa
+            return Armazem(
+                id=uuid.uuid4(),
+                nome=form.nome_destinatario,
+                cnpj=cnpj,
+                inscricao_estadual=form.inscricao_estadual_destinatario,
+                logradouro=form.logradouro_destinatario,
+                numero=form.numero_destinatario,
+                bairro=form.bairro_destinatario,
+                municipio=form.municipio_destinatario,
+                uf=form.uf_destinatario,
+                cep=form.cep_destinatario,
+                eh_proprio=False,
+                umidade_padrao=14.0,
+                fator_umidade=1.5,
+                impurezas_padrao=1.0,
+            ), True
+        return armazem, False
+
+    def _descarregar(self) -> None:
+        """Grava o lote pendente: armazéns novos, carregamentos, autocomplete e rollup de produção"""
+        if not self.pendentes:
+            return
+
+        # CNPJ cadastrado por outra requisição durante a importação: as linhas passam para o
+        # armazém existente e os descontos dele são recalculados com os parâmetros dele
+        reaproveitados: dict[uuid.UUID, Armazem] = {}
+        for novo in self.armazens_novos:
+            armazem, criado = armazem_crud.get_or_create_by_cnpj(self.db, cnpj=novo.cnpj, dados={
+                c.key: getattr(novo, c.key) for c in Armazem.__table__.columns if c.key != 'cnpj'
+            })
+            if not criado:
+                reaproveitados[novo.id] = armazem
+                self.armazens_por_id.pop(novo.id, None)
+            self.armazens_por_cnpj[armazem.cnpj] = armazem
+            self.armazens_por_id[armazem.id] = armazem
+        self.armazens_novos = []
+        for row in self.pendentes:
+            if row['armazem_destino_id'] in reaproveitados:
+                row['armazem_destino_id'] = reaproveitados[row['armazem_destino_id']].id
+
+        self.db.execute(insert(Carregamento), self.pendentes)
+        for armazem in reaproveitados.values():
+            recalcular_descontos_armazem(self.db, armazem=armazem)
+
+        deltas: Counter[tuple[str, str]] = Counter()
+        for row in self.pendentes:
+            for campo in SUGESTAO_CAMPOS:
+                if row[campo]:
+                    deltas[(campo, row[campo])] += 1
+        carregamento_sugestao.aplicar_deltas(self.db, group_id=self.group_id, deltas=deltas)
+        producao.registrar(self.db, novos=self.pendentes)
+        invalidar_apos_commit(self.db, self.group_id)
+        marcar_escrita_apos_commit(self.db, [self.group_id])
+
+        self.db.commit()
+        self.importados += len(self.pendentes)
+        self.pendentes = []
+
+
+def importar_carregamentos(db: Session, *, arquivo: IO[bytes], formato: str, group_id: int) -> dict[str, Any]:
+    """Importa um arquivo CSV/XLSX e retorna o relatório (totais + erros por linha)"""
+    linhas = ler_xlsx(arquivo) if formato == 'xlsx' else ler_csv(arquivo)
+    return ImportadorCarregamentos(db, group_id=group_id).processar(linhas)
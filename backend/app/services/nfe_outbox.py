@@ -0,0 +1,185 @@
+"""Worker da fila de emissão de NF-e (outbox nfe_emissoes)"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import get_settings
+from app.core.eventos import publicar_evento
+from app.crud import nfe_emissao as nfe_emissao_crud
+from app.db.session import SessionLocal
+from app.services import documentos_nfe, focus_nfe
+
+logger = logging.getLogger(__name__)
+
+EnviarNfe = Callable[[dict[str, Any], str], Awaitable[dict[str, Any]]]
+ConsultarNfe = Callable[[str, str], Awaitable[dict[str, Any]]]
+
+# Espera entre tentativas: 30s, 60s, 120s... até 1h
+ATRASO_BASE_SEGUNDOS = 30
+ATRASO_MAX_SEGUNDOS = 3600
+
+
+class NfeOutboxWorker:
+    """
+    Lê emissões pendentes da outbox, envia para a Focus NFe e grava o resultado no carregamento.
+    Pode rodar como task asyncio dentro da API (lifespan) ou em um processo separado.
+    `enviar` / `consultar` permitem trocar as chamadas à Focus (ex: stand-in local nos testes).
+    """
+
+    def __init__(
+        self,
+        *,
+        enviar: EnviarNfe | None = None,
+        consultar: ConsultarNfe | None = None,
+        session_factory: sessionmaker[Session] = SessionLocal,
+    ):
+        self._enviar = enviar
+        self._consultar = consultar
+        self._session_factory = session_factory
+        self._acordar: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def notificar(self) -> None:
+        """Acorda o worker antes do próximo poll (chamado após enfileirar uma emissão)"""
+        if self._loop is not None and self._acordar is not None:
+            self._loop.call_soon_threadsafe(self._acordar.set)
+
+    async def run(self) -> None:
+        """Loop principal: processa lotes até a task ser cancelada"""
+        settings = get_settings()
+        self._loop = asyncio.get_running_loop()
+        self._acordar = asyncio.Event()
+        logger.info('Worker da outbox de NF-e iniciado')
+        try:
+            while True:
+                try:
+                    processadas = await self.processar_lote()
+                except Exception:
+                    logger.exception('Falha ao processar lote da outbox de NF-e')
+                    processadas = 0
+
+                # Lote cheio: provavelmente há mais pendentes, segue sem esperar
+                if processadas >= settings.NFE_OUTBOX_BATCH_SIZE:
+                    continue
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), timeout=settings.NFE_OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._acordar.clear()
+        finally:
+            self._loop = None
+            self._acordar = None
+
+    async def processar_lote(self) -> int:
+        """Reserva, envia e grava um lote. Retorna quantas emissões foram processadas"""
+        settings = get_settings()
+        reservadas = await run_in_threadpool(
+            self._reservar, settings.NFE_OUTBOX_BATCH_SIZE, settings.NFE_OUTBOX_LEASE_SECONDS
+        )
+        if not reservadas:
+            return 0
+
+        resultados = await asyncio.gather(*(self._enviar_uma(e) for e in reservadas))
+        transicoes = await run_in_threadpool(self._gravar, resultados, settings.NFE_OUTBOX_MAX_ATTEMPTS)
+        for group_id, dados in transicoes:
+            publicar_evento(group_id, 'nfe.status', dados)
+
+        # NF-e já autorizada na resposta do envio: guarda DANFE/XML no cache local
+        await documentos_nfe.armazenar_autorizadas(
+            (focus_nfe.interpretar_resposta_focus(resposta), focus_nfe.resolver_token_focus(emissao['group_token']))
+            for emissao, resposta, erro in resultados
+            if erro is None
+        )
+        return len(reservadas)
+
+    def _reservar(self, limite: int, lease_segundos: int) -> list[dict[str, Any]]:
+        db = self._session_factory()
+        try:
+            return nfe_emissao_crud.reservar(db, limite=limite, lease_segundos=lease_segundos)
+        finally:
+            db.close()
+
+    async def _enviar_uma(self, emissao: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any] | None, Exception | None]:
+        token = focus_nfe.resolver_token_focus(emissao['group_token'])
+        if not token:
+            return emissao, None, focus_nfe.FocusNfeRejeitada('Grupo não possui Token da Focus NFe configurado')
+
+        enviar = self._enviar or focus_nfe.enviar_nfe_focus
+        consultar = self._consultar or focus_nfe.consultar_nfe_focus
+        referencia = emissao['referencia']
+        reenvio = emissao['tentativas'] > 1
+        try:
+            if reenvio:
+                # A tentativa anterior pode ter chegado à Focus (lease expirou com a Focus
+                # ainda processando): só envia de novo se a referência nunca foi vista
+                try:
+                    return emissao, await consultar(referencia, token), None
+                except focus_nfe.FocusNfeNaoEncontrada:
+                    pass
+            return emissao, await enviar(emissao['payload'], token), None
+        except focus_nfe.FocusNfeRejeitada as exc:
+            if reenvio:
+                # 422 num reenvio pode ser a Focus recusando a referência duplicada:
+                # não é definitivo, a próxima tentativa consulta antes de enviar
+                logger.warning('NF-e %s recusada no reenvio, nova consulta na próxima tentativa: %s', referencia, exc)
+                return emissao, None, ValueError(str(exc))
+            logger.warning('Erro ao enviar NF-e %s: %s', referencia, exc)
+            return emissao, None, exc
+        except Exception as exc:
+            logger.warning('Erro ao enviar NF-e %s: %s', referencia, exc)
+            return emissao, None, exc
+
+    def _gravar(
+        self,
+        resultados: list[tuple[dict[str, Any], dict[str, Any] | None, Exception | None]],
+        max_tentativas: int,
+    ) -> list[tuple[int | None, dict[str, Any]]]:
+        """Grava o lote e retorna as mudanças de nfe_status (group_id, dados) para o feed de eventos"""
+        transicoes = []
+        db = self._session_factory()
+        try:
+            agora = datetime.now(timezone.utc)
+            for emissao, resposta, erro in resultados:
+                if erro is None:
+                    campos_nfe = focus_nfe.interpretar_resposta_focus(resposta)
+                    nfe_emissao_crud.concluir(
+                        db,
+                        emissao_id=emissao['id'],
+                        carregamento_id=emissao['carregamento_id'],
+                        campos_nfe=campos_nfe,
+                    )
+                    transicoes.append((emissao['group_id'], {'id': emissao['carregamento_id'], **campos_nfe}))
+                    continue
+
+                proxima = None
+                definitivo = isinstance(erro, focus_nfe.FocusNfeRejeitada)
+                if not definitivo and emissao['tentativas'] < max_tentativas:
+                    atraso = min(ATRASO_BASE_SEGUNDOS * 2 ** (emissao['tentativas'] - 1), ATRASO_MAX_SEGUNDOS)
+                    proxima = agora + timedelta(seconds=atraso)
+                nfe_emissao_crud.registrar_falha(
+                    db,
+                    emissao_id=emissao['id'],
+                    carregamento_id=emissao['carregamento_id'],
+                    erro=str(erro),
+                    proxima_tentativa_em=proxima,
+                )
+                if proxima is None:
+                    transicoes.append((emissao['group_id'], {'id': emissao['carregamento_id'], 'nfe_status': 'erro'}))
+            db.commit()
+        finally:
+            db.close()
+        return transicoes
+
+
+nfe_outbox_worker = NfeOutboxWorker()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(nfe_outbox_worker.run())
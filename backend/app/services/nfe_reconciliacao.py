@@ -0,0 +1,161 @@
+"""Reconciliação periódica do status das NF-e com a Focus NFe"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text
+
+from app.core.config import get_settings
+from app.core.eventos import publicar_evento
+from app.crud import carregamento as carregamento_crud
+from app.db.session import SessionLocal, engine
+from app.models.carregamento import Carregamento
+from app.services import documentos_nfe, focus_nfe
+
+logger = logging.getLogger(__name__)
+
+# Chave do pg_try_advisory_lock: só uma instância da API reconcilia por vez
+_ADVISORY_LOCK_KEY = zlib.crc32(b'nfe_reconciliacao')
+
+STATUS_FINAIS = {'autorizado', 'cancelado', 'erro'}
+
+
+@dataclass
+class _Espera:
+    tentativas: int
+    proxima_em: float  # time.monotonic()
+
+
+class NfeReconciliador:
+    """
+    Consulta na Focus as NF-e em 'pendente'/'processando' até chegarem a um status final.
+    Cada carregamento tem backoff exponencial com jitter (em memória); as consultas
+    são limitadas por token da Focus e o resultado do ciclo é gravado em um único commit.
+    """
+
+    def __init__(self) -> None:
+        self._esperas: dict[int, _Espera] = {}
+        self._semaforos: dict[str, asyncio.Semaphore] = {}
+
+    async def run(self) -> None:
+        settings = get_settings()
+        logger.info('Reconciliação de NF-e iniciada')
+        while True:
+            try:
+                await self.executar_ciclo()
+            except Exception:
+                logger.exception('Falha no ciclo de reconciliação de NF-e')
+            await asyncio.sleep(settings.NFE_RECONCILIACAO_INTERVAL_SECONDS)
+
+    async def executar_ciclo(self) -> int:
+        """Roda um ciclo se conseguir o advisory lock. Retorna quantas NF-e foram consultadas"""
+        conn = await run_in_threadpool(lambda: engine.connect().execution_options(isolation_level='AUTOCOMMIT'))
+        try:
+            obtido = await run_in_threadpool(
+                lambda: conn.execute(text('SELECT pg_try_advisory_lock(:k)'), {'k': _ADVISORY_LOCK_KEY}).scalar()
+            )
+            if not obtido:
+                return 0
+            try:
+                return await self._ciclo()
+            finally:
+                await run_in_threadpool(
+                    lambda: conn.execute(text('SELECT pg_advisory_unlock(:k)'), {'k': _ADVISORY_LOCK_KEY})
+                )
+        finally:
+            await run_in_threadpool(conn.close)
+
+    async def _ciclo(self) -> int:
+        settings = get_settings()
+        agora = time.monotonic()
+        self._limpar(agora, settings.NFE_RECONCILIACAO_BACKOFF_MAX_SECONDS)
+        em_espera = [cid for cid, espera in self._esperas.items() if espera.proxima_em > agora]
+
+        candidatos = await run_in_threadpool(self._buscar_candidatos, settings.NFE_RECONCILIACAO_BATCH_SIZE, em_espera)
+        if not candidatos:
+            return 0
+
+        resultados = await asyncio.gather(*(self._consultar(c) for c in candidatos))
+        atualizacoes = {cid: campos for cid, campos in resultados if campos is not None}
+        if atualizacoes:
+            await run_in_threadpool(self._gravar, atualizacoes)
+            por_id = {c.id: c for c in candidatos}
+            for cid, campos in atualizacoes.items():
+                publicar_evento(por_id[cid].group_id, 'nfe.status', {'id': cid, **campos})
+            # Autorizadas: DANFE/XML vão para o cache local (não mudam mais)
+            tokens = {c.id: focus_nfe.resolver_token_focus(c.focus_nfe_token) for c in candidatos}
+            await documentos_nfe.armazenar_autorizadas(
+                (campos, tokens[cid]) for cid, campos in atualizacoes.items()
+            )
+
+        for cid, campos in resultados:
+            if campos is not None and campos['nfe_status'] in STATUS_FINAIS:
+                self._esperas.pop(cid, None)
+            else:
+                self._agendar(cid, agora, settings)
+        return len(candidatos)
+
+    def _buscar_candidatos(self, limite: int, em_espera: list[int]) -> list[Any]:
+        db = SessionLocal()
+        try:
+            return list(carregamento_crud.get_nfe_em_aberto(db, limite=limite, ignorar_ids=em_espera))
+        finally:
+            db.close()
+
+    def _semaforo(self, token: str) -> asyncio.Semaphore:
+        semaforo = self._semaforos.get(token)
+        if semaforo is None:
+            semaforo = asyncio.Semaphore(get_settings().NFE_RECONCILIACAO_CONCURRENCY_PER_TOKEN)
+            self._semaforos[token] = semaforo
+        return semaforo
+
+    async def _consultar(self, candidato: Any) -> tuple[int, dict[str, Any] | None]:
+        token = focus_nfe.resolver_token_focus(candidato.focus_nfe_token)
+        if not token:
+            return candidato.id, None
+
+        async with self._semaforo(token):
+            try:
+                resposta = await focus_nfe.consultar_nfe_focus(candidato.nfe_ref, token)
+            except Exception as exc:
+                logger.warning('Erro ao consultar NF-e %s: %s', candidato.nfe_ref, exc)
+                return candidato.id, None
+        return candidato.id, focus_nfe.interpretar_resposta_focus(resposta)
+
+    def _gravar(self, atualizacoes: dict[int, dict[str, Any]]) -> None:
+        db = SessionLocal()
+        try:
+            carregamentos = db.execute(
+                select(Carregamento).where(Carregamento.id.in_(list(atualizacoes)))
+            ).scalars()
+            for db_obj in carregamentos:
+                carregamento_crud.update_nfe_data(db, db_obj=db_obj, commit=False, **atualizacoes[db_obj.id])
+            db.commit()
+        finally:
+            db.close()
+
+    def _agendar(self, carregamento_id: int, agora: float, settings: Any) -> None:
+        espera = self._esperas.get(carregamento_id) or _Espera(tentativas=0, proxima_em=agora)
+        espera.tentativas += 1
+        atraso = min(
+            settings.NFE_RECONCILIACAO_BACKOFF_BASE_SECONDS * 2 ** (espera.tentativas - 1),
+            settings.NFE_RECONCILIACAO_BACKOFF_MAX_SECONDS,
+        )
+        # Jitter: espalha as consultas para não sincronizar todas no mesmo ciclo
+        espera.proxima_em = agora + atraso * random.uniform(0.5, 1.5)
+        self._esperas[carregamento_id] = espera
+
+    def _limpar(self, agora: float, atraso_max: float) -> None:
+        """Descarta esperas vencidas há muito tempo (carregamento resolvido por outro caminho)"""
+        for cid in [cid for cid, e in self._esperas.items() if e.proxima_em < agora - 2 * atraso_max]:
+            del self._esperas[cid]
+
+
+nfe_reconciliador = NfeReconciliador()
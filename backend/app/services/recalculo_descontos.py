@@ -0,0 +1,141 @@
+"""Recalcula peso_com_desconto_armazem dos carregamentos quando os parâmetros do armazém mudam"""
+from __future__ import annotations
+
+import logging
+import sys
+import uuid
+
+import numpy as np
+from decimal import Decimal
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import invalidar_apos_commit
+from app.db.replicas import marcar_escrita_apos_commit
+from app.models.armazem import Armazem
+from app.models.carregamento import Carregamento
+from app.services.calculo_peso_service import calcular_descontos_lote, para_decimal, quantizar_kg
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_LOTE = 5000
+
+# Um UPDATE por lote: ids e pesos (inteiros, em centésimos de kg) vão como dois arrays
+# e o unnest os transforma em linhas; a divisão em numeric mantém o valor exato
+_UPDATE_LOTE = text("""
+    UPDATE carregamentos AS c
+    SET peso_com_desconto_armazem = v.centesimos::numeric / 100
+    FROM unnest(CAST(:ids AS integer[]), CAST(:centesimos AS bigint[])) AS v(id, centesimos)
+    WHERE c.id = v.id
+""")
+
+
+def parametros_desconto(armazem: Armazem) -> tuple[Decimal, Decimal, Decimal]:
+    """
+    Parâmetros de desconto do armazém na escala das colunas Numeric (0,01). O ORM devolve
+    Decimal do banco e o PUT atribui float: comparar assim evita recalcular sem mudança real.
+    """
+    return tuple(
+        quantizar_kg(para_decimal(valor))
+        for valor in (armazem.umidade_padrao, armazem.fator_umidade, armazem.impurezas_padrao)
+    )
+
+
+def contar_carregamentos(db: Session, *, armazem_id: uuid.UUID) -> int:
+    stmt = select(func.count()).select_from(Carregamento).where(Carregamento.armazem_destino_id == armazem_id)
+    return db.execute(stmt).scalar_one()
+
+
+def recalcular_descontos_armazem(db: Session, *, armazem: Armazem, tamanho_lote: int = TAMANHO_LOTE) -> int:
+    """
+    Reaplica os parâmetros atuais do armazém (umidade_padrao, fator_umidade, impurezas_padrao)
+    a todos os carregamentos com esse destino. Lê as colunas em lotes, calcula com
+    calcular_descontos_lote e grava cada lote com um único UPDATE. Não faz commit.
+    Retorna quantos carregamentos foram recalculados.
+    """
+    # Mesma base do cadastro: peso líquido, ou quantity quando não houve pesagem
+    stmt = (
+        select(
+            Carregamento.id,
+            Carregamento.group_id,
+            Carregamento.peso_liquido_kg,
+            Carregamento.quantity,
+            Carregamento.umidade_percent,
+            Carregamento.impurezas_percent,
+        )
+        .where(Carregamento.armazem_destino_id == armazem.id)
+        .order_by(Carregamento.id)
+        .execution_options(stream_results=True, yield_per=tamanho_lote)
+    )
+
+    total = 0
+    grupos: set[int | None] = set()
+    result = db.execute(stmt)
+    try:
+        for lote in result.partitions():
+            ids, group_ids, peso_liquido, quantity, umidade, impurezas = zip(*lote)
+            base = np.array([float(p) if p else float(q or 0) for p, q in zip(peso_liquido, quantity)])
+            descontos = calcular_descontos_lote(
+                peso_liquido=base,
+                umidade_medida=np.array([float(u or 0) for u in umidade]),
+                impurezas_medida=np.array([float(i or 0) for i in impurezas]),
+                umidade_padrao=float(armazem.umidade_padrao),
+                fator_umidade=float(armazem.fator_umidade),
+                impurezas_padrao=float(armazem.impurezas_padrao),
+            )
+            db.execute(_UPDATE_LOTE, {
+                'ids': list(ids),
+                'centesimos': descontos['peso_com_desconto_centesimos'].tolist(),
+            })
+            grupos.update(group_ids)
+            total += len(ids)
+    finally:
+        result.close()
+
+    for group_id in grupos:
+        invalidar_apos_commit(db, group_id)
+    marcar_escrita_apos_commit(db, grupos)
+    return total
+
+
+def recalcular_em_segundo_plano(armazem_id: uuid.UUID) -> None:
+    """
+    Recalcula um armazém em sessão própria, fora da requisição (BackgroundTasks do PUT
+    quando há muitos carregamentos). Se o processo cair no meio, rodar este módulo
+    como script para o armazém refaz o cálculo.
+    """
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        armazem = db.get(Armazem, armazem_id)
+        if armazem is None:
+            return
+        n = recalcular_descontos_armazem(db, armazem=armazem)
+        db.commit()
+        logger.info('Armazém %s (%s): %s carregamentos recalculados', armazem.nome, armazem.id, n)
+    except Exception:
+        logger.exception('Falha ao recalcular descontos do armazém %s', armazem_id)
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    # python -m app.services.recalculo_descontos [armazem_id ...]  (sem ids: todos os armazéns)
+    from app.db import base  # noqa: F401  (registra todos os modelos)
+    from app.db.session import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        stmt = select(Armazem)
+        if len(sys.argv) > 1:
+            stmt = stmt.where(Armazem.id.in_([uuid.UUID(a) for a in sys.argv[1:]]))
+        for armazem in db.execute(stmt).scalars().all():
+            n = recalcular_descontos_armazem(db, armazem=armazem)
+            db.commit()
+            logger.info('Armazém %s (%s): %s carregamentos recalculados', armazem.nome, armazem.id, n)
+    finally:
+        db.close()
@@ -0,0 +1,89 @@
+"""Simulação: quanto os carregamentos renderiam sob as regras de desconto de cada armazém"""
+from __future__ import annotations
+
+from itertools import islice
+from typing import Any, Sequence
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.crud import carregamento as carregamento_crud
+from app.models.carregamento import Carregamento
+from app.schemas.carregamento import CarregamentoFiltro
+from app.services.calculo_peso_service import calcular_descontos_lote
+
+# Linhas por bloco: o bloco é calculado como matriz (linhas x perfis)
+TAMANHO_LOTE = 20000
+
+_COLUNAS = (
+    Carregamento.peso_liquido_kg,
+    Carregamento.quantity,
+    Carregamento.umidade_percent,
+    Carregamento.impurezas_percent,
+    Carregamento.peso_com_desconto_fazenda,
+)
+
+
+def _coluna(lote: Sequence[Any], i: int) -> np.ndarray:
+    return np.fromiter((float(row[i] or 0) for row in lote), dtype=np.float64, count=len(lote))
+
+
+def simular_descontos(
+    db: Session,
+    *,
+    group_id: int | None,
+    filtro: CarregamentoFiltro,
+    perfis: Sequence[dict[str, Any]],
+    tamanho_lote: int = TAMANHO_LOTE,
+) -> dict[str, Any]:
+    """
+    Aplica cada perfil (umidade_padrao, fator_umidade) a todos os carregamentos do
+    filtro; o desconto de impurezas não depende do perfil. Cada bloco de linhas é calculado de uma vez contra todos
+    os perfis (broadcast linhas x perfis em calcular_descontos_lote) e somado por coluna.
+    """
+    umidade_padrao = np.array([p['umidade_padrao'] for p in perfis], dtype=np.float64)
+    fator_umidade = np.array([p['fator_umidade'] for p in perfis], dtype=np.float64)
+
+    desconto_umidade = np.zeros(len(perfis))
+    desconto_impurezas = np.zeros(len(perfis))
+    peso_com_desconto = np.zeros(len(perfis))
+    total = 0
+    peso_liquido_total = 0.0
+    peso_fazenda_total = 0.0
+
+    linhas = carregamento_crud.stream_rows(
+        db, colunas=_COLUNAS, group_id=group_id, filtro=filtro, batch_size=tamanho_lote
+    )
+    while lote := list(islice(linhas, tamanho_lote)):
+        peso_liquido, quantity = _coluna(lote, 0), _coluna(lote, 1)
+        # Mesma base do cadastro: peso líquido, ou quantity quando não houve pesagem
+        base = np.where(peso_liquido > 0, peso_liquido, quantity)
+        descontos = calcular_descontos_lote(
+            peso_liquido=base[:, None],
+            umidade_medida=_coluna(lote, 2)[:, None],
+            impurezas_medida=_coluna(lote, 3)[:, None],
+            umidade_padrao=umidade_padrao[None, :],
+            fator_umidade=fator_umidade[None, :],
+        )
+        desconto_umidade += descontos['desconto_umidade_kg'].sum(axis=0)
+        desconto_impurezas += descontos['desconto_impurezas_kg'].sum(axis=0)
+        peso_com_desconto += descontos['peso_com_desconto'].sum(axis=0)
+        total += len(lote)
+        peso_liquido_total += float(base.sum())
+        peso_fazenda_total += float(_coluna(lote, 4).sum())
+
+    return {
+        'carregamentos': total,
+        'peso_liquido_kg': round(peso_liquido_total, 2),
+        'peso_com_desconto_fazenda': round(peso_fazenda_total, 2),
+        'perfis': [
+            {
+                **perfil,
+                'desconto_umidade_kg': round(float(desconto_umidade[i]), 2),
+                'desconto_impurezas_kg': round(float(desconto_impurezas[i]), 2),
+                'peso_com_desconto_kg': round(float(peso_com_desconto[i]), 2),
+                'diferenca_fazenda_kg': round(peso_fazenda_total - float(peso_com_desconto[i]), 2),
+            }
+            for i, perfil in enumerate(perfis)
+        ],
+    }